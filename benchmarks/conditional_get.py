@@ -0,0 +1,81 @@
+"""
+Latency of the read endpoints with a full response (200) against a revalidation with the
+ETag of the previous response (If-None-Match, 304 without the listing query and serialization).
+
+The log table is seeded with --rows student logs (as in log_serializer.py). Every endpoint is
+requested --requests times as an admin through the test client, both ways.
+
+Usage:
+  python benchmarks/conditional_get.py --rows 1000000
+  DATABASE_URL=mysql+pymysql://... python benchmarks/conditional_get.py --database-url-from-env
+"""
+from time import perf_counter
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# The config reads these at import time
+os.environ.setdefault('SECRET_KEY', 'conditional-get-benchmark')
+os.environ.setdefault('MQTT_BROKER_URL', 'localhost')
+os.environ.setdefault('MQTT_BROKER_PORT', '1883')
+
+from sqlalchemy import text
+
+from project import create_app
+from project.extensions import db
+from log_serializer import seed
+
+ENDPOINTS = [
+  ('role page, 50 logs', '/admin/attendance/STUDENT/get?limit=50'),
+  ('role page, 500 logs', '/admin/attendance/STUDENT/get?limit=500'),
+  ('course, streamed', '/admin/attendance/STUDENT/get?course_id=C00007&stream=1'),
+  ('student detail', '/admin/attendance/STUDENT/get_detail?nim=0000000042&limit=500'),
+  ('courses', '/admin/courses/get')
+]
+
+def timed(client, url:str, requests:int, etag:str = None) -> float:
+  headers = {'If-None-Match': etag} if etag else {}
+  started = perf_counter()
+  for _ in range(requests):
+    response = client.get(url, headers=headers)
+    response.get_data()
+  return (perf_counter() - started) / requests * 1000
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--rows', type=int, default=1000000, help='Student log rows.')
+  parser.add_argument('--students', type=int, default=5000)
+  parser.add_argument('--courses', type=int, default=300)
+  parser.add_argument('--days', type=int, default=120)
+  parser.add_argument('--requests', type=int, default=20, help='Timed requests per endpoint and way.')
+  parser.add_argument('--database-url-from-env', action='store_true', help='Use DATABASE_URL (an empty database) instead of a temporary SQLite file.')
+  args = parser.parse_args()
+
+  config = {'SQL_PROFILER_ENABLED': False, 'SQLALCHEMY_RECORD_QUERIES': False, 'LOG_LEVEL': 'ERROR'}
+  if not args.database_url_from_env:
+    config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'logs.sqlite')
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+  app = create_app(testing=True, config=config)
+  with app.app_context():
+    db.create_all()
+    seed(args.rows, args.students, args.courses, args.days)
+    if db.session.get_bind().dialect.name == 'sqlite':
+      db.session.execute(text('ANALYZE'))
+      db.session.commit()
+  client = app.test_client()
+  with client.session_transaction() as session:
+    session['user_id'] = 'admin'
+    session['user_role'] = 'ADMIN'
+  print(f"\n{'endpoint':<22} {'200 ms':>8} {'304 ms':>8} {'speedup':>8}")
+  for name, url in ENDPOINTS:
+    response = client.get(url)
+    etag = response.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    full = timed(client, url, args.requests)
+    revalidated = timed(client, url, args.requests, etag)
+    print(f'{name:<22} {full:>8.2f} {revalidated:>8.2f} {full / revalidated:>7.0f}x')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,110 @@
+"""
+Taps/sec of N ingest consumers splitting the per-reader tap topics through a
+shared subscription ($share/<group>/...), as several ingest.py processes do.
+
+Needs a local broker with shared subscriptions, e.g. `mosquitto -p 1883`.
+
+Each consumer stands in for one ingest process: it spends --service-ms per tap
+(the DB work of do_attendance) and then replies on <tap topic>/Response.
+The publisher keeps --window taps in flight over --readers reader topics.
+
+Usage:
+  python benchmarks/ingest_consumers.py --consumers 1 2 4 8 --taps 5000
+"""
+from multiprocessing import Process, Event
+from threading import Semaphore, Event as ThreadEvent, Lock
+from time import sleep, perf_counter
+import argparse
+import uuid
+
+import paho.mqtt.client as mqtt_client
+
+def consume(host:str, port:int, prefix:str, group:str, service_s:float, ready):
+  client = mqtt_client.Client()
+
+  def on_connect(client, userdata, flags, rc):
+    client.subscribe(f"$share/{group}/{prefix}/+/AttendanceFinal", qos=1)
+
+  def on_subscribe(client, userdata, mid, granted_qos):
+    ready.set()
+
+  def on_message(client, userdata, msg):
+    # Stand-in for the user/course lookup and the log insert
+    sleep(service_s)
+    client.publish(f"{msg.topic}/Response", payload="100 - Success", qos=1)
+
+  client.on_connect = on_connect
+  client.on_subscribe = on_subscribe
+  client.on_message = on_message
+  client.connect(host, port)
+  client.loop_forever()
+
+def run(host:str, port:int, consumers:int, taps:int, readers:int, window:int, service_s:float) -> float:
+  prefix = f"bench/{uuid.uuid4().hex[:8]}/ESP32"
+  group = 'ingest'
+  processes = []
+  for _ in range(consumers):
+    ready = Event()
+    process = Process(target=consume, args=(host, port, prefix, group, service_s, ready), daemon=True)
+    process.start()
+    processes.append((process, ready))
+  for process, ready in processes:
+    if not ready.wait(10):
+      raise RuntimeError('Consumer did not subscribe, is the broker running?')
+
+  in_flight = Semaphore(window)
+  done = ThreadEvent()
+  lock = Lock()
+  replies = [0]
+
+  def on_message(client, userdata, msg):
+    in_flight.release()
+    with lock:
+      replies[0] += 1
+      if replies[0] == taps:
+        done.set()
+
+  subscribed = ThreadEvent()
+  client = mqtt_client.Client()
+  client.on_message = on_message
+  client.on_subscribe = lambda client, userdata, mid, granted_qos: subscribed.set()
+  client.connect(host, port)
+  client.subscribe(f"{prefix}/+/AttendanceFinal/Response", qos=1)
+  client.loop_start()
+  subscribed.wait(10)
+
+  started = perf_counter()
+  for i in range(taps):
+    in_flight.acquire()
+    client.publish(f"{prefix}/reader-{i % readers}/AttendanceFinal", payload=f"UID{i:08d}", qos=1)
+  if not done.wait(600):
+    raise RuntimeError(f"Only {replies[0]} of {taps} taps were answered")
+  elapsed = perf_counter() - started
+
+  client.loop_stop()
+  client.disconnect()
+  for process, _ in processes:
+    process.terminate()
+    process.join()
+  return taps / elapsed
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--host', default='localhost')
+  parser.add_argument('--port', type=int, default=1883)
+  parser.add_argument('--consumers', type=int, nargs='+', default=[1, 2, 4])
+  parser.add_argument('--taps', type=int, default=2000)
+  parser.add_argument('--readers', type=int, default=20)
+  parser.add_argument('--window', type=int, default=200)
+  parser.add_argument('--service-ms', type=float, default=5.0)
+  args = parser.parse_args()
+
+  print(f"{'consumers':>9} {'taps/sec':>10} {'speedup':>8}")
+  baseline = None
+  for consumers in args.consumers:
+    rate = run(args.host, args.port, consumers, args.taps, args.readers, args.window, args.service_ms / 1000)
+    baseline = baseline or rate
+    print(f"{consumers:>9} {rate:>10.1f} {rate / baseline:>7.2f}x")
+
+if __name__ == '__main__':
+  main()
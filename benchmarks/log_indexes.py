@@ -0,0 +1,212 @@
+"""
+Query plans and latencies of the attendance log access paths, without and with the
+composite indexes of attendance_logs.
+
+The access paths are the ones the app runs:
+  - session check: a session of a user (user_id, course_id, time_in of one day)
+  - student logs, lecturer logs: the logs of a user in a course (serialized_logs)
+  - course logs: the logs of a course and role ordered by time_in (serialized_logs)
+  - course, both roles: the logs of a course for students and lecturers at once
+  - role page: the newest page of logs of a role (admin listing without a course, keyset pagination)
+
+The log table is seeded with --rows student logs (and a twentieth of it for the lecturers),
+spread over --days days. Each path is timed with --queries random parameters.
+The unique session constraint (user_id, course_id, session_date) is kept in both runs,
+so the (user, course) paths already use its index before the composite indexes exist.
+
+Usage:
+  python benchmarks/log_indexes.py --rows 2000000
+  DATABASE_URL=mysql+pymysql://... python benchmarks/log_indexes.py --database-url-from-env --rows 5000000
+"""
+from datetime import datetime, time, timedelta
+from time import perf_counter
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# The config reads these at import time
+os.environ.setdefault('SECRET_KEY', 'log-index-benchmark')
+os.environ.setdefault('MQTT_BROKER_URL', 'localhost')
+os.environ.setdefault('MQTT_BROKER_PORT', '1883')
+
+from sqlalchemy import insert, select, text
+
+from project import create_app
+from project.extensions import db
+from project.app.models import (
+  User, Class, Room, Course, AttendanceLogs,
+  StudyProgram, Major, RoomBuilding, AttendanceStatus, RoleName
+)
+
+FIRST_DAY = datetime(2024, 2, 5, 7, 0)
+STATUSES = [AttendanceStatus.PRESENT, AttendanceStatus.LATE, AttendanceStatus.ALPHA]
+
+def composite_indexes() -> list:
+  return [index for index in AttendanceLogs.__table__.indexes if len(index.columns) > 1]
+
+def seed(rows:int, students:int, lecturers:int, courses:int, days:int):
+  db.session.execute(insert(Class), [{'class_id': 'TMJ4A', 'class_study_program': StudyProgram.TMJ, 'class_major': Major.TIK}])
+  db.session.execute(insert(Room), [{'room_id': 'GSG-101', 'room_building': RoomBuilding.GSG}])
+  db.session.execute(insert(User), [
+    {
+      'user_id': f'{n:018d}', 'user_role': 'LECTURER', 'user_fullname': f'Lecturer {n}', 'user_password_hash': 'x',
+      'user_email_address': f'l{n}@campus.test', 'lecturer_major': Major.TIK
+    }
+    for n in range(lecturers)
+  ] + [
+    {
+      'user_id': f'{n:010d}', 'user_role': 'STUDENT', 'user_fullname': f'Student {n}', 'user_password_hash': 'x',
+      'user_email_address': f's{n}@campus.test', 'student_class': 'TMJ4A'
+    }
+    for n in range(students)
+  ])
+  db.session.execute(insert(Course), [
+    {
+      'course_id': f'C{n:05d}', 'course_name': f'Course {n}', 'course_sks': 2, 'at_semester': 4, 'day': 'Monday',
+      'time_start': time(7, 0), 'time_end': time(9, 0), 'lecturer_nip': f'{n % lecturers:018d}',
+      'class_id': 'TMJ4A', 'room_id': 'GSG-101'
+    }
+    for n in range(courses)
+  ])
+  randint = random.Random(1).randint
+  for role, user_count, user_format, total in (
+    (RoleName.STUDENT, students, '{:010d}', rows),
+    (RoleName.LECTURER, lecturers, '{:018d}', max(1, rows // 20))
+  ):
+    # One log per user, course and day (unique session)
+    total = min(total, user_count * courses * days)
+    sessions = set()
+    while len(sessions) < total:
+      sessions.add((randint(0, user_count - 1), randint(0, courses - 1), randint(0, days - 1)))
+    sessions = list(sessions)
+    for start in range(0, total, 50000):
+      batch = []
+      for user, course, day in sessions[start:start + 50000]:
+        time_in = FIRST_DAY + timedelta(days=day, minutes=randint(0, 600))
+        batch.append({
+          'time_in': time_in,
+          'session_date': time_in.date(),
+          'status': STATUSES[randint(0, 2)],
+          'user_role': role,
+          'user_id': user_format.format(user),
+          'course_id': f'C{course:05d}',
+          'room_id': 'GSG-101'
+        })
+      db.session.execute(insert(AttendanceLogs), batch)
+    db.session.commit()
+    print(f'seeded {total} {role.value.lower()} logs')
+
+def access_paths(students:int, lecturers:int, courses:int, days:int) -> list:
+  # (name, function returning a random statement)
+  randint = random.randint
+  model = AttendanceLogs
+  def session_check():
+    day = FIRST_DAY.replace(hour=0) + timedelta(days=randint(0, days - 1))
+    return select(model.user_id, model.course_id, model.time_in).where(
+      model.user_id == f'{randint(0, students - 1):010d}',
+      model.course_id == f'C{randint(0, courses - 1):05d}',
+      model.time_in >= day, model.time_in < day + timedelta(days=1)
+    )
+  def student_logs():
+    return select(model.log_id, model.time_in, model.status).where(
+      model.user_role == RoleName.STUDENT,
+      model.user_id == f'{randint(0, students - 1):010d}', model.course_id == f'C{randint(0, courses - 1):05d}'
+    )
+  def lecturer_logs():
+    return select(model.log_id, model.time_in, model.status).where(
+      model.user_role == RoleName.LECTURER,
+      model.user_id == f'{randint(0, lecturers - 1):018d}', model.course_id == f'C{randint(0, courses - 1):05d}'
+    )
+  def course_logs():
+    return select(model.log_id, model.user_id, model.time_in, model.status).where(
+      model.course_id == f'C{randint(0, courses - 1):05d}', model.user_role == RoleName.STUDENT
+    ).order_by(model.time_in)
+  def course_both_roles():
+    return select(model.log_id, model.user_role, model.user_id, model.time_in, model.status).where(
+      model.course_id == f'C{randint(0, courses - 1):05d}'
+    )
+  def role_page():
+    return select(model.log_id, model.user_id, model.time_in, model.status).where(
+      model.user_role == RoleName.STUDENT
+    ).order_by(model.time_in.desc(), model.log_id.desc()).limit(50)
+  return [
+    ('session check', session_check),
+    ('student logs', student_logs),
+    ('lecturer logs', lecturer_logs),
+    ('course logs', course_logs),
+    ('course, both roles', course_both_roles),
+    ('role page', role_page)
+  ]
+
+def analyze():
+  # Fresh planner statistics, as a production database keeps them
+  if db.session.get_bind().dialect.name == 'sqlite':
+    db.session.execute(text('ANALYZE'))
+  else:
+    db.session.execute(text(f'ANALYZE TABLE {AttendanceLogs.__tablename__}'))
+  db.session.commit()
+
+def explain(statement) -> str:
+  bind = db.session.get_bind()
+  sql = str(statement.compile(bind, compile_kwargs={'literal_binds': True}))
+  if bind.dialect.name == 'sqlite':
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).all()
+    return ' | '.join(row[-1] for row in rows)
+  rows = db.session.execute(text(f'EXPLAIN {sql}')).mappings().all()
+  return ' | '.join(f"{row.get('table')}: {row.get('type')} key={row.get('key')} rows={row.get('rows')}" for row in rows)
+
+def measure(paths:list, queries:int) -> dict:
+  results = {}
+  for name, statement in paths:
+    plan = explain(statement())
+    random.seed(2)
+    started = perf_counter()
+    for _ in range(queries):
+      db.session.execute(statement()).all()
+    results[name] = ((perf_counter() - started) / queries * 1000, plan)
+  return results
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--rows', type=int, default=2000000, help='Student log rows.')
+  parser.add_argument('--students', type=int, default=5000)
+  parser.add_argument('--lecturers', type=int, default=100)
+  parser.add_argument('--courses', type=int, default=300)
+  parser.add_argument('--days', type=int, default=120)
+  parser.add_argument('--queries', type=int, default=50, help='Timed queries per access path.')
+  parser.add_argument('--database-url-from-env', action='store_true', help='Use DATABASE_URL (an empty database) instead of a temporary SQLite file.')
+  args = parser.parse_args()
+
+  config = {'SQL_PROFILER_ENABLED': False, 'LOG_LEVEL': 'ERROR'}
+  if not args.database_url_from_env:
+    config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'logs.sqlite')
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+  app = create_app(testing=True, config=config)
+  with app.app_context():
+    db.create_all()
+    for index in composite_indexes():
+      index.drop(db.session.connection())
+    db.session.commit()
+    seed(args.rows, args.students, args.lecturers, args.courses, args.days)
+    paths = access_paths(args.students, args.lecturers, args.courses, args.days)
+    analyze()
+    before = measure(paths, args.queries)
+    started = perf_counter()
+    for index in composite_indexes():
+      index.create(db.session.connection())
+    db.session.commit()
+    print(f'created {len(composite_indexes())} composite indexes in {perf_counter() - started:.1f}s')
+    analyze()
+    after = measure(paths, args.queries)
+  print(f"\n{'access path':<20} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+  for name, _ in paths:
+    print(f'{name:<20} {before[name][0]:>10.2f} {after[name][0]:>10.2f} {before[name][0] / after[name][0]:>7.0f}x')
+  print()
+  for name, _ in paths:
+    print(f'{name}\n  before: {before[name][1]}\n  after:  {after[name][1]}')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,200 @@
+"""
+Rows/sec and peak memory of the attendance log serializers: the previous one (AttendanceLogs
+objects with joinedload of user, course and room, strftime per row) against log_query() and
+serialize_logs() (plain rows of the needed columns, one pass), and the same rows written as
+streamed JSON by json_chunks() (the stream=1 mode, STREAM_BATCH_SIZE rows at a time).
+
+The log table is seeded with --rows student logs. Each serializer turns every student log into
+the JSON logs of the log endpoints, as serialized_logs(selected_role='STUDENT') does for the admin.
+Each serializer runs once in a forked process: its time and its peak memory (peak RSS above
+the RSS of the process before the run, so the seeding and the other serializer do not count).
+All of them are checked to return the same logs on the first 10000 rows.
+
+Usage:
+  python benchmarks/log_serializer.py --rows 1000000
+  DATABASE_URL=mysql+pymysql://... python benchmarks/log_serializer.py --database-url-from-env
+"""
+from datetime import datetime, time, timedelta
+from time import perf_counter
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# The config reads these at import time
+os.environ.setdefault('SECRET_KEY', 'log-serializer-benchmark')
+os.environ.setdefault('MQTT_BROKER_URL', 'localhost')
+os.environ.setdefault('MQTT_BROKER_PORT', '1883')
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+
+from project import create_app
+from project.extensions import db
+from project.app.log_query import log_query, serialize_logs
+from project.app.streaming import json_chunks
+from project.app.models import (
+  User, Class, Room, Course, AttendanceLogs,
+  StudyProgram, Major, RoomBuilding, AttendanceStatus, RoleName
+)
+
+FIRST_DAY = datetime(2024, 2, 5, 7, 0)
+STATUSES = [AttendanceStatus.PRESENT, AttendanceStatus.LATE, AttendanceStatus.ALPHA]
+
+def seed(rows:int, students:int, courses:int, days:int):
+  db.session.execute(insert(Class), [{'class_id': 'TMJ4A', 'class_study_program': StudyProgram.TMJ, 'class_major': Major.TIK}])
+  db.session.execute(insert(Room), [{'room_id': 'GSG-101', 'room_building': RoomBuilding.GSG}])
+  db.session.execute(insert(User), [
+    {
+      'user_id': '0' * 18, 'user_role': 'LECTURER', 'user_fullname': 'Lecturer', 'user_password_hash': 'x',
+      'user_email_address': 'lecturer@campus.test', 'lecturer_major': Major.TIK
+    }
+  ] + [
+    {
+      'user_id': f'{n:010d}', 'user_role': 'STUDENT', 'user_fullname': f'Student {n}', 'user_password_hash': 'x',
+      'user_email_address': f's{n}@campus.test', 'student_class': 'TMJ4A'
+    }
+    for n in range(students)
+  ])
+  db.session.execute(insert(Course), [
+    {
+      'course_id': f'C{n:05d}', 'course_name': f'Course {n}', 'course_sks': 2, 'at_semester': 4, 'day': 'Monday',
+      'time_start': time(7, 0), 'time_end': time(9, 0), 'lecturer_nip': '0' * 18,
+      'class_id': 'TMJ4A', 'room_id': 'GSG-101'
+    }
+    for n in range(courses)
+  ])
+  randint = random.Random(1).randint
+  # One log per user, course and day (unique session)
+  sessions = set()
+  while len(sessions) < rows:
+    sessions.add((randint(0, students - 1), randint(0, courses - 1), randint(0, days - 1)))
+  sessions = list(sessions)
+  for start in range(0, rows, 50000):
+    batch = []
+    for user, course, day in sessions[start:start + 50000]:
+      time_in = FIRST_DAY + timedelta(days=day, minutes=randint(0, 600), seconds=randint(0, 59))
+      batch.append({
+        'time_in': time_in,
+        'session_date': time_in.date(),
+        'status': STATUSES[randint(0, 2)],
+        'user_role': RoleName.STUDENT,
+        'user_id': f'{user:010d}',
+        'course_id': f'C{course:05d}',
+        'room_id': 'GSG-101'
+      })
+    db.session.execute(insert(AttendanceLogs), batch)
+  db.session.commit()
+  print(f'seeded {rows} student logs')
+
+def orm_serializer(max_log_id:int = None) -> list:
+  # The serializer of the log endpoints before log_query()
+  attendance_logs = db.session.query(AttendanceLogs).options(
+    joinedload(AttendanceLogs.user),
+    joinedload(AttendanceLogs.course),
+    joinedload(AttendanceLogs.room)
+  ).filter_by(user_role='STUDENT')
+  if max_log_id:
+    attendance_logs = attendance_logs.filter(AttendanceLogs.log_id <= max_log_id)
+  return [
+    {
+      'log_id': log.log_id,
+      'nim': log.user.user_id,
+      'name': log.user.user_fullname,
+      'course': log.course.course_name,
+      'room': log.room.room_id,
+      'time_in': log.time_in.strftime('%a, %d %b %Y %H:%M:%S'),
+      'status': log.status.value
+    }
+    for log in attendance_logs.all()
+  ]
+
+def projected_serializer(max_log_id:int = None) -> list:
+  attendance_logs = log_query().filter(AttendanceLogs.user_role == 'STUDENT')
+  if max_log_id:
+    attendance_logs = attendance_logs.filter(AttendanceLogs.log_id <= max_log_id)
+  return serialize_logs(attendance_logs.all(), user_key='nim')
+
+def streamed_serializer(max_log_id:int = None):
+  # The JSON text of the streaming mode, batch by batch, as the WSGI server sends it
+  attendance_logs = log_query().filter(AttendanceLogs.user_role == 'STUDENT')
+  if max_log_id:
+    attendance_logs = attendance_logs.filter(AttendanceLogs.log_id <= max_log_id)
+  batch_size = current_app.config['STREAM_BATCH_SIZE']
+  return json_chunks('attendance', attendance_logs, lambda rows: serialize_logs(rows, user_key='nim'), batch_size)
+
+def count_streamed() -> int:
+  # Rows of the streamed JSON, without keeping the text
+  return sum(chunk.count('"log_id"') for chunk in streamed_serializer())
+
+def rss() -> int:
+  with open('/proc/self/statm') as statm:
+    return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def measure(app, count, results):
+  # In the forked process: a new connection, then one run
+  with app.app_context():
+    db.engine.dispose(close=False)
+    baseline = rss()
+    started = perf_counter()
+    rows = count()
+    seconds = perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    results.send((seconds, rows, (peak - baseline) / 2**20))
+
+def run(app, count) -> tuple:
+  # (seconds, rows, peak MiB), None when the process died (e.g. out of memory)
+  receiver, sender = multiprocessing.Pipe(duplex=False)
+  process = multiprocessing.get_context('fork').Process(target=measure, args=(app, count, sender))
+  process.start()
+  sender.close()
+  try:
+    result = receiver.recv()
+  except EOFError:
+    result = None
+  process.join()
+  return result
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--rows', type=int, default=1000000, help='Student log rows.')
+  parser.add_argument('--students', type=int, default=5000)
+  parser.add_argument('--courses', type=int, default=300)
+  parser.add_argument('--days', type=int, default=120)
+  parser.add_argument('--database-url-from-env', action='store_true', help='Use DATABASE_URL (an empty database) instead of a temporary SQLite file.')
+  args = parser.parse_args()
+
+  config = {'SQL_PROFILER_ENABLED': False, 'SQLALCHEMY_RECORD_QUERIES': False, 'LOG_LEVEL': 'ERROR'}
+  if not args.database_url_from_env:
+    config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'logs.sqlite')
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+  app = create_app(testing=True, config=config)
+  with app.app_context():
+    db.create_all()
+    seed(args.rows, args.students, args.courses, args.days)
+    # Same logs from both serializers (ordered by log_id for the comparison)
+    key = lambda log: log['log_id']
+    assert sorted(orm_serializer(10000), key=key) == sorted(projected_serializer(10000), key=key)
+    assert json.loads(''.join(streamed_serializer(10000)))['attendance'] == projected_serializer(10000)
+    db.session.remove()
+  results = [
+    ('joinedload + strftime', run(app, lambda: len(orm_serializer()))),
+    ('log_query + serialize_logs', run(app, lambda: len(projected_serializer()))),
+    ('streamed (json_chunks)', run(app, count_streamed))
+  ]
+  print(f"\n{'serializer':<28} {'rows':>9} {'seconds':>8} {'rows/sec':>10} {'peak MiB':>9}")
+  for name, result in results:
+    if result is None:
+      print(f'{name:<28} died (out of memory?)')
+      continue
+    seconds, rows, peak = result
+    print(f'{name:<28} {rows:>9} {seconds:>8.2f} {rows / seconds:>10.0f} {peak:>9.0f}')
+
+if __name__ == '__main__':
+  main()
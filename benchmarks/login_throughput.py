@@ -0,0 +1,104 @@
+"""
+Login throughput for different password pool sizes and Argon2 parameters.
+
+Every login verifies an Argon2 hash. With PASSWORD_HASH_WORKERS=0 the hash runs in the request
+thread and holds the GIL-bound worker for its whole cost; with a pool the request thread only
+waits for a pool process. Each run posts --logins logins from --threads client threads and
+reports logins/sec, p50/p95 latency and the rejected logins (PasswordPoolBusy, pool saturated).
+Pick the pool size and Argon2 parameters that keep p95 acceptable on the target machine.
+
+Usage:
+  python benchmarks/login_throughput.py --workers 0 1 2 4 --threads 16 --logins 64
+  python benchmarks/login_throughput.py --params 2:65536:4 3:65536:4 --workers 4
+"""
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# The config reads these at import time
+os.environ.setdefault('SECRET_KEY', 'login-benchmark')
+os.environ.setdefault('MQTT_BROKER_URL', 'localhost')
+os.environ.setdefault('MQTT_BROKER_PORT', '1883')
+
+from sqlalchemy import insert
+
+from project import create_app
+from project.extensions import db
+from project.app.models import User
+from project.app.hashing import password_pool
+
+USER_ID = '0000000001'
+PASSWORD = 'Login#2024'
+
+def run(workers:int, time_cost:int, memory_cost:int, parallelism:int, threads:int, logins:int, database:str) -> dict:
+  app = create_app(testing=True, config={
+    'SQLALCHEMY_DATABASE_URI': database,
+    'SQLALCHEMY_ENGINE_OPTIONS': {},
+    'SQL_PROFILER_ENABLED': False,
+    'WTF_CSRF_ENABLED': False,
+    'LOG_LEVEL': 'ERROR',
+    'PASSWORD_HASH_WORKERS': workers,
+    'PASSWORD_HASH_CONCURRENCY': None,
+    'ARGON2_TIME_COST': time_cost,
+    'ARGON2_MEMORY_COST': memory_cost,
+    'ARGON2_PARALLELISM': parallelism
+  })
+  with app.app_context():
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(User), [{
+      'user_id': USER_ID, 'user_role': 'ADMIN', 'user_fullname': 'Benchmark',
+      'user_password_hash': password_pool.hash(PASSWORD), 'user_email_address': 'bench@campus.test'
+    }])
+    db.session.commit()
+    # Start the pool processes before timing
+    password_pool.verify(password_pool.hash(PASSWORD), PASSWORD)
+
+  def login(_):
+    client = app.test_client()
+    started = perf_counter()
+    response = client.post('/login', data={'user_id': USER_ID, 'user_pw': PASSWORD})
+    elapsed = perf_counter() - started
+    return elapsed, response.headers.get('Location', '').endswith('/dashboard')
+
+  started = perf_counter()
+  with ThreadPoolExecutor(max_workers=threads) as pool:
+    results = list(pool.map(login, range(logins)))
+  wall = perf_counter() - started
+  password_pool.close()
+  latencies = sorted(elapsed for elapsed, _ in results)
+  return {
+    'per_sec': logins / wall,
+    'p50': statistics.median(latencies) * 1000,
+    'p95': latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000,
+    'failed': sum(1 for _, ok in results if not ok)
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, os.cpu_count() or 1])
+  parser.add_argument(
+    '--params', nargs='+', default=['2:65536:4'],
+    help='Argon2 time_cost:memory_cost(KiB):parallelism, one run per value and pool size.'
+  )
+  parser.add_argument('--threads', type=int, default=16, help='Concurrent login requests.')
+  parser.add_argument('--logins', type=int, default=64)
+  args = parser.parse_args()
+
+  database = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'login.sqlite')
+  print(f"{'params':>12} {'workers':>8} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'failed':>7}")
+  for params in args.params:
+    time_cost, memory_cost, parallelism = (int(value) for value in params.split(':'))
+    for workers in args.workers:
+      result = run(workers, time_cost, memory_cost, parallelism, args.threads, args.logins, database)
+      print(
+        f"{params:>12} {workers:>8} {result['per_sec']:>9.1f} {result['p50']:>8.0f} {result['p95']:>8.0f} {result['failed']:>7}"
+      )
+
+if __name__ == '__main__':
+  main()
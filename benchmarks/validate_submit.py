@@ -0,0 +1,91 @@
+"""
+Time of one student form validation (register and edit mode) for a growing user table.
+
+The set-based validators answer every existence question (ID, email, RFID, class) with one
+query, so the time per submit should stay flat as the table grows. For comparison, the
+previous uniqueness check loaded every student of the table on each submit.
+
+Usage:
+  python benchmarks/validate_submit.py --users 1000 10000 50000 --submits 200
+  DATABASE_URL=mysql+pymysql://... python benchmarks/validate_submit.py --database-url-from-env
+"""
+from time import perf_counter
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# The config reads these at import time
+os.environ.setdefault('SECRET_KEY', 'validate-benchmark')
+os.environ.setdefault('MQTT_BROKER_URL', 'localhost')
+os.environ.setdefault('MQTT_BROKER_PORT', '1883')
+
+from sqlalchemy import insert, delete
+
+from project import create_app
+from project.extensions import db
+from project.app.models import User, Class, StudyProgram, Major
+from project.app.validators import validate_user_form
+from project.app.hashing import rfid_hasher
+
+CLASS_ID = 'TMJ4A'
+
+def seed(users:int):
+  db.session.execute(delete(User))
+  db.session.execute(delete(Class))
+  db.session.execute(insert(Class), [{'class_id': CLASS_ID, 'class_study_program': StudyProgram.TMJ, 'class_major': Major.TIK}])
+  rows = [
+    {
+      'user_id': f'{n:010d}', 'user_role': 'STUDENT', 'user_fullname': f'Student {n}', 'student_class': CLASS_ID,
+      'user_password_hash': 'x', 'user_rfid_hash': rfid_hasher.digest(f'UID{n:010d}'), 'user_email_address': f'{n:010d}@campus.test'
+    }
+    for n in range(users)
+  ]
+  for start in range(0, len(rows), 5000):
+    db.session.execute(insert(User), rows[start:start + 5000])
+  db.session.commit()
+
+def submit(nim:str, edit_mode:bool):
+  return validate_user_form(
+    user_id=nim, user_role='STUDENT', user_fullname='Student', user_pw='Student#2024', user_confirm_pw='Student#2024',
+    user_email_address=f'{nim}@campus.test', user_uid=f'UID{nim}', student_class=CLASS_ID, edit_mode=edit_mode
+  )
+
+def legacy_unique_check(nim:str) -> bool:
+  # The edit mode check before the set-based validators
+  students = User.query.filter_by(user_role='STUDENT').all()
+  return nim in [student.user_id for student in students if student.user_id != nim]
+
+def timed(function, submits:int) -> float:
+  started = perf_counter()
+  for n in range(submits):
+    function(n)
+    db.session.remove()
+  return (perf_counter() - started) / submits * 1000
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 50000])
+  parser.add_argument('--submits', type=int, default=200)
+  parser.add_argument('--legacy-submits', type=int, default=5)
+  parser.add_argument('--database-url-from-env', action='store_true', help='Use DATABASE_URL instead of a temporary SQLite file.')
+  args = parser.parse_args()
+
+  config = {'SQL_PROFILER_ENABLED': False, 'LOG_LEVEL': 'ERROR'}
+  if not args.database_url_from_env:
+    config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'validate.sqlite')
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+  app = create_app(testing=True, config=config)
+  print(f"{'users':>8} {'register ms':>12} {'edit ms':>10} {'legacy edit ms':>15}")
+  with app.app_context():
+    db.create_all()
+    for users in args.users:
+      seed(users)
+      register = timed(lambda n: submit(f'9{n:09d}', False), args.submits)
+      edit = timed(lambda n: submit(f'{n % users:010d}', True), args.submits)
+      legacy = timed(lambda n: legacy_unique_check(f'{n % users:010d}'), args.legacy_submits)
+      print(f'{users:>8} {register:>12.2f} {edit:>10.2f} {legacy:>15.2f}')
+
+if __name__ == '__main__':
+  main()
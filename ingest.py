@@ -0,0 +1,18 @@
+from project import create_app
+from threading import Event
+import signal
+
+# Single MQTT consumer of the attendance taps (run it beside the gunicorn web workers)
+app = create_app(testing=False, ingest=True)
+
+stop_event = Event()
+
+def handle_stop(signum, frame):
+	stop_event.set()
+
+if __name__ == "__main__":
+	signal.signal(signal.SIGTERM, handle_stop)
+	signal.signal(signal.SIGINT, handle_stop)
+	# The MQTT loop and the tap workers run in background threads,
+	# queued taps and logs are flushed on exit.
+	stop_event.wait()
@@ -0,0 +1,93 @@
+"""store RFID cards as keyed digests
+
+Revision ID: 5645a34bcc27
+Revises: 94b729339273
+Create Date: 2026-10-17 23:25:02.118304
+
+user_rfid_hash held the raw UID (add forms) or a salted Argon2 hash (edit forms).
+Both are replaced by the keyed HMAC-SHA256 digest of rfid_hasher (RFID_HMAC_KEY).
+The digest is computed here with the key of the environment (the same fallback to
+SECRET_KEY as the app), the migration does not import the app code.
+An Argon2 hash cannot be turned back into its UID, those cards are cleared and
+must be registered again; their users are listed in the migration log.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import hashlib
+import hmac
+import logging
+import os
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = '5645a34bcc27'
+down_revision = '94b729339273'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+user = sa.table(
+    'user',
+    sa.column('user_id', sa.String(18)),
+    sa.column('user_rfid_hash', sa.String(256))
+)
+
+DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+
+def rfid_digest(key, uid):
+    # Same digest as rfid_hasher.digest at this revision: HMAC-SHA256 of the stripped, upper case UID
+    if not uid.strip():
+        return None
+    return hmac.new(key, uid.strip().upper().encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def upgrade():
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(user.c.user_id, user.c.user_rfid_hash).where(user.c.user_rfid_hash.isnot(None))
+    ).all()
+    key = os.environ.get('RFID_HMAC_KEY') or os.environ.get('SECRET_KEY')
+    if rows and not key:
+        raise RuntimeError('RFID_HMAC_KEY (or SECRET_KEY) must be set to convert the RFID cards')
+    key = (key or '').encode('utf-8')
+    updates = []
+    cleared = []
+    seen = set()
+    for user_id, value in rows:
+        if DIGEST.match(value):
+            # Already a digest (migration run again)
+            seen.add(value)
+            continue
+        digest = None if value.startswith('$argon2') else rfid_digest(key, value)
+        # The same card with a different case (e.g. typed in lower case) keeps only its first user
+        if digest is None or digest in seen:
+            cleared.append(user_id)
+            digest = None
+        else:
+            seen.add(digest)
+        updates.append({'target_id': user_id, 'digest': digest})
+    if updates:
+        bind.execute(
+            user.update()
+            .where(user.c.user_id == sa.bindparam('target_id'))
+            .values(user_rfid_hash=sa.bindparam('digest')),
+            updates
+        )
+    if cleared:
+        logger.warning("RFID cards to register again (user ids): %s", ', '.join(cleared))
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column(
+            'user_rfid_hash', existing_type=sa.String(length=256), type_=sa.CHAR(length=64), existing_nullable=True
+        )
+
+
+def downgrade():
+    # The digests stay, the UIDs cannot be restored from them
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column(
+            'user_rfid_hash', existing_type=sa.CHAR(length=64), type_=sa.String(length=256), existing_nullable=True
+        )
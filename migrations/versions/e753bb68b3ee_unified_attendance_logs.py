@@ -0,0 +1,119 @@
+"""unified attendance logs
+
+Revision ID: e753bb68b3ee
+Revises: eade21da93fe
+Create Date: 2026-10-17 23:25:53.891232
+
+student_attendance_logs and lecturer_attendance_logs are merged into
+attendance_logs, user_role tells the role of user_id. The rows are copied in
+time_in order, so the new log_id follows the time of the taps.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e753bb68b3ee'
+down_revision = 'eade21da93fe'
+branch_labels = None
+depends_on = None
+
+# (table, role, user column)
+ROLE_TABLES = (
+    ('student_attendance_logs', 'STUDENT', 'student_nim'),
+    ('lecturer_attendance_logs', 'LECTURER', 'lecturer_nip'),
+)
+
+COLUMNS = ('time_in', 'session_date', 'status', 'course_id', 'room_id')
+
+
+def log_table(name, user_column):
+    return sa.table(
+        name,
+        sa.column('log_id', sa.Integer),
+        sa.column('time_in', sa.TIMESTAMP(timezone=True)),
+        sa.column('session_date', sa.Date),
+        sa.column('status', sa.String(7)),
+        sa.column(user_column, sa.String(18)),
+        sa.column('course_id', sa.CHAR(15)),
+        sa.column('room_id', sa.CHAR(10))
+    )
+
+
+def create_role_table(name, user_column):
+    role = name.split('_')[0]
+    op.create_table(name,
+    sa.Column('log_id', sa.Integer(), nullable=False),
+    sa.Column('time_in', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('status', sa.Enum('PRESENT', 'LATE', 'ALPHA', name='attendancestatus'), nullable=False),
+    sa.Column(user_column, sa.String(length=18), nullable=False),
+    sa.Column('course_id', sa.CHAR(length=15), nullable=False),
+    sa.Column('room_id', sa.CHAR(length=10), nullable=False),
+    sa.Column('session_date', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['course.course_id'], ),
+    sa.ForeignKeyConstraint(['room_id'], ['room.room_id'], ),
+    sa.ForeignKeyConstraint([user_column], ['user.user_id'], ),
+    sa.PrimaryKeyConstraint('log_id'),
+    sa.UniqueConstraint(user_column, 'course_id', 'session_date', name=f'uq_{name}_session')
+    )
+    with op.batch_alter_table(name, schema=None) as batch_op:
+        batch_op.create_index(f'ix_{name}_{role}_course_time', [user_column, 'course_id', 'time_in'], unique=False)
+        batch_op.create_index(f'ix_{name}_course_time', ['course_id', 'time_in'], unique=False)
+
+
+def upgrade():
+    op.create_table('attendance_logs',
+    sa.Column('log_id', sa.Integer(), nullable=False),
+    sa.Column('time_in', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('session_date', sa.Date(), nullable=False),
+    sa.Column('status', sa.Enum('PRESENT', 'LATE', 'ALPHA', name='attendancestatus'), nullable=False),
+    sa.Column('user_role', sa.Enum('ADMIN', 'LECTURER', 'STUDENT', name='rolename'), nullable=False),
+    sa.Column('user_id', sa.String(length=18), nullable=False),
+    sa.Column('course_id', sa.CHAR(length=15), nullable=False),
+    sa.Column('room_id', sa.CHAR(length=10), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['course.course_id'], ),
+    sa.ForeignKeyConstraint(['room_id'], ['room.room_id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.user_id'], ),
+    sa.PrimaryKeyConstraint('log_id'),
+    sa.UniqueConstraint('user_id', 'course_id', 'session_date', name='uq_attendance_logs_session')
+    )
+    with op.batch_alter_table('attendance_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_attendance_logs_course_role_time', ['course_id', 'user_role', 'time_in'], unique=False)
+        batch_op.create_index('ix_attendance_logs_user_course_time', ['user_id', 'course_id', 'time_in'], unique=False)
+
+    # Copy the logs of both roles with one INSERT ... SELECT
+    selects = []
+    for name, role, user_column in ROLE_TABLES:
+        table = log_table(name, user_column)
+        selects.append(sa.select(
+            table.c.time_in, table.c.session_date, table.c.status, table.c.course_id, table.c.room_id,
+            sa.literal(role).label('user_role'), table.c[user_column].label('user_id'), table.c.log_id
+        ))
+    logs = sa.union_all(*selects).subquery('logs')
+    attendance_logs = sa.table('attendance_logs', *(sa.column(name) for name in COLUMNS + ('user_role', 'user_id')))
+    op.execute(attendance_logs.insert().from_select(
+        COLUMNS + ('user_role', 'user_id'),
+        sa.select(*(logs.c[name] for name in COLUMNS + ('user_role', 'user_id'))).order_by(logs.c.time_in, logs.c.log_id)
+    ))
+
+    for name, role, user_column in ROLE_TABLES:
+        op.drop_table(name)
+
+
+def downgrade():
+    attendance_logs = sa.table(
+        'attendance_logs', sa.column('log_id'), sa.column('user_role'), sa.column('user_id'),
+        *(sa.column(name) for name in COLUMNS)
+    )
+    for name, role, user_column in ROLE_TABLES:
+        create_role_table(name, user_column)
+        table = log_table(name, user_column)
+        op.execute(table.insert().from_select(
+            COLUMNS + (user_column,),
+            sa.select(*(attendance_logs.c[column] for column in COLUMNS), attendance_logs.c.user_id)
+            .where(attendance_logs.c.user_role == role)
+            .order_by(attendance_logs.c.log_id)
+        ))
+
+    op.drop_table('attendance_logs')
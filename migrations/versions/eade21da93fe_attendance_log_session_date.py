@@ -0,0 +1,108 @@
+"""attendance log session date
+
+Revision ID: eade21da93fe
+Revises: 23d7bb04b540
+Create Date: 2026-10-17 23:23:19.086515
+
+Adds session_date (the local date of time_in) to both log tables and makes
+(user, course_id, session_date) unique, so the database rejects a second log
+of the same session. Existing rows are backfilled in log_id order, with the
+rule of the writer: the date of time_in in Asia/Jakarta, whatever the time zone
+of the database session. Duplicate sessions recorded before the constraint keep
+their first log only.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+import pytz
+
+
+# revision identifiers, used by Alembic.
+revision = 'eade21da93fe'
+down_revision = '23d7bb04b540'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# (table, user column, unique constraint)
+LOG_TABLES = (
+    ('student_attendance_logs', 'student_nim', 'uq_student_attendance_logs_session'),
+    ('lecturer_attendance_logs', 'lecturer_nip', 'uq_lecturer_attendance_logs_session'),
+)
+
+BACKFILL_BATCH = 10000
+
+# Time zone of the taps (LOCAL_TZ of the ingest process at this revision)
+LOCAL_TZ = pytz.timezone('Asia/Jakarta')
+
+
+def local_date(time_in):
+    # The writer takes get_current_daytime().date(), the date in Asia/Jakarta
+    if time_in.tzinfo is not None:
+        # An instant (PostgreSQL) comes back in the session time zone
+        return time_in.astimezone(LOCAL_TZ).date()
+    # MySQL and SQLite drivers dropped the offset on insert, the value is the wall clock of the tap
+    return time_in.date()
+
+
+def backfill(bind, table):
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.log_id, table.c.time_in)
+            .where(table.c.log_id > last_id)
+            .order_by(table.c.log_id)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            return
+        bind.execute(
+            table.update()
+            .where(table.c.log_id == sa.bindparam('target_id'))
+            .values(session_date=sa.bindparam('date')),
+            [{'target_id': log_id, 'date': local_date(time_in)} for log_id, time_in in rows]
+        )
+        last_id = rows[-1].log_id
+
+
+def delete_duplicates(bind, table, user_column):
+    # The derived table lets MySQL read the table it deletes from
+    first_logs = (
+        sa.select(sa.func.min(table.c.log_id).label('log_id'))
+        .group_by(table.c[user_column], table.c.course_id, table.c.session_date)
+        .subquery('first_logs')
+    )
+    result = bind.execute(
+        table.delete().where(table.c.log_id.notin_(sa.select(first_logs.c.log_id)))
+    )
+    if result.rowcount:
+        logger.warning("%s duplicate session logs deleted from %s", result.rowcount, table.name)
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table_name, user_column, constraint in LOG_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('session_date', sa.Date(), nullable=True))
+        table = sa.table(
+            table_name,
+            sa.column('log_id', sa.Integer),
+            sa.column('time_in', sa.TIMESTAMP(timezone=True)),
+            sa.column('session_date', sa.Date),
+            sa.column(user_column, sa.String(18)),
+            sa.column('course_id', sa.CHAR(15))
+        )
+        backfill(bind, table)
+        delete_duplicates(bind, table, user_column)
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.alter_column('session_date', existing_type=sa.Date(), nullable=False)
+            batch_op.create_unique_constraint(constraint, [user_column, 'course_id', 'session_date'])
+
+
+def downgrade():
+    for table_name, user_column, constraint in reversed(LOG_TABLES):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_constraint(constraint, type_='unique')
+            batch_op.drop_column('session_date')
@@ -0,0 +1,58 @@
+from threading import Lock
+
+from ..extensions import db
+from .models import AttendanceLogs
+
+class AttendedSet(object):
+  """
+  This class is the in-memory set of (user_id, course_id) that already attended on the current session date.
+  The tap path uses it to reject repeat taps without a database round trip.
+  It is filled from the log table at startup and at the first tap of a new day,
+  and updated after every flushed log row.
+  It is only a cache: the unique key (user_id, course_id, session_date) of the log table decides
+  whether a tap is a repeat, a session missing here (e.g. recorded by another process) is skipped on insert.
+  """
+  def __init__(self):
+    self._keys = set()
+    self._date = None
+    self._lock = Lock()
+
+  def load(self, session_date) -> int:
+    """
+    This function is to (re)fill the set with the logs of the given session date.
+    Must be called inside an application context.
+    """
+    # Same column as the unique key, so the set agrees with the database on what a day is
+    rows = db.session.query(AttendanceLogs.user_id, AttendanceLogs.course_id).filter(
+      AttendanceLogs.session_date == session_date
+    ).all()
+    keys = {(user_id, course_id) for user_id, course_id in rows}
+    with self._lock:
+      # Keep what this process recorded meanwhile on the same day
+      if self._date == session_date:
+        keys |= self._keys
+      self._keys = keys
+      self._date = session_date
+    return len(keys)
+
+  def contains(self, user_id:str, course_id:str, session_date) -> bool:
+    """
+    This function is to check whether the user already attended the course on session_date.
+    The set rolls over to a new day by itself.
+    """
+    if self._date != session_date:
+      self.load(session_date)
+    return (user_id, course_id) in self._keys
+
+  def add(self, user_id:str, course_id:str, session_date):
+    """
+    This function is to record a flushed log (logs of another day are ignored).
+    """
+    with self._lock:
+      if self._date == session_date:
+        self._keys.add((user_id, course_id))
+
+  def __len__(self):
+    return len(self._keys)
+
+attended_set = AttendedSet()
@@ -0,0 +1,96 @@
+from flask import current_app
+from paho.mqtt import client as mqtt
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from time import monotonic
+import json
+import logging
+
+from .rfid_index import rfid_index
+from .timetable import timetable
+
+logger = logging.getLogger(__name__)
+
+# Topic used by the web workers to tell the ingest process to refresh its lookups
+RELOAD_TOPIC = 'SmarTendance/Server/Reload'
+
+# Notices waiting for the publisher thread of this process, (broker settings, payload)
+_notices = Queue(maxsize=100)
+_publisher = None
+_publisher_lock = Lock()
+
+def publish_reload(scope:str, user_id:str = None):
+  """
+  This function is to notify the ingest process that users or courses were changed.
+  Required param: scope (str), 'user' (with user_id), 'users' (every user) or 'courses'
+  The notice is only queued: a background thread publishes it, so the response does not wait for the broker.
+  Must be called inside an application context.
+  """
+  config = current_app.config
+  auth = None
+  if config.get('MQTT_USERNAME'):
+    auth = {'username': config['MQTT_USERNAME'], 'password': config.get('MQTT_PASSWORD')}
+  broker = (config['MQTT_BROKER_URL'], config['MQTT_BROKER_PORT'], auth, config.get('MQTT_PUBLISH_TIMEOUT', 2.0))
+  _start_publisher()
+  try:
+    _notices.put_nowait((broker, json.dumps({'scope': scope, 'user_id': user_id})))
+  except Full:
+    # The ingest process still picks the change up on its periodic reload
+    logger.warning("Reload notice is dropped, the publish queue is full.")
+
+def _start_publisher():
+  global _publisher
+  # Started on first use, so every forked web worker has its own thread
+  with _publisher_lock:
+    if _publisher is None or not _publisher.is_alive():
+      _publisher = Thread(target=_run_publisher, name='reload-publisher', daemon=True)
+      _publisher.start()
+
+def _run_publisher():
+  while True:
+    broker, payload = _notices.get()
+    payloads = [payload]
+    # Notices queued meanwhile are sent on the same connection
+    while True:
+      try:
+        payloads.append(_notices.get_nowait()[1])
+      except Empty:
+        break
+    try:
+      _publish(broker, payloads)
+    except (OSError, ValueError, RuntimeError) as err:
+      # The ingest process still picks the change up on its periodic reload
+      logger.warning("Reload notice is not published. %s", err)
+
+def _publish(broker:tuple, payloads:list):
+  hostname, port, auth, timeout = broker
+  client = mqtt.Client()
+  # paho-mqtt 1.6 has no setter for the connect timeout (5 seconds)
+  client._connect_timeout = timeout
+  if auth:
+    client.username_pw_set(auth['username'], auth.get('password'))
+  client.connect(hostname, port)
+  client.loop_start()
+  try:
+    deadline = monotonic() + timeout
+    messages = [client.publish(RELOAD_TOPIC, payload=payload, qos=1) for payload in payloads]
+    for message in messages:
+      message.wait_for_publish(max(0, deadline - monotonic()))
+    if not all(message.is_published() for message in messages):
+      raise OSError(f"No acknowledgement from the broker in {timeout} seconds")
+  finally:
+    client.disconnect()
+    client.loop_stop()
+
+def apply_reload(payload:bytes):
+  """
+  This function is to refresh the in-memory lookups of this process after a reload notice.
+  Must be called inside an application context.
+  """
+  notice = json.loads(payload)
+  if notice.get('scope') == 'user' and notice.get('user_id'):
+    rfid_index.refresh(notice['user_id'])
+  elif notice.get('scope') == 'users':
+    rfid_index.load()
+  elif notice.get('scope') == 'courses':
+    timetable.load()
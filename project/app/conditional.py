@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+from flask import request, session
+from hashlib import sha1
+from sqlalchemy import func, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from werkzeug.http import is_resource_modified
+import json
+
+from ..extensions import db
+from .models import AttendanceLogs, DataVersion
+
+def bump_version(scope:str):
+  """
+  This function is to count a write of users or courses, so the ETags of the read endpoints showing them change.
+  Required param: scope (str), 'users' or 'courses'
+  The counter is changed in the current transaction: call it before the commit of the write,
+  so both are committed (or rolled back) together.
+  Must be called inside an application context.
+  """
+  now = datetime.now(timezone.utc).replace(tzinfo=None)
+  values = {'scope': scope, 'version': 1, 'updated_at': now}
+  bumped = {'version': DataVersion.version + 1, 'updated_at': now}
+  # One upsert, so the first write of a scope in two workers at once does not fail
+  dialect = db.session.get_bind().dialect.name
+  if dialect == 'mysql':
+    statement = mysql.insert(DataVersion).values(values).on_duplicate_key_update(bumped)
+  elif dialect in ('postgresql', 'sqlite'):
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    statement = insert(DataVersion).values(values).on_conflict_do_update(index_elements=['scope'], set_=bumped)
+  else:
+    if db.session.execute(update(DataVersion).where(DataVersion.scope == scope).values(bumped)).rowcount:
+      return
+    statement = DataVersion.__table__.insert().values(values)
+  db.session.execute(statement)
+
+class CacheValidator(object):
+  """
+  This class is the validators (ETag and Last-Modified) of a read endpoint, built from watermarks of
+  the data it shows instead of the data itself:
+    - the change counters of users and courses (DataVersion, bumped with every write of them)
+    - max(log_id) and the number of logs in the scope of the endpoint (log_criteria, empty for every
+      log: max(log_id) only), as logs are only inserted by the ingest process, or deleted along with
+      their user or course
+  The request path and query string and the session user are part of the ETag, so every page, filter
+  and sort has its own. Last-Modified is only sent without logs, the logs are validated by the ETag.
+  When the client already has the response, the endpoint answers 304 without running its query.
+  """
+  def __init__(self, scopes:tuple = ('users', 'courses'), log_criteria:tuple = None):
+    # The counters only grow, so their sum changes on every write of the scopes
+    versions = (
+      db.session.query(func.coalesce(func.sum(DataVersion.version), 0), func.max(DataVersion.updated_at))
+      .filter(DataVersion.scope.in_(scopes))
+    )
+    self.last_modified = None
+    if log_criteria is None:
+      version, updated_at = versions.one()
+      watermarks = [version]
+      if updated_at:
+        self.last_modified = updated_at.replace(tzinfo=timezone.utc)
+    else:
+      # One query of subqueries, each one an index lookup or an index only scan of the scope
+      logs = db.session.query(func.max(AttendanceLogs.log_id))
+      columns = [logs.filter(*log_criteria).scalar_subquery()]
+      if log_criteria:
+        columns.append(logs.with_entities(func.count()).filter(*log_criteria).scalar_subquery())
+      # Counting every log would scan the table, an empty scope (every log) has only max(log_id)
+      columns.append(versions.with_entities(func.sum(DataVersion.version)).scalar_subquery())
+      watermarks = list(db.session.query(*columns).one())
+    key = json.dumps([request.full_path, session.get('user_id'), watermarks])
+    self.etag = sha1(key.encode('utf-8')).hexdigest()
+
+  def not_modified(self) -> bool:
+    """
+    This function is to tell whether the client already has the response (If-None-Match or If-Modified-Since).
+    """
+    return not is_resource_modified(request.environ, etag=self.etag, last_modified=self.last_modified)
+
+  def apply(self, response):
+    """
+    This function is to add the validators to a response (200 or 304) and return it.
+    """
+    response.set_etag(self.etag)
+    if self.last_modified:
+      response.last_modified = self.last_modified
+    # Kept by the browser only, and revalidated on every use
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -1,200 +1,17 @@
-from flask import redirect, url_for, render_template, request, flash, session, abort, jsonify, Response
-from flask_argon2 import generate_password_hash
+from flask import redirect, url_for, render_template, request, flash, session, abort, jsonify, Response, current_app
 from datetime import datetime
-from sqlalchemy.orm import joinedload
+from sqlalchemy import func
 import pandas as pd
 from io import BytesIO
 
 from ..models import *
-
-""" Function helper """
-error_user_msg = []
-error_course_msg = []
-
-def validate_user_form(
-  user_id:str, user_role:str, user_fullname:str, user_pw:str, user_confirm_pw:str, user_email_address:str, user_uid:str, user_home_address:str = None, student_class:str = None,
-  lecturer_major:str = None, edit_mode:bool = False
-  ) -> bool:
-  is_valid = False
-  # Check validation mode (edit/register)
-  if not edit_mode:
-    if not (user_id and user_fullname and user_pw and user_confirm_pw and user_email_address and user_uid):
-      error_user_msg.append('Please fill all the form!')
-    # Check if the user password is valid
-    if len(user_pw) < 8:
-      error_user_msg.append('Password must be at least 8 characters!')
-    # Check if the password contains minimum 1 uppercase, 1 lowercase, 1 number, and 1 symbol
-    if not (
-      any(char.isupper() for char in user_pw) and 
-      any(char.islower() for char in user_pw) and 
-      any(char.isdigit() for char in user_pw) and 
-      any(not char.isalnum() for char in user_pw)
-    ):
-      error_user_msg.append('Password must contain minimum 1 uppercase, 1 lowercase, 1 number, and 1 symbol!')
-    if user_role == 'STUDENT':
-      # Query to check if the student already registered
-      student_exist = User.query.filter_by(
-        user_id=user_id,
-        user_role='STUDENT'
-      ).first()
-      if student_exist:
-        error_user_msg.append('Student already registered!')
-    elif user_role == 'LECTURER':
-      # Query to check if the lecturer already registered
-      lecturer_exist = User.query.filter_by(
-        user_id=user_id,
-        user_role='LECTURER'
-      ).first()
-      if lecturer_exist:
-        error_user_msg.append('Lecturer already registered!')
-  # If edit mode is set to True
-  else:
-    # Check if new user password is set
-    if user_pw:
-      # Then, check for the length of the password
-      if len(user_pw) < 8:
-        error_user_msg.append('Password must be at least 8 characters!')
-      # Then, check if the password contains minimum 1 uppercase, 1 lowercase, 1 number, and 1 symbol
-      if not (
-        any(char.isupper() for char in user_pw) and 
-        any(char.islower() for char in user_pw) and 
-        any(char.isdigit() for char in user_pw) and 
-        any(not char.isalnum() for char in user_pw)
-      ):
-        error_user_msg.append('Password must contain minimum 1 uppercase, 1 lowercase, 1 number, and 1 symbol!')
-    if user_role == 'STUDENT':
-      students = User.query.filter_by(user_role='STUDENT').all()
-      students_nim = [
-        student.user_id for student in students if student.user_id != user_id
-      ]
-      # Check if the student is exist except the student that want to be edited
-      if user_id in students_nim:
-        error_user_msg.append('Student already registered. Use different NIM!')
-    elif user_role == 'LECTURER':
-      lecturers = User.query.filter_by(user_role='LECTURER').all()
-      lecturers_nip = [
-        lecturer.user_id for lecturer in lecturers if lecturer.user_id != user_id
-      ]
-      # Check if the lecturer is exist except the lecturer that want to be edited
-      if user_id in lecturers_nip:
-        error_user_msg.append('Lecturer already registered. Use different NIP!')
-  # Check if user confirm password is same as password
-  if user_pw != user_confirm_pw:
-    error_user_msg.append('Confirm password must be same as password!')
-  # Check if user id contain space
-  if (type(user_id) != int) and (" " in user_id):
-    error_user_msg.append('User ID must not contain space!')
-  # Validate user email address
-  if not '@' in user_email_address:
-    error_user_msg.append('Email address is not valid!')
-  # Validate user home address
-  if user_home_address:
-    if len(user_home_address) > 256:
-      error_user_msg.append('Home address must be less than 256 characters!')
-  # Validate user role
-  if user_role == 'STUDENT':
-    # Check if the user id length is 10
-    if len(user_id) != 10:
-      error_user_msg.append('Student NIM must be 10 characters long!')
-    # Check if the student class is valid
-    student_class_exist = Class.query.filter_by(
-      class_id=student_class
-    ).first()
-    if not student_class_exist:
-      error_user_msg.append('Student class is not valid!')
-  elif user_role == 'LECTURER':
-    # Check if the lecturer nip length is 18
-    if len(user_id) != 18:
-      error_user_msg.append('Lecturer NIP must be 18 characters long!')
-    # Check if the lecturer major is valid
-    lecturer_major_list = [major.value for major in Major]
-    if lecturer_major not in lecturer_major_list:
-      error_user_msg.append('Lecturer major is not valid!')
-  # Set is valid to True if there is no error message
-  if not error_user_msg:
-    is_valid = True
-  # Return is_valid
-  return is_valid
-
-def is_valid_day(day: str) -> bool:
-  days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-  return day.capitalize() in days_of_week
-
-def is_valid_time(time: str) -> bool:
-  try:
-    datetime.strptime(time, '%H:%M:%S')
-    return True
-  except ValueError:
-    return False
-
-def validate_course_form(
-  course_id:str, course_name:str, course_sks:int, at_semester:int,
-  day:str, time_start:str, time_end:str, course_description:str,
-  lecturer_nip:str, class_id:str, room_id:str, edit_mode:bool=False
-) -> bool:
-  is_valid = False
-  if not edit_mode:
-    if not (course_id and course_name and course_sks and at_semester 
-            and day and time_start and time_end
-            and lecturer_nip and class_id and room_id
-    ):
-      error_course_msg.append('Please fill all the form!')
-    # Check if course already registered
-    course_exist = Course.query.filter_by(course_id=course_id).first()
-    if course_exist:
-      error_course_msg.append('Course already registered!')
-  else:
-    # Check if course already registered except the course that want to be edited
-    courses =  [
-      course.course_id for course in Course.query.all() if course.course_id != course_id
-    ]
-    if course_id in courses:
-      error_course_msg.append('Course already registered. Use different course ID!')
-  # Check if course_id contain space
-  if (" " in course_id):
-    error_course_msg.append('Course ID must not contain space!')
-  if len(course_id) > 15:
-    error_course_msg.append('Course ID must be less than 15 characters!')
-  if len(course_name) > 100:
-    error_course_msg.append('Course name must be less than 100 characters!')
-  if not (isinstance(course_sks,int)) or (course_sks<1 or course_sks>=6):
-    error_course_msg.append('Course SKS must be between 1 and 6!')
-  if not (isinstance(at_semester,int)) or (at_semester<1 or at_semester>=8):
-    error_course_msg.append('Course semester must be between 1 and 8!')
-  if not is_valid_day(day):
-    error_course_msg.append('Day must be a day of week!')
-  if time_start == time_end:
-    error_course_msg.append('Time start and time end must be different!')
-  if not (is_valid_time(time_start) or is_valid_time(time_end)):
-    error_course_msg.append('Time start or time end must be in format HH:MM AM/PM!')
-  if course_description:
-    if len(course_description) > 256:
-      error_course_msg.append('Course description must be less than 256 characters!')
-  # Check for lecturer NIP
-  lecturer_exist = User.query.filter_by(
-    user_id=lecturer_nip,
-    user_role='LECTURER'
-  ).first()
-  if not lecturer_exist:
-    error_course_msg.append('Lecturer NIP is not valid!')
-  # Check for class ID
-  class_exist = Class.query.filter_by(class_id=class_id).first()
-  if not class_exist:
-    error_course_msg.append('Class ID is not valid!')
-  # Check for room ID
-  room_exist = Room.query.filter_by(room_id=room_id).first()
-  if not room_exist:
-    error_course_msg.append('Room ID is not valid!')
-  # Set is valid to True if there is no error message
-  if not error_course_msg:
-    is_valid = True
-  # Return is_valid
-  return is_valid
-
-def format_time(time_object:datetime):
-  formatted_time = time_object.strftime('%a, %d %b %Y %H:%M:%S')
-  return formatted_time
-""" End of function helper """
+from ..cache_sync import publish_reload
+from ..validators import validate_user_form, validate_course_form, parse_time
+from ..importer import IMPORT_COLUMNS, import_file
+from ..hashing import PasswordPoolBusy, password_pool, rfid_hasher
+from ..log_query import LogFilters, LogPage, InvalidLogQuery, log_query, serialize_logs
+from ..streaming import stream_requested, stream_json
+from ..conditional import CacheValidator, bump_version
 
 """ Registration """
 def add():
@@ -209,7 +26,6 @@ def add():
   return render_template('admin/registrasi.html')
 
 def add_student():
-  global error_user_msg
   sess_user_id = session.get('user_id')
   sess_user_role = session.get('user_role')
   # Check user session
@@ -219,7 +35,6 @@ def add_student():
   if sess_user_role != 'ADMIN':
     return abort(403)
   form = request.form
-  student_class = Class.query.all()
   if request.method == 'POST':
     student_name = form['student_name']
     student_nim = form['student_nim']
@@ -230,39 +45,45 @@ def add_student():
     student_home_address = form['student_home_address'] or None
     student_uid = form['student_uid']
     # Validate user form
-    is_form_valid = validate_user_form(
+    validation = validate_user_form(
       user_id=student_nim, user_role='STUDENT', user_fullname=student_name, user_pw=student_pw, user_confirm_pw=student_confirm_pw, user_email_address=student_email_address, user_uid=student_uid, user_home_address=student_home_address, student_class=student_class
     )
     # Check if the form is valid
-    if not is_form_valid:
+    if not validation:
       # Show to error message
-      flash(error_user_msg, 'danger')
-      # Clear the error messages after flashing
-      error_user_msg = []
+      flash(validation.errors, 'danger')
+      return redirect(url_for('admin_ep.add_student'))
+    try:
+      password_hash = password_pool.hash(student_pw)
+    except PasswordPoolBusy:
+      flash('Server is busy, please try again in a moment.', 'warning')
       return redirect(url_for('admin_ep.add_student'))
     # If the form valid, then add new student to database based on the form input
     new_student = User (
       user_id = student_nim,
       user_role = 'STUDENT',
       user_fullname = student_name,
-      user_password_hash = generate_password_hash(student_pw),
-      user_rfid_hash = student_uid,
+      user_password_hash = password_hash,
+      user_rfid_hash = rfid_hasher.digest(student_uid),
       user_email_address = student_email_address,
       user_home_address = student_home_address,
       student_class = student_class
     )
     # Add new student to database
     db.session.add(new_student)
+    bump_version('users')
     db.session.commit()
+    publish_reload('user', new_student.user_id)
     flash('Student successfully registered!', 'success')
     return redirect(url_for('admin_ep.add'))
+  # Choices of the form, not needed by a submit
+  student_class = Class.query.all()
   return render_template(
     'admin/regis-mhsw.html',
     student_class=student_class
   )
 
 def add_lecturer():
-  global error_user_msg
   sess_user_id = session.get('user_id')
   sess_user_role = session.get('user_role')
   # Check user session
@@ -283,27 +104,32 @@ def add_lecturer():
     lecturer_home_address = form['lecturer_home_address'] or None
     lecturer_uid = form['lecturer_uid']
     # Validate the user form
-    is_form_valid = validate_user_form(
+    validation = validate_user_form(
       user_id=lecturer_nip, user_role='LECTURER', user_fullname=lecturer_name, user_pw=lecturer_pw, user_confirm_pw=lecturer_confirm_pw, user_email_address=lecturer_email_address, user_uid=lecturer_uid, user_home_address=lecturer_home_address, lecturer_major=lecturer_major
     )
-    if not is_form_valid:
+    if not validation:
       # Show to error message
-      flash(error_user_msg, 'danger')
-      # Clear the error messages after flashing
-      error_user_msg = []
+      flash(validation.errors, 'danger')
+      return redirect(url_for('admin_ep.add_lecturer'))
+    try:
+      password_hash = password_pool.hash(lecturer_pw)
+    except PasswordPoolBusy:
+      flash('Server is busy, please try again in a moment.', 'warning')
       return redirect(url_for('admin_ep.add_lecturer'))
     new_lecturer = User (
       user_id = lecturer_nip,
       user_role = 'LECTURER',
       user_fullname = lecturer_name,
-      user_password_hash = generate_password_hash(lecturer_pw),
-      user_rfid_hash = lecturer_uid,
+      user_password_hash = password_hash,
+      user_rfid_hash = rfid_hasher.digest(lecturer_uid),
       user_email_address = lecturer_email_address,
       user_home_address = lecturer_home_address,
       lecturer_major = lecturer_major
     )
     db.session.add(new_lecturer)
+    bump_version('users')
     db.session.commit()
+    publish_reload('user', new_lecturer.user_id)
     flash('Lecturer successfully registered!', 'success')
     return redirect(url_for('admin_ep.add'))
   return render_template(
@@ -312,17 +138,12 @@ def add_lecturer():
   )
 
 def add_course():
-  global error_course_msg
   sess_user_id = session.get('user_id')
   sess_user_role = session.get('user_role')
   if not (sess_user_id and sess_user_role):
     return redirect(url_for('user_ep.login'))
   if sess_user_role != 'ADMIN':
     return abort(403)
-  list_classes = Class.query.all()
-  days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-  lecturers = User.query.filter_by(user_role='LECTURER').all()
-  rooms = Room.query.all()
   form = request.form
   if request.method == 'POST':
     course_name = form['course_name']
@@ -337,16 +158,17 @@ def add_course():
     class_id = form['class_id']
     room_id = form['room_id']
     # Validate course form
-    is_course_form_valid = validate_course_form(
+    validation = validate_course_form(
       course_id=course_id, course_name=course_name, course_sks=course_sks, at_semester=course_semester, day=course_day, 
       time_start=course_start, time_end=course_end, course_description=course_description,
       lecturer_nip=lecturer_nip, class_id=class_id, room_id=room_id
     )
+    time_start, time_end = parse_time(course_start), parse_time(course_end)
+    if time_start is None or time_end is None:
+      validation.add('Time start and time end must be in format HH:MM:SS!')
     # Check if the form is valid
-    if not is_course_form_valid:
-      flash(error_course_msg, 'danger')
-      # Clear the error messages after flashing
-      error_course_msg = []
+    if not validation:
+      flash(validation.errors, 'danger')
       return redirect(url_for('admin_ep.add_course'))
     # If the form valid, then add new course to database based on the form input
     new_course = Course (
@@ -355,8 +177,8 @@ def add_course():
       course_sks = course_sks,
       at_semester = course_semester,
       day = course_day,
-      time_start = course_start,
-      time_end = course_end,
+      time_start = time_start,
+      time_end = time_end,
       course_description = course_description,
       lecturer_nip = lecturer_nip,
       class_id = class_id,
@@ -364,9 +186,16 @@ def add_course():
     )
     # Add new course to database
     db.session.add(new_course)
+    bump_version('courses')
     db.session.commit()
+    publish_reload('courses')
     flash('Course successfully registered!', 'success')
     return redirect(url_for('admin_ep.add'))
+  # Choices of the form, not needed by a submit
+  list_classes = Class.query.all()
+  days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+  lecturers = User.query.filter_by(user_role='LECTURER').all()
+  rooms = Room.query.all()
   return render_template(
     'admin/regis-course.html',
     list_classes=list_classes,
@@ -374,69 +203,106 @@ def add_course():
     lecturers=lecturers,
     rooms=rooms
   )
+
+def import_data():
+  """
+  This is a view of bulk import page, it imports a CSV or XLSX file of students, lecturers or courses.
+  Rejected rows are reported without aborting the rest of the file.
+  """
+  sess_user_id = session.get('user_id')
+  sess_user_role = session.get('user_role')
+  if not (sess_user_id and sess_user_role):
+    return redirect(url_for('user_ep.login'))
+  if sess_user_role != 'ADMIN':
+    return abort(403)
+  report = None
+  status = 200
+  if request.method == 'POST':
+    import_kind = request.form.get('import_kind')
+    import_upload = request.files.get('import_file')
+    if import_kind not in IMPORT_COLUMNS or not (import_upload and import_upload.filename):
+      flash(['Please choose the data type and the file to import!'], 'danger')
+      return redirect(url_for('admin_ep.import_data'))
+    try:
+      report = import_file(
+        import_kind, import_upload.stream, import_upload.filename,
+        batch_size=current_app.config.get('IMPORT_BATCH_SIZE', 500)
+      ).to_dict()
+    except ValueError as err:
+      flash([str(err)], 'danger')
+      return redirect(url_for('admin_ep.import_data'))
+    # Stopped on a busy password pool, the rows before it are imported (the report tells the row)
+    if report['stopped']:
+      status = 503
+    # Scripts can ask for the report in JSON format
+    if request.accept_mimetypes.best == 'application/json':
+      return jsonify(report), status
+  return render_template(
+    'admin/import.html',
+    import_columns=IMPORT_COLUMNS,
+    report=report
+  ), status
 """ End of registration """
 
 """ Courses """
-def serialized_course(class_id:str = None):
+def course_query(class_id:str = None):
   """
-  This function is to serialize course data based on class_id.
-  Required param: class_id (str)
+  This function is to query the columns of the course listing, one plain row per course
+  with the lecturer name and the number of students of the class.
+  Optional param: class_id (str), only the courses of this class
   """
-  serialized_courses = [] # Empty list to store serialized courses
+  # Students of every class, counted once for all the courses
+  class_students = (
+    db.session.query(User.student_class.label('class_id'), func.count(User.user_id).label('total'))
+    .filter(User.user_role == 'STUDENT')
+    .group_by(User.student_class)
+    .subquery()
+  )
+  courses = (
+    db.session.query(
+      Course.course_id, Course.course_name, User.user_fullname, func.coalesce(class_students.c.total, 0),
+      Course.course_sks, Course.at_semester, Course.day, Course.time_start, Course.time_end,
+      Course.course_description, Course.class_id, Course.room_id
+    )
+    .join(User, User.user_id == Course.lecturer_nip)
+    .outerjoin(class_students, class_students.c.class_id == Course.class_id)
+  )
   # Check if class id param is passed
   if class_id:
-    # Query to get all the courses data based on class_id
-    courses = (
-      db.session.query(Course)
-      .join(User, User.user_id == Course.lecturer_nip)
-      .options(joinedload(Course.class_course))
-      .filter(Course.class_id == class_id)
-      .all()
-    )
-    # Serialize courses to JSON format
-    serialized_courses = [
-      {
-        'course_id': course.course_id,
-        'course_name': course.course_name,
-        'lecturer': course.user_course.user_fullname,
-        'total_students': len(course.class_course.courses),
-        'course_sks': course.course_sks,
-        'at_semester': course.at_semester,  # Added comma here
-        'day': course.day,
-        'time_start': str(course.time_start),
-        'time_end': str(course.time_end),
-        'course_description': course.course_description,
-        'class_id': course.class_id,
-        'room_id': course.room_id
-      }
-      for course in courses
-    ]
-  else:
-    courses = (
-    db.session.query(Course)
-      .join(User, User.user_id == Course.lecturer_nip)
-      .options(joinedload(Course.class_course))
-    ).all()
-    # Serialize all courses to JSON format
-    serialized_courses = [
-      {
-        'course_id': course.course_id,
-        'course_name': course.course_name,
-        'lecturer': course.user_course.user_fullname,
-        'total_students': len(course.class_course.courses),
-        'course_sks': course.course_sks,
-        'at_semester': course.at_semester,  # Added comma here
-        'day': course.day,
-        'time_start': str(course.time_start),
-        'time_end': str(course.time_end),
-        'course_description': course.course_description,
-        'class_id': course.class_id,
-        'room_id': course.room_id
-      }
-      for course in courses
-    ]
-  # Return the serialized courses
-  return serialized_courses
+    courses = courses.filter(Course.class_id == class_id)
+  return courses
+
+def serialize_courses(rows) -> list:
+  """
+  This function is to turn rows of course_query() into the courses of get_courses (JSON format).
+  """
+  return [
+    {
+      'course_id': course_id,
+      'course_name': course_name,
+      'lecturer': lecturer,
+      'total_students': total_students,
+      'course_sks': course_sks,
+      'at_semester': at_semester,
+      'day': day,
+      'time_start': str(time_start),
+      'time_end': str(time_end),
+      'course_description': course_description,
+      'class_id': class_id,
+      'room_id': room_id
+    }
+    for (
+      course_id, course_name, lecturer, total_students, course_sks, at_semester,
+      day, time_start, time_end, course_description, class_id, room_id
+    ) in rows
+  ]
+
+def serialized_course(class_id:str = None):
+  """
+  This function is to serialize course data based on class_id.
+  Optional param: class_id (str), all the courses without it
+  """
+  return serialize_courses(course_query(class_id).all())
 
 def get_courses():
   sess_user_id = session.get('user_id')
@@ -447,10 +313,17 @@ def get_courses():
     return abort(403)
   # Get class id from query param
   class_id = request.args.get('class_id', type=str)
+  # Nothing to send when no user or course changed since the client got them
+  validator = CacheValidator()
+  if validator.not_modified():
+    return validator.apply(Response(status=304))
+  # Streaming mode: the courses are written to the response batch by batch
+  if stream_requested():
+    return validator.apply(stream_json('courses', course_query(class_id=class_id), serialize_courses))
   # Serialized course
   courses = serialized_course(class_id=class_id)
   # courses list to store serialized courses
-  return jsonify({"courses": courses}), 200
+  return validator.apply(jsonify({"courses": courses})), 200
 
 def courses():
   """
@@ -479,13 +352,16 @@ def classes():
   if sess_user_role != 'ADMIN':
     return abort(403)
   classes = Class.query.all()
+  # Count the students of every class in one query
+  class_students = dict(
+    db.session.query(User.student_class, func.count(User.user_id))
+    .filter_by(user_role='STUDENT')
+    .group_by(User.student_class)
+    .all()
+  )
   total_students = {}
   for c in classes:
-    count_students = User.query.filter_by(
-      student_class=c.class_id,
-      user_role='STUDENT'
-    ).count()
-    total_students[c.class_id] = count_students
+    total_students[c.class_id] = class_students.get(c.class_id, 0)
   # Return class render template
   return render_template(
     'admin/class.html',
@@ -495,7 +371,36 @@ def classes():
 """ End of classes """
 
 """ Attendance """
-def serialized_logs(selected_role:str, selected_course_id:str=None, student_nim:str=None, lecturer_nip:str=None) -> list:
+# Students are identified by their NIM, lecturers by their NIP
+USER_KEYS = {'STUDENT': 'nim', 'LECTURER': 'nip'}
+
+def attendance_logs_scope(selected_role:str, selected_course_id:str=None, user_id:str=None) -> tuple:
+  """
+  This function is to build the conditions of the attendance logs of a role, optionally of a course and a user.
+  """
+  criteria = (AttendanceLogs.user_role == selected_role,)
+  # Check if course_id is passed in query string
+  if selected_course_id:
+    criteria += (AttendanceLogs.course_id == selected_course_id,)
+  if user_id:
+    criteria += (AttendanceLogs.user_id == user_id,)
+  return criteria
+
+def attendance_logs_query(selected_role:str, selected_course_id:str=None, user_id:str=None, filters:LogFilters=None):
+  """
+  This function is to query the attendance logs of a role (log_query() rows).
+  Required param: selected_role (str), and
+  Optional params:
+    - selected_course_id (str)
+    - user_id (str), nim or nip
+    - filters (LogFilters), only the logs matching the filters
+  """
+  attendance_logs = log_query().filter(*attendance_logs_scope(selected_role, selected_course_id, user_id))
+  if filters:
+    attendance_logs = filters.apply(attendance_logs)
+  return attendance_logs
+
+def serialized_logs(selected_role:str, selected_course_id:str=None, student_nim:str=None, lecturer_nip:str=None, filters:LogFilters=None, page:LogPage=None) -> list:
   """
   This function is for serializing or converting user attendance logs based on selected role and selected course id in JSON format.
   Required param: selected_role (str), and
@@ -503,65 +408,24 @@ def serialized_logs(selected_role:str, selected_course_id:str=None, student_nim:
     - selected_course_id (str)
     - student_nim (str)
     - lecturer_nip (str)
+    - filters (LogFilters), only the logs matching the filters
+    - page (LogPage), only the logs of this page (all of them without it)
   """
-  # A list to store serialized logs (in JSON format)
-  serialized_logs = []
-  if selected_role == 'STUDENT':
-    student_attendance_logs = db.session.query(StudentAttendanceLogs).options(
-      joinedload(StudentAttendanceLogs.user_student),
-      joinedload(StudentAttendanceLogs.course_student),
-      joinedload(StudentAttendanceLogs.room_student)
-    )
-    # Check if course_id is passed in query string
-    if selected_course_id:
-      student_attendance_logs = student_attendance_logs.filter_by(course_id=selected_course_id)
-    if student_nim:
-      student_attendance_logs = student_attendance_logs.filter_by(student_nim=student_nim)
-    # Get all student attendance logs
-    student_attendance_logs = student_attendance_logs.all()
-    # Serialize student attendance logs
-    serialized_logs = [
-      {
-        'log_id': log.log_id,
-        'nim': log.user_student.user_id,
-        'name': log.user_student.user_fullname,
-        'course': log.course_student.course_name,
-        'room': log.room_student.room_id,
-        'time_in': format_time(log.time_in),
-        'status': log.status.value
-      }
-      for log in student_attendance_logs
-    ]
-  elif selected_role == 'LECTURER':
-    lecturer_attendance_logs = db.session.query(LecturerAttendanceLogs).options(
-      joinedload(LecturerAttendanceLogs.user_lecturer),
-      joinedload(LecturerAttendanceLogs.course_lecturer),
-      joinedload(LecturerAttendanceLogs.room_lecturer)
-    )
-    # Check if course_id is passed in query string
-    if selected_course_id:
-      lecturer_attendance_logs = lecturer_attendance_logs.filter_by(course_id=selected_course_id)
-    if lecturer_nip:
-      lecturer_attendance_logs = lecturer_attendance_logs.filter_by(lecturer_nip=lecturer_nip)
-    # Get all lecturer attendance logs
-    lecturer_attendance_logs = lecturer_attendance_logs.all()
-    # Serialize lecturer attendance logs
-    serialized_logs = [
-      {
-        'log_id': log.log_id,
-        'nip': log.user_lecturer.user_id,
-        'name': log.user_lecturer.user_fullname,
-        'course': log.course_lecturer.course_name,
-        'room': log.room_lecturer.room_id,
-        'time_in': format_time(log.time_in),
-        'status': log.status.value
-      }
-      for log in lecturer_attendance_logs
-    ]
-  else:
+  if selected_role not in ['STUDENT', 'LECTURER']:
     return jsonify({'message': 'User role is not valid!'}), 400
-  # Return the serialized attendance logs
-  return serialized_logs
+  user_id = student_nim if selected_role == 'STUDENT' else lecturer_nip
+  attendance_logs = attendance_logs_query(selected_role, selected_course_id, user_id, filters)
+  attendance_logs = page.fetch(attendance_logs) if page else attendance_logs.all()
+  # Serialize the attendance logs (in JSON format)
+  return serialize_logs(attendance_logs, user_key=USER_KEYS[selected_role])
+
+def stream_logs(key:str, selected_role:str, selected_course_id:str=None, user_id:str=None, filters:LogFilters=None, page:LogPage=None):
+  """
+  This function is to stream every matching attendance log (streaming mode of the log endpoints), in the order of the pages.
+  """
+  attendance_logs = page.order(attendance_logs_query(selected_role, selected_course_id, user_id, filters))
+  user_key = USER_KEYS[selected_role]
+  return stream_json(key, attendance_logs, lambda rows: serialize_logs(rows, user_key=user_key))
 
 def get_attendance(selected_role:str):
   """
@@ -577,13 +441,26 @@ def get_attendance(selected_role:str):
   # If the selected role is student
   if selected_role in ['STUDENT', 'LECTURER']:
     selected_course_id = request.args.get('course_id', type=str)
+    try:
+      filters = LogFilters.from_request()
+      page = LogPage.from_request()
+    except InvalidLogQuery as e:
+      return jsonify({'message': str(e)}), 400
+    # Nothing to send when no log of the course (every log without a course), user or course changed since the client got it
+    log_criteria = attendance_logs_scope(selected_role, selected_course_id) if selected_course_id else ()
+    validator = CacheValidator(log_criteria=log_criteria)
+    if validator.not_modified():
+      return validator.apply(Response(status=304))
+    # Streaming mode: every matching log, without the page limit
+    if stream_requested():
+      return validator.apply(stream_logs('attendance', selected_role, selected_course_id, filters=filters, page=page))
     # Check if user pass course_id in query string
     if selected_course_id:
-      attendance_logs = serialized_logs(selected_role=selected_role, selected_course_id=selected_course_id)
-    # If not, then fetch all attendance logs
+      attendance_logs = serialized_logs(selected_role=selected_role, selected_course_id=selected_course_id, filters=filters, page=page)
+    # If not, then fetch the attendance logs of every course
     else:
-      attendance_logs = serialized_logs(selected_role=selected_role)
-    return jsonify({'attendance': attendance_logs}), 200
+      attendance_logs = serialized_logs(selected_role=selected_role, filters=filters, page=page)
+    return validator.apply(jsonify({'attendance': attendance_logs, 'next_cursor': page.next_cursor})), 200
   else:
     return jsonify({'message': 'User role is invalid'}), 400
 
@@ -665,17 +542,24 @@ def get_attendance_detail(selected_role:str):
   if selected_role in ['STUDENT', 'LECTURER']:
     student_nim = request.args.get('nim')
     lecturer_nip = request.args.get('nip')
-    # Check if nim is passed in query string
-    if student_nim:
-      student_attendance_logs = serialized_logs(selected_role=selected_role, student_nim=student_nim)
-      return jsonify({'attendance_detail': student_attendance_logs}), 200
-    # If the lecturer nip is passed in query string
-    elif lecturer_nip:
-      lecturer_attendance_logs = serialized_logs(selected_role=selected_role, lecturer_nip=lecturer_nip)
-      return jsonify({'attendance_detail': lecturer_attendance_logs}), 200
-    # Otherwise, return parameter error if the nim or nip is not passed in query string
-    else:
+    try:
+      filters = LogFilters.from_request()
+      page = LogPage.from_request()
+    except InvalidLogQuery as e:
+      return jsonify({'message': str(e)}), 400
+    # Return parameter error if the nim or nip is not passed in query string
+    if not (student_nim or lecturer_nip):
       return jsonify({"message": "You've to provide the student nim or lecturer nip in query parameters"}), 400
+    user_id = student_nim if selected_role == 'STUDENT' else lecturer_nip
+    # Nothing to send when no log of the user, user or course changed since the client got it
+    validator = CacheValidator(log_criteria=attendance_logs_scope(selected_role, user_id=user_id))
+    if validator.not_modified():
+      return validator.apply(Response(status=304))
+    # Streaming mode: every log of the student or lecturer, without the page limit
+    if stream_requested():
+      return validator.apply(stream_logs('attendance_detail', selected_role, user_id=user_id, filters=filters, page=page))
+    attendance_logs = serialized_logs(selected_role=selected_role, student_nim=student_nim, lecturer_nip=lecturer_nip, filters=filters, page=page)
+    return validator.apply(jsonify({'attendance_detail': attendance_logs, 'next_cursor': page.next_cursor})), 200
   # Return role error if the selected role is not student or lecturer
   return jsonify({"message": "User role is invalid"}), 400
 
@@ -724,7 +608,6 @@ def view_attendance_detail(selected_role:str):
 
 """ Edit action """
 def edit_student(nim:str):
-  global error_user_msg
   sess_user_id = session.get('user_id')
   sess_user_role = session.get('user_role')
   if not (sess_user_id and sess_user_role):
@@ -751,34 +634,36 @@ def edit_student(nim:str):
     student_email_address = form['student_email_address']
     student_home_address = form['student_home_address'] or None
     # Validate edit student form
-    is_valid_form = validate_user_form(
+    validation = validate_user_form(
       user_id=student_nim, user_role='STUDENT', user_fullname=student_name, user_pw=student_pw, user_confirm_pw=student_confirm_pw, user_email_address=student_email_address, user_uid=student_uid, user_home_address=student_home_address, student_class=student_class,
       edit_mode=True
     )
     # Check if form submit is valid
-    if not is_valid_form:
-      flash(error_user_msg, 'danger')
-      # Clear the error messages after flashing
-      error_user_msg = []
+    if not validation:
+      flash(validation.errors, 'danger')
       return redirect(url_for('user_ep.dashboard'))
     try:
       found_student.user_fullname = student_name
       # If the field student_pw is not empty, then generate the password hash
       if student_pw != "":
-        found_student.user_password_hash = generate_password_hash(student_pw)
-      # Same thing with the student_uid
+        found_student.user_password_hash = password_pool.hash(student_pw)
+      # Same thing with the student_uid (stored as its keyed digest)
       if student_uid != "":
-        found_student.user_rfid_hash = generate_password_hash(student_uid)
+        found_student.user_rfid_hash = rfid_hasher.digest(student_uid)
       found_student.user_email_address = student_email_address
       found_student.user_home_address = student_home_address
+      bump_version('users')
       db.session.commit()
+      publish_reload('user', found_student.user_id)
       flash('Update student data success', 'success')
+    except PasswordPoolBusy:
+      db.session.rollback()
+      flash('Server is busy, please try again in a moment.', 'warning')
     except Exception as err:
       flash(f'Update student data error. {err}', 'danger')
   return redirect(url_for('user_ep.dashboard'))
 
 def edit_lecturer(nip:str):
-  global error_user_msg
   sess_user_id = session.get('user_id')
   sess_user_role = session.get('user_role')
   if not (sess_user_id and sess_user_role):
@@ -805,34 +690,36 @@ def edit_lecturer(nip:str):
     lecturer_email_address = form['lecturer_email_address']
     lecturer_home_address = form['lecturer_home_address'] or None
     # Validate edit student form
-    is_valid_form = validate_user_form(
+    validation = validate_user_form(
       user_id=lecturer_nip, user_role='LECTURER', user_fullname=lecturer_name, user_pw=lecturer_pw, user_confirm_pw=lecturer_confirm_pw, user_email_address=lecturer_email_address, user_uid=lecturer_uid, user_home_address=lecturer_home_address, lecturer_major=lecturer_major,
       edit_mode=True
     )
     # Check if form submit is valid
-    if not is_valid_form:
-      flash(error_user_msg, 'danger')
-      # Clear the error messages after flashing
-      error_user_msg = []
+    if not validation:
+      flash(validation.errors, 'danger')
       return redirect(url_for('user_ep.dashboard'))
     try:
       found_lecturer.user_fullname = lecturer_name
       # If the field lecturer_pw is not empty, then generate the password hash
       if lecturer_pw != "":
-        found_lecturer.user_password_hash = generate_password_hash(lecturer_pw)
-      # Same thing with the lecturer_uid
+        found_lecturer.user_password_hash = password_pool.hash(lecturer_pw)
+      # Same thing with the lecturer_uid (stored as its keyed digest)
       if lecturer_uid != "":
-        found_lecturer.user_rfid_hash = generate_password_hash(lecturer_uid)
+        found_lecturer.user_rfid_hash = rfid_hasher.digest(lecturer_uid)
       found_lecturer.user_email_address = lecturer_email_address
       found_lecturer.user_home_address = lecturer_home_address
+      bump_version('users')
       db.session.commit()
+      publish_reload('user', found_lecturer.user_id)
       flash('Update lecturer data success', 'success')
+    except PasswordPoolBusy:
+      db.session.rollback()
+      flash('Server is busy, please try again in a moment.', 'warning')
     except Exception as err:
       flash(f'Update lecturer data error. {err}', 'danger')
   return redirect(url_for('user_ep.dashboard'))
 
 def edit_course(course_id:str):
-  global error_course_msg
   sess_user_id = session.get('user_id')
   sess_user_role = session.get('user_role')
   if not (sess_user_id and sess_user_role):
@@ -855,20 +742,22 @@ def edit_course(course_id:str):
     course_lecturer = form['course_lecturer']
     course_class = form['course_class']
     course_room = form['course_room']
-    # Get nim of course lecturer
-    lecturer_nip = User.query.filter_by(user_fullname=course_lecturer).first().user_id
+    # Get nim of course lecturer (an unknown one fails the validation)
+    found_lecturer = User.query.filter_by(user_fullname=course_lecturer, user_role='LECTURER').first()
+    lecturer_nip = found_lecturer.user_id if found_lecturer else ''
     # Validate the course edit form
-    is_valid_course_form = validate_course_form(
+    validation = validate_course_form(
       course_id=course_id, course_name=course_name, course_sks=course_sks, at_semester=course_semester, day=course_day, 
       time_start=course_time_start, time_end=course_time_end, course_description=course_description,
       lecturer_nip=lecturer_nip, class_id=course_class, room_id=course_room,
       edit_mode=True
     )
+    time_start, time_end = parse_time(course_time_start), parse_time(course_time_end)
+    if time_start is None or time_end is None:
+      validation.add('Time start and time end must be in format HH:MM:SS!')
     # Check if the form is valid
-    if not is_valid_course_form:
-      flash(error_course_msg, 'danger')
-      # Clear the error messages after flashing
-      error_course_msg = []
+    if not validation:
+      flash(validation.errors, 'danger')
       return redirect(url_for('admin_ep.courses'))
     # If the form valid, then update the course data based on the form input
     try:
@@ -876,13 +765,15 @@ def edit_course(course_id:str):
       found_course.course_sks = course_sks
       found_course.at_semester = course_semester
       found_course.day = course_day
-      found_course.time_start = course_time_start
-      found_course.time_end = course_time_end
+      found_course.time_start = time_start
+      found_course.time_end = time_end
       found_course.course_description = course_description
       found_course.lecturer_nip = lecturer_nip
       found_course.class_id = course_class
       found_course.room_id = course_room
+      bump_version('courses')
       db.session.commit()
+      publish_reload('courses')
       flash('Update course data success!', 'success')
     except Exception as err:
       flash(f'Update course data failed. {err}!', 'danger')
@@ -908,7 +799,9 @@ def delete_student(nim:str):
   if request.method == 'POST':
     try:
       db.session.delete(found_student)
+      bump_version('users')
       db.session.commit()
+      publish_reload('user', nim)
       flash('Delete student data success!', 'success')
     except Exception as err:
       flash(f'Delete student data failed. {err}!', 'danger')
@@ -930,15 +823,26 @@ def delete_lecturer(nip:str):
     return redirect(url_for('user_ep.dashboard'))
   if request.method == 'POST':
     try:
+      # Courses of the lecturer and their logs are deleted along with it, in bulk
+      # (the ORM cascade would load the logs course by course)
+      lecturer_courses = db.session.query(Course.course_id).filter(Course.lecturer_nip == nip)
+      AttendanceLogs.query.filter(
+        (AttendanceLogs.user_id == nip) | AttendanceLogs.course_id.in_(lecturer_courses)
+      ).delete(synchronize_session=False)
+      Course.query.filter(Course.lecturer_nip == nip).delete(synchronize_session=False)
       db.session.delete(found_lecturer)
+      bump_version('users')
+      bump_version('courses')
       db.session.commit()
+      publish_reload('user', nip)
+      # Courses of the lecturer are deleted along with it
+      publish_reload('courses')
       flash('Delete lecturer data success!', 'success')
     except Exception as err:
       flash(f'Delete lecturer data failed. {err}!', 'danger')
   return redirect(url_for('user_ep.dashboard'))
 
 def delete_course(course_id:str):
-  global error_user_msg
   sess_user_id = session.get('user_id')
   sess_user_role = session.get('user_role')
   if not (sess_user_id and sess_user_role):
@@ -952,7 +856,9 @@ def delete_course(course_id:str):
   if request.method == 'POST':
     try:
       db.session.delete(found_course)
+      bump_version('courses')
       db.session.commit()
+      publish_reload('courses')
       flash('Delete course data success!', 'success')
     except Exception as err:
       flash(f'Delete course data failed. {err}!', 'danger')
@@ -1,40 +1,32 @@
 from flask import redirect, url_for, render_template, request, flash, session, abort, jsonify, Response
 from flask_argon2 import generate_password_hash
 from datetime import datetime
-from sqlalchemy.orm import joinedload
 import pandas as pd
 from io import BytesIO
+import logging
 
 from ..models import *
+from ..log_query import LogFilters, LogPage, InvalidLogQuery, log_query, serialize_logs
+from ..streaming import stream_requested, stream_json
+from ..conditional import CacheValidator
 
-# function helper
-def format_time(time_object:datetime):
-  formatted_time = time_object.strftime('%a, %d %b %Y %H:%M:%S')
-  return formatted_time
-# end function helper
+logger = logging.getLogger(__name__)
 
 """ LECTURER ATTENDANCE LOGS """
-def serialized_lecturer_logs(lecturer_nip:str, course_id:str = None) -> list:
-    serialized_lecturer_logs = [] # Empty list to store serialized courses
-    lecturer_logs = db.session.query(LecturerAttendanceLogs).options (
-        joinedload(LecturerAttendanceLogs.user_lecturer),
-        joinedload(LecturerAttendanceLogs.course_lecturer)
-    )
+def lecturer_logs_query(lecturer_nip:str, course_id:str = None, filters:LogFilters = None):
+    lecturer_logs = log_query()
     if course_id:
-        lecturer_logs = lecturer_logs.filter_by(course_id=course_id)
-    lecturer_logs = lecturer_logs.filter_by(lecturer_nip=lecturer_nip).all()
-    serialized_lecturer_logs = [
-        {
-            'log_id': log.log_id,
-            'name': log.user_lecturer.user_fullname,
-            'course': log.course_lecturer.course_name,
-            'room': log.room_id,
-            'time_in': format_time(log.time_in),
-            'status': log.status.value
-        }
-        for log in lecturer_logs
-    ]
-    print(serialized_lecturer_logs)
+        lecturer_logs = lecturer_logs.filter(AttendanceLogs.course_id == course_id)
+    lecturer_logs = lecturer_logs.filter(AttendanceLogs.user_id == lecturer_nip, AttendanceLogs.user_role == 'LECTURER')
+    if filters:
+        lecturer_logs = filters.apply(lecturer_logs)
+    return lecturer_logs
+
+def serialized_lecturer_logs(lecturer_nip:str, course_id:str = None, filters:LogFilters = None, page:LogPage = None) -> list:
+    lecturer_logs = lecturer_logs_query(lecturer_nip, course_id, filters)
+    lecturer_logs = page.fetch(lecturer_logs) if page else lecturer_logs.all()
+    serialized_lecturer_logs = serialize_logs(lecturer_logs)
+    logger.debug("Lecturer logs: %s", serialized_lecturer_logs)
 
     return serialized_lecturer_logs
 
@@ -50,11 +42,29 @@ def get_lecturer_logs():
     if (not found_lecturer) and (sess_user_role != 'LECTURER'):
         return abort(403)
     course_id = request.args.get('course_id')
+    try:
+        filters = LogFilters.from_request()
+        page = LogPage.from_request()
+    except InvalidLogQuery as e:
+        return jsonify({'message': str(e)}), 400
+    # Nothing to send when no log of the lecturer, user or course changed since the client got it
+    log_criteria = (AttendanceLogs.user_id == sess_user_id, AttendanceLogs.user_role == 'LECTURER')
+    if course_id:
+        log_criteria += (AttendanceLogs.course_id == course_id,)
+    validator = CacheValidator(log_criteria=log_criteria)
+    if validator.not_modified():
+        return validator.apply(Response(status=304))
+    # Streaming mode: every matching log, without the page limit
+    if stream_requested():
+        lecturer_logs = page.order(lecturer_logs_query(sess_user_id, course_id, filters))
+        return validator.apply(stream_json('logs', lecturer_logs, serialize_logs))
     lecturer_logs = serialized_lecturer_logs(
         lecturer_nip=sess_user_id,
-        course_id=course_id
+        course_id=course_id,
+        filters=filters,
+        page=page
     )
-    return jsonify({'logs': lecturer_logs}), 200
+    return validator.apply(jsonify({'logs': lecturer_logs, 'next_cursor': page.next_cursor})), 200
 
 def view_lecturer_logs():
     sess_user_id = session.get('user_id')
@@ -121,123 +131,75 @@ def view_student_data():
     if sess_user_role != 'LECTURER':
         return abort(403)
     courses = Course.query.filter_by(lecturer_nip=sess_user_id).all()
-    print(sess_user_id)
+    logger.debug("Lecturer: %s", sess_user_id)
     return render_template(
         'lecturer/rekap_absen_mhs.html',
         courses=courses
     )
 
-def serialized_student_data(selected_course:str):
-    sess_user_id = session.get('user_id')
-    sess_user_role = session.get('user_role')
-    # Check user session
-    if not (sess_user_id and sess_user_role):
-        return redirect(url_for('user_ep.login'))
-    # Check user role
-    if sess_user_role != 'LECTURER':
-        return abort(403)
-    lecturer = User.query.filter_by(user_id=sess_user_id, user_role='LECTURER').first()
-    courses = Course.query.filter_by(lecturer_nip=lecturer.user_id).all()
-    serialized_data = []
-    if selected_course:
-        student_data = (
-            User.query
-                .join(Class, User.student_class == Class.class_id)
-                .join(Course, Course.class_id == Class.class_id)
-                .filter(Course.course_id.in_([course.course_id for course in courses]))
-                .all()
+def serialized_student_data(lecturer_nip:str, selected_course:str) -> list:
+    """
+    This function is for serializing the students of a course taught by the lecturer, with one query.
+    Required params: lecturer_nip (str) and selected_course (str)
+    """
+    student_data = (
+        db.session.query(User.user_id, User.user_fullname, User.student_class, Course.course_name)
+            .join(Course, Course.class_id == User.student_class)
+            .filter(
+                Course.course_id == selected_course,
+                Course.lecturer_nip == lecturer_nip,
+                User.user_role == 'STUDENT'
             )
-        student_courses = {}
-        # Iterasi untuk setiap course yang diajarkan oleh lecturer
-        for course in courses:
-        # Mengambil mahasiswa yang mengikuti kursus tertentu
-            students = (
-                    User.query
-                    .join(Class, User.student_class == Class.class_id)
-                    .join(Course, Course.class_id == Class.class_id)
-                    .filter(Course.course_id == course.course_id)
-                    .all()
-                )
-        # Menambahkan data ke dictionary student_courses
-        student_courses[course.course_id] = {
-            'course_name': course.course_name,
-            'students': students
-        }
-        # Get all student attendance logs
-        student_data = student_data.all()
-        # Serialize student attendance logs
-        serialized_data = [
+            .order_by(User.user_id)
+            .all()
+    )
+    return [
         {
-            'nim': data.user_id,
-            'student_name': data.user_full_name,
+            'user_id': data.user_id,
+            'user_fullname': data.user_fullname,
             'student_class': data.student_class,
-            'student_course': data.student_courses['course_name']
+            'student_courses': {'course_name': data.course_name}
         }
         for data in student_data
-        ]
-    else:
-        return jsonify({'message': 'User role is not valid!'}), 400
-    # Return the serialized attendance logs
-    return serialized_data
+    ]
 
 def get_student_data(selected_course:str):
+    """
+    This function is to send the students of the selected course (taught by the lecturer) in JSON format.
+    Required param: selected_course (str)
+    """
     sess_user_id = session.get('user_id')
     sess_user_role = session.get('user_role')
     if not (sess_user_id and sess_user_role):
         return redirect(url_for('user_ep.login'))
     if sess_user_role != 'LECTURER':
         return abort(403)
-    # If the selected role is student
-    if selected_course:
-        attendance_logs = serialized_student_data(selected_course=selected_course)
-        return jsonify({'attendance': attendance_logs}), 200
-    else:
-        return jsonify({'message': 'User role is invalid'}), 400
+    students = serialized_student_data(lecturer_nip=sess_user_id, selected_course=selected_course)
+    return jsonify({'students': students}), 200
 
-def serialized_student_logs(selected_course:str, student_nim:str=None) -> list:
+def lecturer_course(lecturer_nip:str, course_id:str):
     """
-    This function is for serializing or converting user attendance logs based on selected role and selected course id in JSON format.
-    Required param: selected_course (str)
-    Optional params:
-        - student_nim (str)
+    This function is to get the course if the lecturer teaches it (or None).
     """
-    # A list to store serialized logs (in JSON format)
-    serialized_student_logs = []
-
-    if selected_course:
-        student_logs = db.session.query(StudentAttendanceLogs).options(
-            joinedload(StudentAttendanceLogs.user_student),
-            joinedload(StudentAttendanceLogs.course_student),
-            joinedload(StudentAttendanceLogs.room_student)
-        )
+    return Course.query.filter_by(course_id=course_id, lecturer_nip=lecturer_nip).first()
 
-        # Check if student_nim is passed in query string
-        if student_nim:
-            student_logs = student_logs.filter_by(student_nim=student_nim)
-
-        # Filter student attendance logs based on selected_course
-        student_logs = student_logs.filter_by(course_id=selected_course).all()
-
-        # Serialize student attendance logs
-        serialized_student_logs = [
-            {
-                'log_id': log.log_id,
-                'nim': log.user_student.user_id,
-                'name': log.user_student.user_fullname,
-                'course': log.course_student.course_name,
-                'room': log.room_student.room_id,
-                'time_in': format_time(log.time_in),
-                'status': log.status.value
-            }
-            for log in student_logs
-        ]
-    else:
-        return jsonify({'message': 'Course ID must be provided!'}), 400
-
-    # Return the serialized attendance logs
-    return serialized_student_logs
+def student_logs_query(course_id:str, student_nim:str = None, filters:LogFilters = None):
+    """
+    This function is to query the student attendance logs of a course (log_query() rows), of one student if given.
+    """
+    student_logs = log_query().filter(AttendanceLogs.course_id == course_id, AttendanceLogs.user_role == 'STUDENT')
+    if student_nim:
+        student_logs = student_logs.filter(AttendanceLogs.user_id == student_nim)
+    if filters:
+        student_logs = filters.apply(student_logs)
+    return student_logs
 
-def get_student_logs():
+def get_student_logs(course_id:str):
+    """
+    This function is to send the student attendance logs of a course taught by the lecturer in JSON format,
+    of one student with the nim query parameter (same filters, page and streaming mode as get_lecturer_logs).
+    Required param: course_id (str)
+    """
     sess_user_id = session.get('user_id')
     sess_user_role = session.get('user_role')
     # Check user session
@@ -246,8 +208,33 @@ def get_student_logs():
     # Check user role
     if sess_user_role != 'LECTURER':
         return abort(403)
+    if not lecturer_course(sess_user_id, course_id):
+        return jsonify({'message': 'Course not found'}), 404
+    student_nim = request.args.get('nim')
+    try:
+        filters = LogFilters.from_request()
+        page = LogPage.from_request()
+    except InvalidLogQuery as e:
+        return jsonify({'message': str(e)}), 400
+    # Nothing to send when no student log of the course, user or course changed since the client got it
+    log_criteria = (AttendanceLogs.course_id == course_id, AttendanceLogs.user_role == 'STUDENT')
+    if student_nim:
+        log_criteria += (AttendanceLogs.user_id == student_nim,)
+    validator = CacheValidator(log_criteria=log_criteria)
+    if validator.not_modified():
+        return validator.apply(Response(status=304))
+    # Streaming mode: every matching log, without the page limit
+    if stream_requested():
+        student_logs = page.order(student_logs_query(course_id, student_nim, filters))
+        return validator.apply(stream_json('attendance_detail', student_logs, lambda rows: serialize_logs(rows, user_key='nim')))
+    student_logs = serialize_logs(page.fetch(student_logs_query(course_id, student_nim, filters)), user_key='nim')
+    return validator.apply(jsonify({'attendance_detail': student_logs, 'next_cursor': page.next_cursor})), 200
 
-def view_student_logs():
+def view_student_logs(course_id:str):
+    """
+    This is a view page of the attendance logs of a student (nim query parameter) in a course taught by the lecturer.
+    Required param: course_id (str)
+    """
     sess_user_id = session.get('user_id')
     sess_user_role = session.get('user_role')
     # Check user session
@@ -256,12 +243,18 @@ def view_student_logs():
     # Check user role
     if sess_user_role != 'LECTURER':
         return abort(403)
-    courses = Course.query.filter_by(lecturer_nip=sess_user_id).all()
-    print(sess_user_id)
+    course = lecturer_course(sess_user_id, course_id)
+    # Only a student of the class of the course
+    student = User.query.filter_by(
+        user_id=request.args.get('nim'),
+        user_role='STUDENT',
+        student_class=course.class_id
+    ).first() if course else None
+    if not student:
+        flash("Student not found!", 'danger')
+        return redirect(url_for('lecturer_ep.view_student_data'))
     return render_template(
         'lecturer/student-attendance-detail.html',
-        courses=courses
+        student=student,
+        course=course
     )
-
-
-
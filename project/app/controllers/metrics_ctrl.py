@@ -0,0 +1,16 @@
+from flask import Response, abort, current_app, request
+
+from ..metrics import registry, is_authorized
+
+def metrics():
+  """
+  This function is to expose the metrics of this process (requests and SQL profiler) in the Prometheus text format.
+  Only served when METRICS_TOKEN is set, to a scraper sending it as a Bearer token.
+  The tap metrics are served by the ingest process (INGEST_METRICS_PORT).
+  """
+  token = current_app.config.get('METRICS_TOKEN')
+  if not token:
+    return abort(404)
+  if not is_authorized(request.headers.get('Authorization'), token):
+    return Response('Unauthorized', status=401, headers={'WWW-Authenticate': 'Bearer'})
+  return Response(registry.render(), mimetype='text/plain; version=0.0.4')
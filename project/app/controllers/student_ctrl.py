@@ -1,9 +1,11 @@
 from flask import redirect, url_for, render_template, request, flash, session, abort, jsonify, Response
 from flask_argon2 import generate_password_hash
 from datetime import datetime
-from sqlalchemy.orm import joinedload
 
 from ..models import *
+from ..log_query import LogFilters, LogPage, InvalidLogQuery, log_query, serialize_logs
+from ..streaming import stream_requested, stream_json
+from ..conditional import CacheValidator
 
 """ Function helper """
 def student_dashboard():
@@ -35,11 +37,14 @@ def student_dashboard():
     lecturers_nip = [course.lecturer_nip for course in student_courses]
     lecturer = User.query.filter(User.user_id.in_(lecturers_nip), User.user_role == 'LECTURER').first()
 
-    # Fetch student attendance logs for each course
-    attendance_data = {}
-    for course in student_courses:
-        attendance_logs = StudentAttendanceLogs.query.filter_by(student_nim=student.user_id, course_id=course.course_id).all()
-        attendance_data[course.course_id] = attendance_logs
+    # Fetch student attendance logs of every course in one query, then group them per course
+    attendance_data = {course.course_id: [] for course in student_courses}
+    attendance_logs = AttendanceLogs.query.filter(
+        AttendanceLogs.user_id == student.user_id,
+        AttendanceLogs.course_id.in_(attendance_data.keys())
+    ).all()
+    for log in attendance_logs:
+        attendance_data[log.course_id].append(log)
 
     return render_template('student/index.html', student=student, student_courses=student_courses, lecturer=lecturer, attendance_data=attendance_data)
 
@@ -56,12 +61,20 @@ def course():
 
     
 """ Attendance """
-def format_time(time_object: datetime):
-    formatted_time = time_object.strftime('%a, %d %b %Y %H:%M:%S')
-    return formatted_time
-""" End of function helper """
 
-def serialized_logs(student_nim:str, selected_course_id:str) -> list:
+def student_logs_query(student_nim:str, selected_course_id:str, filters:LogFilters=None):
+  """
+  This function is to query the attendance logs of a student in a course (log_query() rows).
+  """
+  student_attendance_logs = log_query().filter(
+    AttendanceLogs.user_id == student_nim,
+    AttendanceLogs.course_id == selected_course_id
+  )
+  if filters:
+    student_attendance_logs = filters.apply(student_attendance_logs)
+  return student_attendance_logs
+
+def serialized_logs(student_nim:str, selected_course_id:str, filters:LogFilters=None, page:LogPage=None) -> list:
   """
   This function is for serializing or converting user attendance logs based on selected role and selected course id in JSON format.
   Required param: selected_role (str), and
@@ -70,32 +83,36 @@ def serialized_logs(student_nim:str, selected_course_id:str) -> list:
     - student_nim (str)
     - lecturer_nip (str)
   """
-  # A list to store serialized logs (in JSON format)
-  serialized_logs = []
-  student_attendance_logs = db.session.query(StudentAttendanceLogs).options(
-    joinedload(StudentAttendanceLogs.user_student),
-    joinedload(StudentAttendanceLogs.course_student),
-    joinedload(StudentAttendanceLogs.room_student)
-  )
-  student_attendance_logs = student_attendance_logs.filter_by(
-    student_nim=student_nim,
-    course_id=selected_course_id
-  ).all()
-  # Serialize student attendance logs
-  serialized_logs = [
-      {
-        'log_id': log.log_id,
-        'nim': log.user_student.user_id,
-        'name': log.user_student.user_fullname,
-        'course': log.course_student.course_name,
-        'room': log.room_student.room_id,
-        'time_in': format_time(log.time_in),
-        'status': log.status.value
-      }
-      for log in student_attendance_logs
-  ]
-  # Return the serialized attendance logs
-  return serialized_logs
+  student_attendance_logs = student_logs_query(student_nim, selected_course_id, filters)
+  student_attendance_logs = page.fetch(student_attendance_logs) if page else student_attendance_logs.all()
+  # Serialize student attendance logs (in JSON format)
+  return serialize_logs(student_attendance_logs, user_key='nim')
+
+def student_logs_response(key:str, student_nim:str, selected_course:str):
+    """
+    This function is to build the JSON response (key -> logs) of the logs of a student in a course,
+    with the filters, the page, the streaming mode and the validators of the log endpoints.
+    """
+    try:
+      filters = LogFilters.from_request()
+      page = LogPage.from_request()
+    except InvalidLogQuery as e:
+      return jsonify({'message': str(e)}), 400
+    # Nothing to send when no log of the student in the course, user or course changed since the client got it
+    validator = CacheValidator(log_criteria=(AttendanceLogs.user_id == student_nim, AttendanceLogs.course_id == selected_course))
+    if validator.not_modified():
+      return validator.apply(Response(status=304))
+    # Streaming mode: every matching log, without the page limit
+    if stream_requested():
+      attendance_logs = page.order(student_logs_query(student_nim, selected_course, filters))
+      return validator.apply(stream_json(key, attendance_logs, lambda rows: serialize_logs(rows, user_key='nim')))
+    attendance_logs = serialized_logs(
+      student_nim=student_nim,
+      selected_course_id=selected_course,
+      filters=filters,
+      page=page
+    )
+    return validator.apply(jsonify({key: attendance_logs, 'next_cursor': page.next_cursor})), 200
 
 def get_attendance_student(selected_course:str):
     """
@@ -110,11 +127,7 @@ def get_attendance_student(selected_course:str):
     # Check if user pass course_id in query string
     if not selected_course:
       return jsonify({'message': 'Course not found'}), 404
-    attendance_logs = serialized_logs(
-      student_nim=sess_user_id,
-      selected_course_id=selected_course
-    )
-    return jsonify({'attendance': attendance_logs}), 200
+    return student_logs_response('attendance', sess_user_id, selected_course)
 
 
 def view_attendance_student():
@@ -141,62 +154,45 @@ def view_attendance_student():
         courses=courses
     )
 
-def get_attendance_detail_student(selected_role:str):
+def get_attendance_detail_student(selected_course:str):
     """
-    This function is to send response to the client (JS) in JSON format, which contains specific user attendance logs data.
+    This function is to send response to the client (JS) in JSON format, which contains the attendance logs
+    of the student in the selected course (same filters, page and streaming mode as get_attendance_student).
+    Required param: selected_course (str)
     """
     sess_user_id = session.get('user_id')
     sess_user_role = session.get('user_role')
-    if not (sess_user_id and sess_user_role and sess_user_role == 'STUDENT'):
-        flash('You do not have permission to access this page.', 'danger')
-        return redirect(url_for('dashboard'))
-    
-    if selected_role in ['STUDENT', 'LECTURER']:
-        student_nim = request.args.get('nim')
-        lecturer_nip = request.args.get('nip')
-        # Check if nim is passed in query string
-        if student_nim:
-            student_attendance_logs = serialized_logs(selected_role=selected_role, student_nim=student_nim)
-            return jsonify({'attendance_detail': student_attendance_logs}), 200
-        # If the lecturer nip is passed in query string
-        elif lecturer_nip:
-            lecturer_attendance_logs = serialized_logs(selected_role=selected_role, lecturer_nip=lecturer_nip)
-            return jsonify({'attendance_detail': lecturer_attendance_logs}), 200
-        # Otherwise, return parameter error if the nim or nip is not passed in query string
-        else:
-            return jsonify({"message": "You've to provide the student nim or lecturer nip in query parameters"}), 400
-    # Return role error if the selected role is not student or lecturer
-    return jsonify({"message": "User role is invalid"}), 400
-
-def view_attendance_detail_student():
+    if not (sess_user_id and sess_user_role):
+      return redirect(url_for('user_ep.login'))
+    if sess_user_role != 'STUDENT':
+      return abort(403)
+    # A student only sees their own logs
+    student_nim = request.args.get('nim', sess_user_id)
+    if student_nim != sess_user_id:
+      return abort(403)
+    return student_logs_response('attendance_detail', sess_user_id, selected_course)
+
+def view_attendance_detail_student(selected_course:str):
     """
-    This is a view page of attendance logs detail.
+    This is a view page of the attendance logs detail of the student in the selected course.
+    Required param: selected_course (str)
     """
     sess_user_id = session.get('user_id')
     sess_user_role = session.get('user_role')
+    if not (sess_user_id and sess_user_role):
+      return redirect(url_for('user_ep.login'))
+    if sess_user_role != 'STUDENT':
+      return abort(403)
+    # A student only sees their own logs
+    student_nim = request.args.get('nim', sess_user_id)
+    if student_nim != sess_user_id:
+      return abort(403)
 
-    if not (sess_user_id and sess_user_role and sess_user_role == 'STUDENT'):
-        flash('You do not have permission to access this page.', 'danger')
-        return redirect(url_for('dashboard'))
-
-    student_nim = request.args.get('nim')
-
-    # Check the student nim or lecturer nip is exist in the database
-    found_student = User.query.filter_by(user_id=student_nim, user_role='STUDENT').first()
-
-    # If the student nim or lecturer nip is not exist, then return error message
-    if not (found_student):
-        flash("Student or lecturer not found!", 'danger')
-        return redirect(url_for('student_ep.attendance'))
-
-    # Jika ditemukan mahasiswa dan nim diberikan, tampilkan halaman detail mahasiswa
-    if student_nim and found_student:
-        return render_template('student/student-attendance-detail.html', student=found_student)
-
-    # Otherwise, return parameter error if the nim or nip is not passed in query string
-    else:
-        flash("You've to provide the student nim or lecturer nip in query parameters")
-        return redirect(url_for('student_ep.attendance'))
+    found_student = User.query.filter_by(user_id=sess_user_id, user_role='STUDENT').first()
+    # Only the courses of the class of the student
+    found_course = Course.query.filter_by(course_id=selected_course, class_id=found_student.student_class).first() if found_student else None
+    if not (found_student and found_course):
+        flash("Course not found!", 'danger')
+        return redirect(url_for('student_ep.view_attendance'))
 
-    flash("User role is invalid!")
-    return redirect(url_for('student_ep.attendance'))
+    return render_template('student/student-attendance-detail.html', student=found_student, course=found_course)
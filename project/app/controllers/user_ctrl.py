@@ -1,6 +1,9 @@
 from flask import redirect, url_for, render_template, request, flash, session
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
-from ..models import User, Course, Class
+from ..models import db, User, Course, Class
+from ..hashing import PasswordPoolBusy
 
 def index():
   return redirect(url_for('user_ep.login'))
@@ -17,7 +20,12 @@ def login():
     user_pw = form['user_pw']
     # Check for existing user
     found_user = User.query.filter_by(user_id=user_id).first()
-    if found_user and found_user.verify_password(user_pw):
+    try:
+      verified = found_user is not None and found_user.verify_password(user_pw)
+    except PasswordPoolBusy:
+      flash('Server is busy, please try again in a moment.', 'warning')
+      return redirect(url_for('user_ep.login'))
+    if verified:
       session['user_id']=found_user.user_id
       session['user_role']=found_user.user_role.value
       flash('Login success!', 'success')
@@ -38,19 +46,22 @@ def dashboard():
     lecturers = User.query.filter_by(user_role='LECTURER').all()
     total_students = len(students)
     total_lecturers = len(lecturers)
-    total_courses = len(Course.query.all())
-    total_classes = len(Class.query.all())
-    # Get total course each student
+    total_courses = Course.query.count()
+    total_classes = Class.query.count()
+    # Get total course each student (courses of the student class), counted per class in one query
+    class_courses = dict(
+      db.session.query(Course.class_id, func.count(Course.course_id)).group_by(Course.class_id).all()
+    )
     student_courses = {}
     for student in students:
-      student_courses[student.user_id] = len(
-        Course.query.filter_by(class_id=student.student_class).all()
-      )
+      student_courses[student.user_id] = class_courses.get(student.student_class, 0)
+    # Get total course each lecturer, counted in one query
+    taught_courses = dict(
+      db.session.query(Course.lecturer_nip, func.count(Course.course_id)).group_by(Course.lecturer_nip).all()
+    )
     lecturer_courses = {}
     for lecturer in lecturers:
-      lecturer_courses[lecturer.user_id] = len(
-        Course.query.filter_by(lecturer_nip=lecturer.user_id).all()
-      )
+      lecturer_courses[lecturer.user_id] = taught_courses.get(lecturer.user_id, 0)
     return render_template(
       'admin/index.html',
       admin=admin,
@@ -65,7 +76,8 @@ def dashboard():
     )
   elif sess_user_role == 'LECTURER':
     lecturer = User.query.filter_by(user_id=sess_user_id, user_role='LECTURER').first()
-    courses = Course.query.filter_by(lecturer_nip=lecturer.user_id).all()
+    # The class of every course is shown on the page, so it is loaded along with the courses
+    courses = Course.query.options(joinedload(Course.class_course)).filter_by(lecturer_nip=lecturer.user_id).all()
     students = (
       User.query
         .join(Class, User.student_class == Class.class_id)
@@ -89,20 +101,16 @@ def dashboard():
     total_courses = Course.query.filter_by(lecturer_nip=sess_user_id).count()
     # Menginisialisasi dictionary untuk menyimpan data student_courses
     student_courses = {}
+    # Mahasiswa per kelas, diambil dari query students di atas (tanpa query per course)
+    class_students = {}
+    for student in students:
+      class_students.setdefault(student.student_class, []).append(student)
     # Iterasi untuk setiap course yang diajarkan oleh lecturer
     for course in courses:
-      # Mengambil mahasiswa yang mengikuti kursus tertentu
-      students = (
-        User.query
-          .join(Class, User.student_class == Class.class_id)
-          .join(Course, Course.class_id == Class.class_id)
-          .filter(Course.course_id == course.course_id)
-          .all()
-      )
       # Menambahkan data ke dictionary student_courses
       student_courses[course.course_id] = {
         'course_name': course.course_name,
-        'students': students
+        'students': class_students.get(course.class_id, [])
       }
     return render_template(
         'lecturer/index.html',
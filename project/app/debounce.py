@@ -0,0 +1,73 @@
+from threading import Lock
+from time import monotonic
+
+class TapDebouncer(object):
+  """
+  This class suppresses repeated reads of the same card on the same reader.
+  A card lingering on the antenna is published several times within a second or two,
+  repeats inside TAP_DEBOUNCE_WINDOW seconds of the first read are answered with the
+  cached reply of that read (or dropped while it is still being handled).
+  Keys are (raw payload, topic), so repeats are caught before any parsing.
+  """
+  def __init__(self):
+    self.window = 2.0
+    self._seen = {} # (payload, topic) -> [first read time, reply or None]
+    self._lock = Lock()
+    self._next_sweep = 0.0
+    # Statistics
+    self.passed = 0
+    self.replayed = 0
+    self.dropped = 0
+
+  def init_app(self, app):
+    self.window = app.config.get('TAP_DEBOUNCE_WINDOW', self.window)
+
+  def check(self, payload:bytes, topic:str):
+    """
+    This function is to register a read. It returns (is_repeat, cached_reply).
+    cached_reply is None when the first read is not answered yet.
+    """
+    if not self.window:
+      self.passed += 1
+      return False, None
+    now = monotonic()
+    key = (payload, topic)
+    with self._lock:
+      self._sweep(now)
+      seen = self._seen.get(key)
+      if seen and now - seen[0] < self.window:
+        if seen[1] is None:
+          self.dropped += 1
+        else:
+          self.replayed += 1
+        return True, seen[1]
+      self._seen[key] = [now, None]
+      self.passed += 1
+    return False, None
+
+  def remember_reply(self, payload:bytes, topic:str, reply:str):
+    """
+    This function is to cache the reply of a read for its repeats.
+    """
+    with self._lock:
+      seen = self._seen.get((payload, topic))
+      if seen:
+        seen[1] = reply
+
+  def _sweep(self, now:float):
+    # Forget expired reads from time to time, keeps the map as small as the window
+    if now < self._next_sweep:
+      return
+    self._seen = {
+      key: seen for key, seen in self._seen.items() if now - seen[0] < self.window
+    }
+    self._next_sweep = now + self.window
+
+  def stats(self) -> dict:
+    return {
+      'passed': self.passed,
+      'replayed': self.replayed,
+      'dropped': self.dropped
+    }
+
+tap_debouncer = TapDebouncer()
@@ -0,0 +1,191 @@
+from concurrent.futures import ProcessPoolExecutor
+from flask_argon2 import Argon2
+from threading import Lock, BoundedSemaphore
+import atexit
+import hashlib
+import hmac
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Argon2 hasher of a pool process, built once by _init_worker
+_worker_argon2 = None
+
+def _init_worker(params:dict):
+  global _worker_argon2
+  _worker_argon2 = Argon2(**params)
+
+def _hash(password:str) -> str:
+  return _worker_argon2.generate_password_hash(password)
+
+def _verify(pw_hash:str, password:str) -> bool:
+  return _worker_argon2.check_password_hash(pw_hash, password)
+
+class PasswordPoolBusy(RuntimeError):
+  """
+  Raised when a hash or a verification waits longer than PASSWORD_HASH_QUEUE_TIMEOUT for a free slot.
+  """
+
+class PasswordHashPool(object):
+  """
+  This class runs Argon2 password hashing and verification on a bounded pool of processes.
+  The web worker thread only waits for the result, so a burst of logins does not hold
+  every worker on CPU-heavy hashes, and a bulk import hashes on every CPU core.
+  The hashes use the ARGON2_* parameters of the app config.
+  Every hash holds a slot while it waits on the pool, bulk hashes too, so a login never waits
+  behind more than PASSWORD_HASH_CONCURRENCY hashes.
+  Config: PASSWORD_HASH_WORKERS (processes per web worker, default: the CPU count divided by WEB_CONCURRENCY,
+  0 hashes in the calling thread), PASSWORD_HASH_CONCURRENCY (hashes in flight per web worker)
+  and PASSWORD_HASH_QUEUE_TIMEOUT (seconds)
+  """
+  def __init__(self):
+    self.workers = os.cpu_count() or 1
+    self.concurrency = self.workers * 2
+    self.queue_timeout = 10.0
+    self.params = {}
+    self._argon2 = Argon2()
+    self._slots = BoundedSemaphore(self.concurrency)
+    self._executor = None
+    self._pid = None
+    self._lock = Lock()
+
+  def init_app(self, app):
+    """
+    Required param: app (Flask)
+    """
+    workers = app.config.get('PASSWORD_HASH_WORKERS')
+    if workers is None:
+      # Every web worker starts its own pool, they share the CPUs (one web worker per CPU if unknown)
+      cpus = os.cpu_count() or 1
+      workers = max(1, cpus // (app.config.get('WEB_CONCURRENCY') or cpus))
+    self.workers = workers
+    self.concurrency = app.config.get('PASSWORD_HASH_CONCURRENCY') or max(self.workers, 1) * 2
+    self.queue_timeout = app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', self.queue_timeout)
+    # Same parameters as the Argon2 extension reads from the app config
+    self._argon2 = Argon2(app)
+    self.params = {
+      'time_cost': self._argon2.time_cost,
+      'memory_cost': self._argon2.memory_cost,
+      'parallelism': self._argon2.parallelism,
+      'hash_len': self._argon2.hash_len,
+      'salt_len': self._argon2.salt_len,
+      'encoding': self._argon2.encoding
+    }
+    self._slots = BoundedSemaphore(self.concurrency)
+    # Parameters may have changed, the next call starts a new pool
+    self.close()
+
+  def _get_executor(self) -> ProcessPoolExecutor:
+    # The pool is started on first use inside the serving process (not before a fork)
+    with self._lock:
+      if self._executor is None or self._pid != os.getpid():
+        self._executor = ProcessPoolExecutor(
+          max_workers=self.workers, initializer=_init_worker, initargs=(self.params,)
+        )
+        self._pid = os.getpid()
+        atexit.register(self.close)
+      return self._executor
+
+  def _acquire(self):
+    # At most PASSWORD_HASH_CONCURRENCY calls wait on the pool, the others give up after the queue timeout
+    if not self._slots.acquire(timeout=self.queue_timeout):
+      raise PasswordPoolBusy('Password hashing is busy, try again later')
+
+  def _release(self, _future=None):
+    self._slots.release()
+
+  def _run(self, function, inline, *args):
+    self._acquire()
+    try:
+      if not self.workers:
+        return inline(*args)
+      return self._get_executor().submit(function, *args).result()
+    finally:
+      self._slots.release()
+
+  def hash(self, password:str) -> str:
+    """
+    This function is to hash one password on the pool.
+    """
+    return self._run(_hash, self._argon2.generate_password_hash, password)
+
+  def verify(self, pw_hash:str, password:str) -> bool:
+    """
+    This function is to check a password against its hash on the pool.
+    """
+    return self._run(_verify, self._argon2.check_password_hash, pw_hash, password)
+
+  def hash_many(self, passwords:list) -> list:
+    """
+    This function is to hash a list of passwords on the pool, in the same order.
+    """
+    if not passwords:
+      return []
+    if not self.workers:
+      return [self._argon2.generate_password_hash(password) for password in passwords]
+    executor = self._get_executor()
+    futures = []
+    for password in passwords:
+      # A slot per hash, given back when the hash is done, so logins take turns with the import
+      self._acquire()
+      try:
+        future = executor.submit(_hash, password)
+      except BaseException:
+        self._release()
+        raise
+      future.add_done_callback(self._release)
+      futures.append(future)
+    return [future.result() for future in futures]
+
+  def close(self):
+    with self._lock:
+      if self._executor is not None and self._pid == os.getpid():
+        self._executor.shutdown()
+      self._executor = None
+
+password_pool = PasswordHashPool()
+
+class RfidHasher(object):
+  """
+  This class turns a card UID into the value stored in user_rfid_hash: a keyed HMAC-SHA256 digest.
+  The digest is deterministic, so a tap is resolved with one equality lookup on the unique index,
+  and the UIDs are not stored in plaintext. Without the key (RFID_HMAC_KEY) a digest cannot be
+  computed from a guessed UID. Changing the key invalidates every stored card (see the migration).
+  """
+  def __init__(self):
+    self._key = None
+
+  def init_app(self, app):
+    """
+    Required param: app (Flask)
+    """
+    key = app.config.get('RFID_HMAC_KEY')
+    if not key:
+      logger.warning("RFID_HMAC_KEY is not set, the card digests are keyed with SECRET_KEY")
+      key = app.config.get('SECRET_KEY')
+    self._key = str(key).encode('utf-8')
+
+  @staticmethod
+  def normalize(uid:str) -> str:
+    # Readers send upper case hex, forms may be typed in lower case
+    return uid.strip().upper()
+
+  def digest(self, uid:str):
+    """
+    This function is to compute the stored digest of a card UID (None for an empty UID).
+    """
+    if uid is None or not uid.strip():
+      return None
+    if self._key is None:
+      raise RuntimeError('rfid_hasher.init_app(app) must be called first')
+    return hmac.new(self._key, self.normalize(uid).encode('utf-8'), hashlib.sha256).hexdigest()
+
+  def verify(self, rfid_digest:str, uid:str) -> bool:
+    """
+    This function is to check a card UID against its stored digest.
+    """
+    uid_digest = self.digest(uid)
+    return bool(rfid_digest and uid_digest) and hmac.compare_digest(rfid_digest, uid_digest)
+
+rfid_hasher = RfidHasher()
@@ -0,0 +1,309 @@
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from io import TextIOWrapper
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from time import perf_counter
+from zipfile import BadZipFile
+import click
+import csv
+import logging
+
+from ..extensions import db
+from .models import User, Course
+from .hashing import PasswordPoolBusy, password_pool, rfid_hasher
+from .cache_sync import publish_reload
+from .conditional import bump_version
+from .validators import probe_existing, validate_user_form, validate_course_form, parse_time
+
+logger = logging.getLogger(__name__)
+
+# Columns of every import kind, the same names as the registration forms
+IMPORT_COLUMNS = {
+  'student': [
+    'student_nim', 'student_name', 'student_class', 'student_pw',
+    'student_email_address', 'student_home_address', 'student_uid'
+  ],
+  'lecturer': [
+    'lecturer_nip', 'lecturer_name', 'lecturer_major', 'lecturer_pw',
+    'lecturer_email_address', 'lecturer_home_address', 'lecturer_uid'
+  ],
+  'course': [
+    'course_id', 'course_name', 'course_sks', 'course_semester', 'course_day', 'time_start', 'time_end',
+    'course_description', 'lecturer_nip', 'class_id', 'room_id'
+  ]
+}
+
+class ImportReport(object):
+  """
+  Result of one import: the number of rows read and imported, the errors of every rejected row
+  and, when the import stopped before the end of the file, the first row that is not imported.
+  """
+  def __init__(self, kind:str):
+    self.kind = kind
+    self.total = 0
+    self.imported = 0
+    self.errors = [] # {'row': n, 'id': ..., 'errors': [...]}
+    self.stopped = None # {'row': n, 'reason': ...}
+
+  def reject(self, row_number:int, record_id:str, errors:list):
+    self.errors.append({'row': row_number, 'id': record_id, 'errors': errors})
+
+  def stop(self, row_number:int, reason:str):
+    self.stopped = {'row': row_number, 'reason': reason}
+
+  def to_dict(self) -> dict:
+    return {
+      'kind': self.kind,
+      'total': self.total,
+      'imported': self.imported,
+      'rejected': len(self.errors),
+      'errors': sorted(self.errors, key=lambda error: error['row']),
+      'stopped': self.stopped
+    }
+
+def _cell(value) -> str:
+  if value is None:
+    return ''
+  # Spreadsheets store numeric ids (NIM, NIP) as numbers
+  if isinstance(value, float) and value.is_integer():
+    value = int(value)
+  return str(value).strip()
+
+def read_rows(stream, filename:str):
+  """
+  This function is to stream the rows of a CSV or XLSX file as (row number, dict of column -> str).
+  Required params: stream (binary file object) and filename (its extension selects the reader)
+  Raises ValueError when the file cannot be read.
+  """
+  if filename.lower().endswith('.xlsx'):
+    try:
+      workbook = load_workbook(stream, read_only=True, data_only=True)
+    except (BadZipFile, InvalidFileException, KeyError, OSError):
+      # A corrupt or renamed file (openpyxl raises KeyError when a workbook part is missing)
+      raise ValueError('File is not a valid .xlsx workbook')
+    rows = workbook.active.iter_rows(values_only=True)
+  elif filename.lower().endswith('.csv'):
+    rows = csv.reader(TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+  else:
+    raise ValueError('Only .csv and .xlsx files can be imported!')
+  header = None
+  for row_number, row in enumerate(rows, start=1):
+    values = [_cell(value) for value in row]
+    if header is None:
+      header = [value.lower() for value in values]
+      continue
+    if not any(values):
+      continue
+    yield row_number, dict(zip(header, values))
+
+def _batches(rows, batch_size:int):
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) >= batch_size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+def _insert_batch(model, records:list, report:ImportReport):
+  """
+  This function is to insert the valid rows of a batch with one INSERT.
+  If the batch fails (e.g. a row was added meanwhile), the rows are inserted one by one
+  so only the failing rows are rejected.
+  """
+  rows = [row for _, _, row in records]
+  # Change counter of the read endpoints, committed with the rows
+  scope = 'courses' if model is Course else 'users'
+  try:
+    db.session.execute(insert(model), rows)
+    bump_version(scope)
+    db.session.commit()
+    report.imported += len(rows)
+    return
+  except SQLAlchemyError as err:
+    db.session.rollback()
+    logger.warning("Import batch failed, retrying row by row. %s", err)
+  for row_number, record_id, row in records:
+    try:
+      db.session.execute(insert(model), [row])
+      bump_version(scope)
+      db.session.commit()
+      report.imported += 1
+    except SQLAlchemyError as err:
+      db.session.rollback()
+      report.reject(row_number, record_id, [f'Row is not saved. {getattr(err, "orig", err)}'])
+
+def import_users(rows, role:str, batch_size:int = 500) -> ImportReport:
+  """
+  This function is to import students or lecturers from (row number, dict) rows.
+  Every batch is validated with the validate_user_form rules against one existence probe,
+  its passwords are hashed on the process pool and the valid rows are inserted at once.
+  If the pool stays busy, the import stops before the batch and the report tells the row (report.stopped).
+  Required params: rows (e.g. read_rows(...)) and role ('STUDENT' or 'LECTURER')
+  Must be called inside an application context.
+  """
+  prefix = 'student' if role == 'STUDENT' else 'lecturer'
+  id_column = 'student_nim' if role == 'STUDENT' else 'lecturer_nip'
+  report = ImportReport(prefix)
+  # Ids, emails and cards seen earlier in the file
+  seen = {'id': set(), 'email': set(), 'uid': set()}
+  for batch in _batches(rows, batch_size):
+    report.total += len(batch)
+    existing = probe_existing(
+      user_ids=[row.get(id_column) for _, row in batch],
+      emails=[row.get(f'{prefix}_email_address') for _, row in batch],
+      rfids=[row.get(f'{prefix}_uid') for _, row in batch],
+      class_ids=[row.get('student_class') for _, row in batch] if role == 'STUDENT' else ()
+    )
+    valid = []
+    for row_number, row in batch:
+      user_id = row.get(id_column, '')
+      email = row.get(f'{prefix}_email_address', '')
+      uid = row.get(f'{prefix}_uid', '')
+      uid_digest = rfid_hasher.digest(uid)
+      validation = validate_user_form(
+        user_id=user_id, user_role=role, user_fullname=row.get(f'{prefix}_name', ''),
+        user_pw=row.get(f'{prefix}_pw', ''), user_confirm_pw=row.get(f'{prefix}_pw', ''),
+        user_email_address=email, user_uid=uid, user_home_address=row.get(f'{prefix}_home_address') or None,
+        student_class=row.get('student_class'), lecturer_major=row.get('lecturer_major'), existing=existing
+      )
+      if user_id in seen['id']:
+        validation.add('Duplicate ID in the file!')
+      if email in seen['email']:
+        validation.add('Duplicate email address in the file!')
+      if uid_digest and uid_digest in seen['uid']:
+        validation.add('Duplicate RFID card in the file!')
+      seen['id'].add(user_id)
+      seen['email'].add(email)
+      seen['uid'].add(uid_digest)
+      if not validation:
+        report.reject(row_number, user_id, validation.errors)
+        continue
+      valid.append((row_number, row))
+    # Hash every password of the batch on the pool
+    try:
+      password_hashes = password_pool.hash_many([row[f'{prefix}_pw'] for _, row in valid])
+    except PasswordPoolBusy as err:
+      # The earlier batches are committed, the rest of the file is left for another try
+      report.stop(batch[0][0], str(err))
+      break
+    records = [
+      (row_number, row[id_column], {
+        'user_id': row[id_column],
+        'user_role': role,
+        'user_fullname': row[f'{prefix}_name'],
+        'user_password_hash': password_hash,
+        'user_rfid_hash': rfid_hasher.digest(row.get(f'{prefix}_uid')),
+        'user_email_address': row[f'{prefix}_email_address'],
+        'user_home_address': row.get(f'{prefix}_home_address') or None,
+        'student_class': row.get('student_class') if role == 'STUDENT' else None,
+        'lecturer_major': row.get('lecturer_major') if role == 'LECTURER' else None
+      })
+      for (row_number, row), password_hash in zip(valid, password_hashes)
+    ]
+    if records:
+      _insert_batch(User, records, report)
+  return report
+
+def import_courses(rows, batch_size:int = 500) -> ImportReport:
+  """
+  This function is to import courses from (row number, dict) rows, validated with the
+  validate_course_form rules against one existence probe per batch.
+  Must be called inside an application context.
+  """
+  report = ImportReport('course')
+  seen = set()
+  for batch in _batches(rows, batch_size):
+    report.total += len(batch)
+    existing = probe_existing(
+      course_ids=[row.get('course_id') for _, row in batch],
+      lecturer_nips=[row.get('lecturer_nip') for _, row in batch],
+      class_ids=[row.get('class_id') for _, row in batch],
+      room_ids=[row.get('room_id') for _, row in batch]
+    )
+    records = []
+    for row_number, row in batch:
+      course_id = row.get('course_id', '')
+      try:
+        course_sks = int(row.get('course_sks', ''))
+        course_semester = int(row.get('course_semester', ''))
+      except ValueError:
+        report.reject(row_number, course_id, ['Course SKS and semester must be numbers!'])
+        continue
+      validation = validate_course_form(
+        course_id=course_id, course_name=row.get('course_name', ''), course_sks=course_sks, at_semester=course_semester,
+        day=row.get('course_day', ''), time_start=row.get('time_start', ''), time_end=row.get('time_end', ''),
+        course_description=row.get('course_description') or None, lecturer_nip=row.get('lecturer_nip', ''),
+        class_id=row.get('class_id', ''), room_id=row.get('room_id', ''), existing=existing
+      )
+      if course_id in seen:
+        validation.add('Duplicate course ID in the file!')
+      seen.add(course_id)
+      time_start = parse_time(row.get('time_start', ''))
+      time_end = parse_time(row.get('time_end', ''))
+      if time_start is None or time_end is None:
+        validation.add('Time start and time end must be in format HH:MM:SS!')
+      if not validation:
+        report.reject(row_number, course_id, validation.errors)
+        continue
+      records.append((row_number, course_id, {
+        'course_id': course_id,
+        'course_name': row['course_name'],
+        'course_sks': course_sks,
+        'at_semester': course_semester,
+        'day': row['course_day'].capitalize(),
+        'time_start': time_start,
+        'time_end': time_end,
+        'course_description': row.get('course_description') or None,
+        'lecturer_nip': row['lecturer_nip'],
+        'class_id': row['class_id'],
+        'room_id': row['room_id']
+      }))
+    if records:
+      _insert_batch(Course, records, report)
+  return report
+
+def import_file(kind:str, stream, filename:str, batch_size:int = 500) -> ImportReport:
+  """
+  This function is to import a CSV or XLSX file of students, lecturers or courses.
+  Required params: kind ('student', 'lecturer' or 'course'), stream (binary file object) and filename
+  """
+  rows = read_rows(stream, filename)
+  if kind == 'student':
+    report = import_users(rows, 'STUDENT', batch_size)
+  elif kind == 'lecturer':
+    report = import_users(rows, 'LECTURER', batch_size)
+  elif kind == 'course':
+    report = import_courses(rows, batch_size)
+  else:
+    raise ValueError(f'Import kind is not valid: {kind}')
+  # Refresh the lookups of the ingest process
+  if report.imported:
+    publish_reload('courses' if kind == 'course' else 'users')
+  return report
+
+@click.command('import-data')
+@click.argument('kind', type=click.Choice(list(IMPORT_COLUMNS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, default=None, help='Rows per validation and INSERT batch (default: IMPORT_BATCH_SIZE).')
+@with_appcontext
+def import_command(kind, path, batch_size):
+  """
+  Import students, lecturers or courses from a CSV or XLSX file.
+  """
+  batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', 500)
+  started = perf_counter()
+  with open(path, 'rb') as stream:
+    try:
+      report = import_file(kind, stream, path, batch_size)
+    except ValueError as err:
+      raise click.ClickException(str(err))
+  for error in report.errors:
+    click.echo(f"row {error['row']} ({error['id']}): {' '.join(error['errors'])}")
+  click.echo(f'{report.imported} of {report.total} rows imported, {len(report.errors)} rejected in {perf_counter() - started:.1f}s')
+  if report.stopped:
+    raise click.ClickException(f"Import stopped at row {report.stopped['row']}, the rows from there on are not imported. {report.stopped['reason']}")
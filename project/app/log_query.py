@@ -0,0 +1,198 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from datetime import date, datetime, time, timedelta
+from flask import current_app, request
+from sqlalchemy import String, and_, cast, func, or_
+import json
+
+from ..extensions import db
+from .models import AttendanceLogs, AttendanceStatus, Course, User
+
+# English names of the time_in format ('%a, %d %b %Y %H:%M:%S' in the C locale)
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+MONTHS = (None, 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+def log_query():
+  """
+  This function is to query the columns of the log listings, one plain row per log (no ORM objects).
+  LogFilters and LogPage apply to it, serialize_logs() turns its rows into JSON logs.
+  """
+  return db.session.query(
+    AttendanceLogs.log_id, AttendanceLogs.user_id, User.user_fullname, Course.course_name,
+    AttendanceLogs.room_id, AttendanceLogs.time_in, AttendanceLogs.status, AttendanceLogs.course_id
+  ).join(User, User.user_id == AttendanceLogs.user_id).join(Course, Course.course_id == AttendanceLogs.course_id)
+
+def serialize_logs(rows, user_key:str = None) -> list:
+  """
+  This function is to turn rows of log_query() into the logs of the log endpoints, in one pass.
+  Optional param: user_key (str), 'nim' or 'nip' adds the user id under this key
+  """
+  weekdays, months = WEEKDAYS, MONTHS
+  if user_key:
+    return [
+      {
+        'log_id': log_id,
+        user_key: user_id,
+        'name': name,
+        'course': course,
+        'room': room_id,
+        'time_in': f'{weekdays[t.weekday()]}, {t.day:02d} {months[t.month]} {t.year} {t.hour:02d}:{t.minute:02d}:{t.second:02d}',
+        'status': status.value
+      }
+      for log_id, user_id, name, course, room_id, t, status, _ in rows
+    ]
+  return [
+    {
+      'log_id': log_id,
+      'name': name,
+      'course': course,
+      'room': room_id,
+      'time_in': f'{weekdays[t.weekday()]}, {t.day:02d} {months[t.month]} {t.year} {t.hour:02d}:{t.minute:02d}:{t.second:02d}',
+      'status': status.value
+    }
+    for log_id, _, name, course, room_id, t, status, _ in rows
+  ]
+
+class InvalidLogQuery(ValueError):
+  """
+  Raised when a filter, the sort or the page cursor of a log endpoint is not valid.
+  """
+
+class LogFilters(object):
+  """
+  This class is the filters of a log listing, read from the query parameters:
+  date_from and date_to (YYYY-MM-DD, both included), status (PRESENT, LATE or ALPHA), room_id,
+  class_id (class of the course) and q (NIM/NIP prefix, user name or course name).
+  They become WHERE clauses of log_query(), so only the matching logs leave the database.
+  The date range is a range on time_in, the last column of every log index.
+  """
+  def __init__(self, date_from:date = None, date_to:date = None, status:AttendanceStatus = None,
+               room_id:str = None, class_id:str = None, search:str = None):
+    self.date_from = date_from
+    self.date_to = date_to
+    self.status = status
+    self.room_id = room_id
+    self.class_id = class_id
+    self.search = search
+
+  @classmethod
+  def from_request(cls):
+    """
+    This function is to read the filters from the query parameters (missing or empty ones are not applied).
+    """
+    args = request.args
+    try:
+      date_from = date.fromisoformat(args['date_from']) if args.get('date_from') else None
+      date_to = date.fromisoformat(args['date_to']) if args.get('date_to') else None
+    except ValueError:
+      raise InvalidLogQuery('The dates must be in YYYY-MM-DD format')
+    status = args.get('status')
+    if status and status not in AttendanceStatus.__members__:
+      raise InvalidLogQuery('The status must be PRESENT, LATE or ALPHA')
+    return cls(
+      date_from=date_from,
+      date_to=date_to,
+      status=AttendanceStatus[status] if status else None,
+      room_id=args.get('room_id') or None,
+      class_id=args.get('class_id') or None,
+      search=(args.get('q') or '').strip() or None
+    )
+
+  def apply(self, query):
+    """
+    This function is to add the filters to a query of log_query().
+    """
+    if self.date_from:
+      query = query.filter(AttendanceLogs.time_in >= datetime.combine(self.date_from, time.min))
+    if self.date_to:
+      query = query.filter(AttendanceLogs.time_in < datetime.combine(self.date_to + timedelta(days=1), time.min))
+    if self.status:
+      query = query.filter(AttendanceLogs.status == self.status)
+    if self.room_id:
+      query = query.filter(AttendanceLogs.room_id == self.room_id)
+    if self.class_id:
+      query = query.filter(Course.class_id == self.class_id)
+    if self.search:
+      search = self.search.lower()
+      query = query.filter(or_(
+        AttendanceLogs.user_id.startswith(self.search, autoescape=True),
+        func.lower(User.user_fullname).contains(search, autoescape=True),
+        func.lower(Course.course_name).contains(search, autoescape=True)
+      ))
+    return query
+
+# Sort keys of the sort parameter: (column, value of a log, value of a cursor)
+SORTS = {
+  'time_in': (AttendanceLogs.time_in, lambda log: log.time_in.isoformat(), datetime.fromisoformat),
+  # By name, as MySQL orders an ENUM by its position but compares it as a string
+  'status': (cast(AttendanceLogs.status, String(7)), lambda log: log.status.name, str),
+  'room': (AttendanceLogs.room_id, lambda log: log.room_id, str),
+  'user': (AttendanceLogs.user_id, lambda log: log.user_id, str),
+  'course': (AttendanceLogs.course_id, lambda log: log.course_id, str),
+}
+
+class LogPage(object):
+  """
+  This class is one page of attendance logs in the order of the sort parameter (a key of SORTS,
+  with a leading '-' for descending; default: '-time_in', newest first), then log_id.
+  The cursor is the sort value and log_id of the last log of the previous page, so every page is
+  one range scan with a LIMIT, however deep the page (no OFFSET).
+  Config: LOG_PAGE_SIZE (default limit) and LOG_PAGE_SIZE_MAX (cap of the limit parameter)
+  """
+  def __init__(self, limit:int, cursor:str = None, sort:str = '-time_in'):
+    self.limit = limit
+    self.descending = sort.startswith('-')
+    self.sort = sort.lstrip('-')
+    if self.sort not in SORTS:
+      raise InvalidLogQuery(f"The sort must be one of {', '.join(SORTS)} (with '-' for descending)")
+    self.after = self.decode(cursor) if cursor else None
+    # Set by fetch() when there is a page after this one
+    self.next_cursor = None
+
+  @classmethod
+  def from_request(cls):
+    """
+    This function is to read the page from the limit, cursor and sort query parameters.
+    """
+    limit = request.args.get('limit', type=int) or current_app.config['LOG_PAGE_SIZE']
+    limit = max(1, min(limit, current_app.config['LOG_PAGE_SIZE_MAX']))
+    return cls(limit, request.args.get('cursor'), request.args.get('sort') or '-time_in')
+
+  def encode(self, log) -> str:
+    value = json.dumps([self.sort, SORTS[self.sort][1](log), log.log_id]).encode('utf-8')
+    return urlsafe_b64encode(value).decode('ascii')
+
+  def decode(self, cursor:str) -> tuple:
+    try:
+      sort, value, log_id = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+      if sort != self.sort:
+        raise ValueError(sort)
+      return SORTS[sort][2](value), int(log_id)
+    except (Base64Error, UnicodeError, ValueError, TypeError):
+      raise InvalidLogQuery('The page cursor is invalid')
+
+  def order(self, query):
+    """
+    This function is to sort a query of log_query() in the order of the pages, from the cursor on.
+    """
+    column = SORTS[self.sort][0]
+    if self.after:
+      value, log_id = self.after
+      if self.descending:
+        query = query.filter(or_(column < value, and_(column == value, AttendanceLogs.log_id < log_id)))
+      else:
+        query = query.filter(or_(column > value, and_(column == value, AttendanceLogs.log_id > log_id)))
+    if self.descending:
+      return query.order_by(column.desc(), AttendanceLogs.log_id.desc())
+    return query.order_by(column.asc(), AttendanceLogs.log_id.asc())
+
+  def fetch(self, query) -> list:
+    """
+    This function is to run a query of log_query() for this page only.
+    """
+    # One extra row tells whether a next page exists
+    logs = self.order(query).limit(self.limit + 1).all()
+    if len(logs) > self.limit:
+      logs = logs[:self.limit]
+      self.next_cursor = self.encode(logs[-1])
+    return logs
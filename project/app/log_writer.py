@@ -0,0 +1,251 @@
+from sqlalchemy import insert, tuple_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from threading import Condition, Thread
+from time import monotonic
+import atexit
+import logging
+
+from ..extensions import db
+from .models import AttendanceLogs
+from .attended_set import attended_set
+
+logger = logging.getLogger(__name__)
+
+def insert_or_ignore(model):
+  """
+  This function is to build an INSERT of the given model that skips the rows of an already
+  recorded session (unique user_id, course_id and session_date) instead of failing.
+  Must be called inside an application context.
+  """
+  dialect = db.session.get_bind().dialect.name
+  if dialect == 'mysql':
+    # A no-op update only affects the duplicate key, other errors still fail (unlike INSERT IGNORE)
+    statement = mysql.insert(model)
+    return statement.on_duplicate_key_update(log_id=statement.table.c.log_id)
+  if dialect == 'postgresql':
+    return postgresql.insert(model).on_conflict_do_nothing()
+  if dialect == 'sqlite':
+    return sqlite.insert(model).on_conflict_do_nothing()
+  return insert(model)
+
+def session_key(row:dict) -> tuple:
+  """
+  This function is to get the session of a log row, one attendance per user, course and day.
+  """
+  return (row['user_id'], row['course_id'], row['session_date'])
+
+def recorded_sessions(rows:list, lock:bool = False) -> set:
+  """
+  This function is to get the sessions (user_id, course_id, session_date) of the rows already
+  in the log table, with one lookup on the unique index.
+  Optional param: lock (bool), read with FOR UPDATE, so no other transaction inserts them until the commit
+  Must be called inside an application context.
+  """
+  columns = (AttendanceLogs.user_id, AttendanceLogs.course_id, AttendanceLogs.session_date)
+  query = db.session.query(*columns).filter(tuple_(*columns).in_([session_key(row) for row in rows]))
+  if lock:
+    query = query.with_for_update()
+  return {tuple(session) for session in query}
+
+def insert_logs(rows:list) -> set:
+  """
+  This function is to insert log rows with insert_or_ignore, returns the sessions of the rows actually
+  inserted: the database decides, the other rows belong to a session recorded before (by any process).
+  Must be called inside an application context (the caller commits).
+  """
+  statement = insert_or_ignore(AttendanceLogs).values(rows)
+  dialect = db.session.get_bind().dialect.name
+  if dialect in ('postgresql', 'sqlite'):
+    # Only the inserted rows are returned
+    columns = (AttendanceLogs.user_id, AttendanceLogs.course_id, AttendanceLogs.session_date)
+    return {tuple(session) for session in db.session.execute(statement.returning(*columns))}
+  # No RETURNING on MySQL (and its rowcount counts the skipped rows as well): the sessions already
+  # recorded are read first, with a locking read so that another process cannot insert them meanwhile
+  recorded = recorded_sessions(rows, lock=(dialect == 'mysql'))
+  db.session.execute(statement)
+  return {session_key(row) for row in rows} - recorded
+
+class AttendanceLogWriter(object):
+  """
+  This class is a write-behind buffer for attendance log rows.
+  Taps only append a row here, a background thread flushes the buffer
+  with one multi-row INSERT when it reaches the size limit
+  (ATTENDANCE_LOG_BATCH_SIZE) or the time limit (ATTENDANCE_LOG_FLUSH_INTERVAL).
+  A user gets at most one log per course and day, even with several ingest processes:
+  the log table is unique on (user_id, course_id, session_date) and the rows are inserted
+  with insert_or_ignore, so a session recorded meanwhile is skipped by the database.
+  The submitter of a row is told after the flush whether it was inserted or skipped.
+  """
+  def __init__(self, app=None):
+    self.app = None
+    self.batch_size = 200
+    self.flush_interval = 0.25
+    self._pending = [] # rows of AttendanceLogs
+    # Session keys of the rows queued or being flushed, until they are in attended_set (or dropped)
+    self._in_flight = set()
+    self._callbacks = {} # session key -> on_recorded of submit
+    self._oldest = None # monotonic time of the oldest pending row
+    self._cond = Condition()
+    self._thread = None
+    self._running = False
+    # Statistics
+    self.flushes = 0
+    self.flushed_rows = 0
+    self.failed_rows = 0
+    self.duplicate_rows = 0
+    self.last_flush_latency = 0.0
+    self.max_flush_latency = 0.0
+    self._total_flush_latency = 0.0
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.app = app
+    self.batch_size = app.config.get('ATTENDANCE_LOG_BATCH_SIZE', self.batch_size)
+    self.flush_interval = app.config.get('ATTENDANCE_LOG_FLUSH_INTERVAL', self.flush_interval)
+    if self._thread is None:
+      self._running = True
+      self._thread = Thread(target=self._run, name='attendance-log-writer', daemon=True)
+      self._thread.start()
+      # Flush whatever is left when the process exits
+      atexit.register(self.close)
+
+  def submit(self, row:dict, on_recorded = None) -> bool:
+    """
+    This function is to queue a new attendance log row (column name -> value).
+    The row is rejected (returns False) if a row of the same session is already queued or being flushed.
+    The check and the append are atomic, so concurrent workers cannot both queue it.
+    Optional param: on_recorded, called from the writer thread after the flush as on_recorded(inserted),
+    inserted is True (inserted), False (session already recorded) or None (row dropped on an error)
+    """
+    key = session_key(row)
+    with self._cond:
+      if key in self._in_flight:
+        return False
+      self._in_flight.add(key)
+      if on_recorded is not None:
+        self._callbacks[key] = on_recorded
+      # Wake the writer on the first row (it then waits up to flush_interval) and on a full batch
+      wake = not self._pending or len(self._pending) + 1 >= self.batch_size
+      if not self._pending:
+        self._oldest = monotonic()
+      self._pending.append(row)
+      if wake:
+        self._cond.notify()
+    return True
+
+  def _take_batch(self) -> list:
+    batch = self._pending
+    self._pending = []
+    self._oldest = None
+    return batch
+
+  def _run(self):
+    while True:
+      with self._cond:
+        while self._running and (
+          not self._pending or
+          (len(self._pending) < self.batch_size and monotonic() - self._oldest < self.flush_interval)
+        ):
+          timeout = None
+          if self._pending:
+            timeout = self.flush_interval - (monotonic() - self._oldest)
+          self._cond.wait(timeout)
+        batch = self._take_batch()
+        running = self._running
+      if batch:
+        self._flush(batch)
+      if not running:
+        return
+
+  def _flush(self, batch:list):
+    started = monotonic()
+    outcomes = {} # session key -> inserted
+    try:
+      with self.app.app_context():
+        try:
+          inserted = insert_logs(batch)
+          db.session.commit()
+          self.flushed_rows += len(inserted)
+          self.duplicate_rows += len(batch) - len(inserted)
+          self._mark_attended(batch)
+          outcomes = {session_key(row): session_key(row) in inserted for row in batch}
+        except SQLAlchemyError as err:
+          db.session.rollback()
+          logger.warning("Attendance log batch failed, retrying row by row. %s", err)
+          outcomes = self._flush_one_by_one(batch)
+    finally:
+      # Only now, as the sessions are in attended_set (or dropped, so the user may tap again)
+      with self._cond:
+        keys = [session_key(row) for row in batch]
+        self._in_flight.difference_update(keys)
+        callbacks = [(self._callbacks.pop(key, None), outcomes.get(key)) for key in keys]
+    latency = monotonic() - started
+    self.flushes += 1
+    self.last_flush_latency = latency
+    self.max_flush_latency = max(self.max_flush_latency, latency)
+    self._total_flush_latency += latency
+    for on_recorded, inserted in callbacks:
+      if on_recorded is None:
+        continue
+      try:
+        on_recorded(inserted)
+      except Exception as err:
+        logger.exception("Attendance log callback failed. %s", err)
+
+  def _mark_attended(self, batch:list):
+    # Inserted and already recorded rows alike, the session is attended now
+    for row in batch:
+      attended_set.add(*session_key(row))
+
+  def _flush_one_by_one(self, batch:list) -> dict:
+    # A single bad row (e.g. a user deleted meanwhile) must not drop the whole batch
+    outcomes = {}
+    for row in batch:
+      try:
+        inserted = bool(insert_logs([row]))
+        db.session.commit()
+        self.flushed_rows += inserted
+        self.duplicate_rows += 1 - inserted
+        self._mark_attended([row])
+        outcomes[session_key(row)] = inserted
+      except SQLAlchemyError as err:
+        db.session.rollback()
+        self.failed_rows += 1
+        logger.error("Attendance log row dropped. %s %s", row, err)
+    return outcomes
+
+  def flush(self):
+    """
+    This function is to flush the pending rows right away (in the caller thread).
+    """
+    with self._cond:
+      batch = self._take_batch()
+    if batch:
+      self._flush(batch)
+
+  def close(self):
+    """
+    This function is to stop the background thread after flushing every pending row.
+    """
+    with self._cond:
+      self._running = False
+      self._cond.notify()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def stats(self) -> dict:
+    return {
+      'queue_depth': len(self._pending),
+      'flushes': self.flushes,
+      'flushed_rows': self.flushed_rows,
+      'failed_rows': self.failed_rows,
+      'duplicate_rows': self.duplicate_rows,
+      'last_flush_latency': self.last_flush_latency,
+      'max_flush_latency': self.max_flush_latency,
+      'avg_flush_latency': (self._total_flush_latency / self.flushes) if self.flushes else 0.0
+    }
+
+attendance_log_writer = AttendanceLogWriter()
@@ -0,0 +1,158 @@
+from bisect import bisect_left
+from hmac import compare_digest
+from threading import Lock
+
+# Default latency buckets (seconds), from half a millisecond to five seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _escape(value) -> str:
+  return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names:tuple, values:tuple, extra:str = '') -> str:
+  pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+  if extra:
+    pairs.append(extra)
+  return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value) -> str:
+  if value == float('inf'):
+    return '+Inf'
+  return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter(object):
+  """
+  A monotonically increasing value per label set.
+  """
+  type = 'counter'
+
+  def __init__(self, name:str, documentation:str, labelnames:tuple = ()):
+    self.name = name
+    self.documentation = documentation
+    self.labelnames = labelnames
+    self._values = {}
+    self._lock = Lock()
+
+  def inc(self, *labelvalues, amount = 1):
+    with self._lock:
+      self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+  def samples(self) -> list:
+    with self._lock:
+      return [(self.name, _labels(self.labelnames, labels), value) for labels, value in sorted(self._values.items())]
+
+class Histogram(object):
+  """
+  Cumulative bucket counts, sum and count of observations per label set.
+  """
+  type = 'histogram'
+
+  def __init__(self, name:str, documentation:str, labelnames:tuple = (), buckets:tuple = LATENCY_BUCKETS):
+    self.name = name
+    self.documentation = documentation
+    self.labelnames = labelnames
+    self.buckets = tuple(buckets)
+    self._values = {} # labels -> [bucket counts..., sum, count]
+    self._lock = Lock()
+
+  def observe(self, value:float, *labelvalues):
+    index = bisect_left(self.buckets, value)
+    with self._lock:
+      series = self._values.get(labelvalues)
+      if series is None:
+        series = self._values[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+      if index < len(self.buckets):
+        series[index] += 1
+      series[-2] += value
+      series[-1] += 1
+
+  def samples(self) -> list:
+    samples = []
+    with self._lock:
+      items = sorted((labels, list(series)) for labels, series in self._values.items())
+    for labels, series in items:
+      cumulative = 0
+      for bound, count in zip(self.buckets, series):
+        cumulative += count
+        samples.append((f'{self.name}_bucket', _labels(self.labelnames, labels, f'le="{_number(bound)}"'), cumulative))
+      samples.append((f'{self.name}_bucket', _labels(self.labelnames, labels, 'le="+Inf"'), series[-1]))
+      samples.append((f'{self.name}_sum', _labels(self.labelnames, labels), series[-2]))
+      samples.append((f'{self.name}_count', _labels(self.labelnames, labels), series[-1]))
+    return samples
+
+class CallbackMetric(object):
+  """
+  A gauge or counter read at scrape time from a function.
+  The function returns a number, or a dict of label value -> number.
+  """
+  def __init__(self, name:str, documentation:str, function, type:str = 'gauge', labelname:str = None):
+    self.name = name
+    self.documentation = documentation
+    self.function = function
+    self.type = type
+    self.labelname = labelname
+
+  def samples(self) -> list:
+    value = self.function()
+    if isinstance(value, dict):
+      return [(self.name, _labels((self.labelname,), (label,)), number) for label, number in sorted(value.items())]
+    return [(self.name, '', value)]
+
+class MetricsRegistry(object):
+  """
+  This class holds the metrics of this process and renders them in the Prometheus text format.
+  """
+  def __init__(self):
+    self._metrics = {}
+
+  def register(self, metric):
+    # Registering the same name again replaces it (e.g. app factory called twice)
+    self._metrics[metric.name] = metric
+    return metric
+
+  def counter(self, name:str, documentation:str, labelnames:tuple = ()) -> Counter:
+    return self.register(Counter(name, documentation, labelnames))
+
+  def histogram(self, name:str, documentation:str, labelnames:tuple = (), buckets:tuple = LATENCY_BUCKETS) -> Histogram:
+    return self.register(Histogram(name, documentation, labelnames, buckets))
+
+  def callback(self, name:str, documentation:str, function, type:str = 'gauge', labelname:str = None) -> CallbackMetric:
+    return self.register(CallbackMetric(name, documentation, function, type, labelname))
+
+  def render(self) -> str:
+    lines = []
+    for metric in self._metrics.values():
+      lines.append(f'# HELP {metric.name} {metric.documentation}')
+      lines.append(f'# TYPE {metric.name} {metric.type}')
+      for name, labels, value in metric.samples():
+        lines.append(f'{name}{labels} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+def is_authorized(authorization:str, token:str) -> bool:
+  """
+  This function is to check the Authorization header of a scrape against the metrics token (Bearer <token>).
+  """
+  if not authorization or not token:
+    return False
+  return compare_digest(authorization.encode('utf-8'), f'Bearer {token}'.encode('utf-8'))
+
+# Tap path metrics, observed by the ingest process
+TAP_LATENCY = registry.histogram(
+  'smartendance_tap_latency_seconds', 'Time from MQTT receipt to the reply publish of a tap'
+)
+TAP_STAGE_LATENCY = registry.histogram(
+  'smartendance_tap_stage_seconds', 'Time spent in each stage of a tap', labelnames=('stage',)
+)
+TAP_RESULTS = registry.counter(
+  'smartendance_tap_results_total', 'Handled taps by result code (100-104)', labelnames=('code',)
+)
+
+def observe_tap(trace, message:str):
+  """
+  This function is to record a handled tap (its TapTrace and reply message).
+  """
+  TAP_LATENCY.observe(trace.total / 1000)
+  for stage, milliseconds in trace.stages.items():
+    TAP_STAGE_LATENCY.observe(milliseconds / 1000, stage)
+  TAP_RESULTS.inc(message.split(' ', 1)[0])
@@ -1,12 +1,12 @@
-from flask_argon2 import generate_password_hash, check_password_hash
 from sqlalchemy import (
-  Enum, ForeignKey, 
-  Time, Column, Integer, String, Text, TIMESTAMP, CHAR
+  Enum, ForeignKey, Index, UniqueConstraint,
+  Date, DateTime, Time, Column, Integer, String, Text, TIMESTAMP, CHAR
 )
 from sqlalchemy.orm import relationship
 import enum
 
 from ..extensions import db
+from .hashing import password_pool, rfid_hasher
 
 class StudyProgram(enum.Enum):
   TMJ = 'TMJ'
@@ -39,8 +39,7 @@ class Room(db.Model):
   room_building = Column(Enum(RoomBuilding), nullable=False)
   room_description = Column(Text, nullable=True)
   courses = relationship('Course', backref='room_course', lazy=True)
-  student_attendance_logs = relationship('StudentAttendanceLogs', backref='room_student', lazy=True, cascade='all, delete-orphan')
-  lecturer_attendance_logs = relationship('LecturerAttendanceLogs', backref='room_lecturer', lazy=True, cascade='all, delete-orphan')
+  attendance_logs = relationship('AttendanceLogs', backref='room', lazy=True, cascade='all, delete-orphan')
 
 class RoleName(enum.Enum):
   ADMIN = 'ADMIN'
@@ -53,14 +52,14 @@ class User(db.Model):
   user_role = Column(Enum(RoleName), nullable=False)
   user_fullname = Column(String(200), nullable=False)
   user_password_hash = Column(String(256), nullable=False)
-  user_rfid_hash = Column(String(256), nullable=True, unique=True)
+  # Keyed HMAC-SHA256 digest of the card UID (rfid_hasher), unique index for the tap lookup
+  user_rfid_hash = Column(CHAR(64), nullable=True, unique=True)
   user_email_address = Column(String(100), nullable=False, unique=True)
   user_home_address = Column(String(256), nullable=True)
   lecturer_major = Column(Enum(Major), nullable=True)
   student_class = Column(CHAR(10), ForeignKey('class.class_id'), nullable=True)
   courses = relationship('Course', backref='user_course', lazy=True, cascade='all, delete-orphan')
-  student_attendance_logs = relationship('StudentAttendanceLogs', backref='user_student', lazy=True, cascade='all, delete-orphan')
-  lecturer_attendance_logs = relationship('LecturerAttendanceLogs', backref='user_lecturer', lazy=True, cascade='all, delete-orphan')
+  attendance_logs = relationship('AttendanceLogs', backref='user', lazy=True, cascade='all, delete-orphan')
 
   @property
   def password(self):
@@ -68,10 +67,10 @@ class User(db.Model):
   
   @password.setter
   def password(self, password):
-    self.user_password_hash = generate_password_hash(password)
+    self.user_password_hash = password_pool.hash(password)
   
   def verify_password(self, password):
-    return check_password_hash(self.user_password_hash, password)
+    return password_pool.verify(self.user_password_hash, password)
   
   @property
   def rfid(self):
@@ -79,10 +78,10 @@ class User(db.Model):
   
   @rfid.setter
   def rfid(self, rfid):
-    self.user_rfid_hash = generate_password_hash(rfid)
+    self.user_rfid_hash = rfid_hasher.digest(rfid)
   
   def verify_rfid(self, rfid):
-    return check_password_hash(self.user_rfid_hash, rfid)
+    return rfid_hasher.verify(self.user_rfid_hash, rfid)
 
 class Course(db.Model):
   __tablename__ = 'course'
@@ -97,28 +96,45 @@ class Course(db.Model):
   lecturer_nip = Column(String(18), ForeignKey('user.user_id'), nullable=False)
   class_id = Column(CHAR(10), ForeignKey('class.class_id'), nullable=False)
   room_id = Column(CHAR(10), ForeignKey('room.room_id'), nullable=False)
-  student_attendance_logs = relationship('StudentAttendanceLogs', backref='course_student', lazy=True, cascade='all, delete-orphan')
-  lecturer_attendance_logs = relationship('LecturerAttendanceLogs', backref='course_lecturer', lazy=True, cascade='all, delete-orphan')
+  attendance_logs = relationship('AttendanceLogs', backref='course', lazy=True, cascade='all, delete-orphan')
 
 class AttendanceStatus(enum.Enum):
   PRESENT = 'PRESENT'
   LATE = 'LATE'
   ALPHA = 'ALPHA'
 
-class StudentAttendanceLogs(db.Model):
-  __tablename__ = 'student_attendance_logs'
+class AttendanceLogs(db.Model):
+  """
+  Attendance logs of students and lecturers, user_role tells which one the user is.
+  """
+  __tablename__ = 'attendance_logs'
+  __table_args__ = (
+    # Duplicate check of a session and the logs of a user (per course)
+    Index('ix_attendance_logs_user_course_time', 'user_id', 'course_id', 'time_in'),
+    # Logs of a course (both roles or one of them)
+    Index('ix_attendance_logs_course_role_time', 'course_id', 'user_role', 'time_in'),
+    # Newest logs of a role, page by page (admin listing without a course)
+    Index('ix_attendance_logs_role_time', 'user_role', 'time_in'),
+    # One log per user, course and session (day)
+    UniqueConstraint('user_id', 'course_id', 'session_date', name='uq_attendance_logs_session'),
+  )
   log_id = Column(Integer(), primary_key=True, nullable=False)
   time_in = Column(TIMESTAMP(timezone=True), nullable=False)
+  # Local date of time_in, the session of the log
+  session_date = Column(Date, nullable=False)
   status = Column(Enum(AttendanceStatus), nullable=False)
-  student_nim = Column(String(18), ForeignKey('user.user_id'), nullable=False)
+  user_role = Column(Enum(RoleName), nullable=False)
+  user_id = Column(String(18), ForeignKey('user.user_id'), nullable=False)
   course_id = Column(CHAR(15), ForeignKey('course.course_id'), nullable=False)
   room_id = Column(CHAR(10), ForeignKey('room.room_id'), nullable=False)
 
-class LecturerAttendanceLogs(db.Model):
-  __tablename__ = 'lecturer_attendance_logs'
-  log_id = Column(Integer(), primary_key=True, nullable=False)
-  time_in = Column(TIMESTAMP(timezone=True), nullable=False)
-  status = Column(Enum(AttendanceStatus), nullable=False)
-  lecturer_nip = Column(String(18), ForeignKey('user.user_id'), nullable=False)
-  course_id = Column(CHAR(15), ForeignKey('course.course_id'), nullable=False)
-  room_id = Column(CHAR(10), ForeignKey('room.room_id'), nullable=False)
+class DataVersion(db.Model):
+  """
+  Change counter of a kind of data ('users' or 'courses'), bumped after every write of it.
+  The read endpoints build their ETag from it (see conditional.py).
+  """
+  __tablename__ = 'data_version'
+  scope = Column(String(20), primary_key=True, nullable=False)
+  version = Column(Integer(), nullable=False)
+  # UTC time of the last write
+  updated_at = Column(DateTime, nullable=False)
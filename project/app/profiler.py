@@ -0,0 +1,136 @@
+from flask import g, request
+from flask_sqlalchemy.record_queries import get_recorded_queries
+from collections import Counter
+from heapq import heappush, heappushpop
+from threading import Lock
+from time import perf_counter
+import logging
+import random
+import re
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Literals and expanded IN lists are replaced, so the same statement with other values has one shape
+_SHAPE_PATTERNS = (
+  (re.compile(r"'(?:[^']|'')*'"), '?'),
+  (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+  (re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)'), '(?)'),
+  (re.compile(r'\s+'), ' '),
+)
+
+REQUEST_DB_TIME = registry.histogram(
+  'smartendance_request_db_seconds', 'Database time of a request per endpoint', labelnames=('endpoint',)
+)
+REQUEST_QUERIES = registry.histogram(
+  'smartendance_request_queries', 'Queries issued by a request per endpoint', labelnames=('endpoint',),
+  buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+REPEATED_QUERIES = registry.counter(
+  'smartendance_repeated_queries_total', 'Requests that repeated one statement shape (N+1) per endpoint', labelnames=('endpoint',)
+)
+
+def statement_shape(statement:str) -> str:
+  """
+  This function is to normalize a SQL statement into its shape (without literal values).
+  """
+  for pattern, replacement in _SHAPE_PATTERNS:
+    statement = pattern.sub(replacement, statement)
+  return statement.strip()
+
+class SqlProfiler(object):
+  """
+  This class reads the queries recorded by Flask-SQLAlchemy (SQLALCHEMY_RECORD_QUERIES) for every request.
+  It adds a Server-Timing header (query count and DB time), warns when one request repeats
+  the same statement shape (the N+1 pattern) and keeps a sample of the slowest requests.
+  Config: SQL_PROFILER_ENABLED, SQL_PROFILER_REPEAT_THRESHOLD, SQL_PROFILER_SLOW_REQUEST,
+  SQL_PROFILER_SAMPLE_RATE, SQL_PROFILER_WORST_SIZE
+  """
+  def __init__(self):
+    self.repeat_threshold = 10
+    self.slow_request = 0.5
+    self.sample_rate = 1.0
+    self.worst_size = 20
+    self._worst = [] # min-heap of (db time, request summary)
+    self._lock = Lock()
+
+  def init_app(self, app):
+    """
+    Required param: app (Flask)
+    """
+    if not app.config.get('SQL_PROFILER_ENABLED', True):
+      return
+    if not app.config.get('SQLALCHEMY_RECORD_QUERIES'):
+      logger.warning("SQL profiler is disabled, SQLALCHEMY_RECORD_QUERIES is not set")
+      return
+    self.repeat_threshold = app.config.get('SQL_PROFILER_REPEAT_THRESHOLD', self.repeat_threshold)
+    self.slow_request = app.config.get('SQL_PROFILER_SLOW_REQUEST', self.slow_request)
+    self.sample_rate = app.config.get('SQL_PROFILER_SAMPLE_RATE', self.sample_rate)
+    self.worst_size = app.config.get('SQL_PROFILER_WORST_SIZE', self.worst_size)
+    app.before_request(self._start)
+    app.after_request(self._finish)
+
+  def _start(self):
+    g._profiler_started_at = perf_counter()
+
+  def _finish(self, response):
+    started_at = g.pop('_profiler_started_at', None)
+    if started_at is None or request.endpoint in (None, 'static'):
+      return response
+    elapsed = perf_counter() - started_at
+    queries = get_recorded_queries()
+    db_time = sum(query.duration for query in queries)
+    endpoint = request.endpoint
+
+    response.headers.add(
+      'Server-Timing', f'db;dur={db_time * 1000:.2f};desc="{len(queries)} queries", app;dur={elapsed * 1000:.2f}'
+    )
+    REQUEST_DB_TIME.observe(db_time, endpoint)
+    REQUEST_QUERIES.observe(len(queries), endpoint)
+
+    shapes = Counter(statement_shape(query.statement) for query in queries)
+    repeated = [(shape, count) for shape, count in shapes.most_common() if count > self.repeat_threshold]
+    if repeated:
+      REPEATED_QUERIES.inc(endpoint)
+      shape, count = repeated[0]
+      logger.warning(
+        "Repeated query in one request (N+1)",
+        extra={'endpoint': endpoint, 'path': request.path, 'repeat_count': count, 'statement': shape, 'query_count': len(queries)}
+      )
+
+    if elapsed >= self.slow_request:
+      self._sample(endpoint, elapsed, db_time, queries)
+    return response
+
+  def _sample(self, endpoint:str, elapsed:float, db_time:float, queries:list):
+    slowest = sorted(queries, key=lambda query: query.duration, reverse=True)[:3]
+    summary = {
+      'endpoint': endpoint,
+      'path': request.path,
+      'method': request.method,
+      'elapsed_ms': round(elapsed * 1000, 2),
+      'db_ms': round(db_time * 1000, 2),
+      'query_count': len(queries),
+      'slowest_queries': [
+        {'statement': statement_shape(query.statement), 'ms': round(query.duration * 1000, 2), 'location': query.location}
+        for query in slowest
+      ]
+    }
+    with self._lock:
+      entry = (elapsed, id(summary), summary)
+      if len(self._worst) < self.worst_size:
+        heappush(self._worst, entry)
+      else:
+        heappushpop(self._worst, entry)
+    if random.random() < self.sample_rate:
+      logger.warning("Slow request", extra=summary)
+
+  def worst(self) -> list:
+    """
+    This function is to get the slowest requests seen by this process, slowest first.
+    """
+    with self._lock:
+      return [summary for _, _, summary in sorted(self._worst, key=lambda entry: entry[0], reverse=True)]
+
+sql_profiler = SqlProfiler()
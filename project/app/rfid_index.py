@@ -0,0 +1,108 @@
+from collections import namedtuple
+from threading import Lock
+
+from ..extensions import db
+from .models import User
+
+# Lightweight, session independent snapshot of a card holder
+CardHolder = namedtuple('CardHolder', ['user_id', 'user_role', 'student_class'])
+
+class RfidIndex(object):
+  """
+  This class is a process-level index which maps an RFID card digest (user_rfid_hash) to its card holder.
+  The MQTT tap path uses it to resolve users without a database round trip.
+  The admin views keep it in sync after every committed user change.
+  A single user change updates both maps in place under the lock (constant time), lookups read
+  without the lock as one dict get is atomic; only load() builds new maps and swaps them.
+  """
+  def __init__(self):
+    self._holders = {} # user_rfid_hash -> CardHolder
+    self._rfids = {} # user_id -> user_rfid_hash
+    self._lock = Lock()
+    self.is_loaded = False
+    self.hits = 0
+    self.misses = 0
+
+  @staticmethod
+  def _to_holder(user_id:str, user_role, student_class:str) -> CardHolder:
+    # Enum columns hydrate as RoleName, plain strings are kept as is
+    role = getattr(user_role, 'value', user_role)
+    return CardHolder(user_id=user_id, user_role=role, student_class=student_class)
+
+  def load(self) -> int:
+    """
+    This function is to (re)build the whole index from the user table.
+    Must be called inside an application context.
+    """
+    rows = (
+      db.session.query(User.user_id, User.user_role, User.student_class, User.user_rfid_hash)
+      .filter(User.user_rfid_hash.isnot(None))
+      .all()
+    )
+    holders = {}
+    rfids = {}
+    for user_id, user_role, student_class, user_rfid_hash in rows:
+      holders[user_rfid_hash] = self._to_holder(user_id, user_role, student_class)
+      rfids[user_id] = user_rfid_hash
+    # Swap both maps at once, readers never see a half built index
+    with self._lock:
+      self._holders = holders
+      self._rfids = rfids
+      self.is_loaded = True
+    return len(holders)
+
+  def lookup(self, card_digest:str):
+    """
+    This function is to resolve a card digest (rfid_hasher.digest of the UID) to a CardHolder (or None).
+    """
+    if not self.is_loaded:
+      self.load()
+    holder = self._holders.get(card_digest)
+    with self._lock:
+      if holder:
+        self.hits += 1
+      else:
+        self.misses += 1
+    return holder
+
+  def put(self, user:User):
+    """
+    This function is to insert or refresh a single user after it is committed.
+    """
+    with self._lock:
+      old_rfid = self._rfids.pop(user.user_id, None)
+      if user.user_rfid_hash:
+        self._holders[user.user_rfid_hash] = self._to_holder(user.user_id, user.user_role, user.student_class)
+        self._rfids[user.user_id] = user.user_rfid_hash
+      # Drop the previous card of this user (if the card was changed)
+      if old_rfid is not None and old_rfid != user.user_rfid_hash:
+        self._holders.pop(old_rfid, None)
+
+  def refresh(self, user_id:str):
+    """
+    This function is to re-read a single user from the database (put or discard).
+    Must be called inside an application context.
+    """
+    user = db.session.get(User, user_id)
+    if user:
+      self.put(user)
+    else:
+      self.discard(user_id)
+
+  def discard(self, user_id:str):
+    """
+    This function is to remove a user from the index after it is deleted.
+    """
+    with self._lock:
+      old_rfid = self._rfids.pop(user_id, None)
+      if old_rfid is not None:
+        self._holders.pop(old_rfid, None)
+
+  def stats(self) -> dict:
+    return {
+      'size': len(self._holders),
+      'hits': self.hits,
+      'misses': self.misses
+    }
+
+rfid_index = RfidIndex()
@@ -0,0 +1,33 @@
+from flask import Response, current_app, request, stream_with_context
+
+from ..extensions import db
+
+def stream_requested() -> bool:
+  """
+  This function is to tell whether the client asked for the streaming mode (stream=1 query parameter).
+  """
+  return request.args.get('stream', '') in ('1', 'true')
+
+def json_chunks(key:str, query, serialize, batch_size:int):
+  """
+  This function is to generate the JSON text of {key: [items]} from the rows of a query, batch by batch.
+  The rows are read with a server-side cursor (yield_per), and serialize turns a batch of rows into
+  a list of dicts, so at most one batch of rows and of JSON text is held at a time.
+  Must be iterated inside an application context.
+  """
+  dumps = current_app.json.dumps
+  yield '{' + dumps(key) + ':['
+  separator = ''
+  for rows in db.session.execute(query.statement.execution_options(yield_per=batch_size)).partitions():
+    # The JSON array of the batch without its brackets
+    yield separator + dumps(serialize(rows))[1:-1]
+    separator = ','
+  yield ']}'
+
+def stream_json(key:str, query, serialize) -> Response:
+  """
+  This function is to send the rows of a query as a streamed JSON response {key: [items]}.
+  The worker memory stays the same whatever the number of rows. Config: STREAM_BATCH_SIZE (rows per batch)
+  """
+  chunks = json_chunks(key, query, serialize, current_app.config['STREAM_BATCH_SIZE'])
+  return Response(stream_with_context(chunks), mimetype='application/json')
@@ -0,0 +1,174 @@
+from queue import Queue, Full, Empty
+from threading import Lock, Thread
+from time import monotonic
+import atexit
+import logging
+
+from ..extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Overflow policies of the inbound tap queue
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_BLOCK = 'block'
+
+class TapTask(object):
+  """
+  An inbound tap waiting in the queue, with its per-stage timestamps.
+  """
+  __slots__ = ('uid', 'topic', 'received_at', 'started_at', 'finished_at')
+
+  def __init__(self, uid:str, topic:str):
+    self.uid = uid
+    self.topic = topic
+    self.received_at = monotonic()
+    self.started_at = None
+    self.finished_at = None
+
+class TapWorkerPool(object):
+  """
+  This class is a bounded queue of inbound taps served by a pool of worker threads.
+  The MQTT network thread only enqueues, so a slow database never stalls the broker connection.
+  Each worker runs inside its own application context (and so its own DB session).
+  Config: TAP_WORKERS, TAP_QUEUE_SIZE, TAP_QUEUE_OVERFLOW (drop_newest, drop_oldest or block).
+  """
+  def __init__(self):
+    self.app = None
+    self.handler = None
+    self.workers = 4
+    self.queue_size = 1000
+    self.overflow = OVERFLOW_DROP_NEWEST
+    self._queue = None
+    self._threads = []
+    self._lock = Lock()
+    # Statistics
+    self.received = 0
+    self.processed = 0
+    self.failed = 0
+    self.dropped = 0
+    self.max_queue_depth = 0
+    self._total_queue_wait = 0.0
+    self._total_handle_time = 0.0
+    self.max_queue_wait = 0.0
+    self.max_handle_time = 0.0
+
+  def init_app(self, app, handler):
+    """
+    Required params: app (Flask) and handler, a function called as handler(uid, topic, received_at) for every tap.
+    """
+    self.app = app
+    self.handler = handler
+    self.workers = app.config.get('TAP_WORKERS', self.workers)
+    self.queue_size = app.config.get('TAP_QUEUE_SIZE', self.queue_size)
+    self.overflow = app.config.get('TAP_QUEUE_OVERFLOW', self.overflow)
+    if self.overflow not in (OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK):
+      raise ValueError(f"Invalid TAP_QUEUE_OVERFLOW value: {self.overflow}")
+    if self._threads:
+      return
+    self._queue = Queue(maxsize=self.queue_size)
+    for i in range(self.workers):
+      thread = Thread(target=self._run, name=f'tap-worker-{i}', daemon=True)
+      thread.start()
+      self._threads.append(thread)
+    # Drain the queue when the process exits
+    atexit.register(self.close)
+
+  def submit(self, uid:str, topic:str) -> bool:
+    """
+    This function is to enqueue an inbound tap. It returns False if the tap is dropped.
+    """
+    task = TapTask(uid, topic)
+    with self._lock:
+      self.received += 1
+    if self.overflow == OVERFLOW_BLOCK:
+      self._queue.put(task)
+    else:
+      try:
+        self._queue.put_nowait(task)
+      except Full:
+        if self.overflow == OVERFLOW_DROP_NEWEST:
+          self._count_drop(task)
+          return False
+        # Make room by dropping the oldest waiting tap
+        try:
+          self._count_drop(self._queue.get_nowait())
+          self._queue.task_done()
+        except Empty:
+          pass
+        try:
+          self._queue.put_nowait(task)
+        except Full:
+          self._count_drop(task)
+          return False
+    depth = self._queue.qsize()
+    if depth > self.max_queue_depth:
+      self.max_queue_depth = depth
+    return True
+
+  def _count_drop(self, task:TapTask):
+    with self._lock:
+      self.dropped += 1
+    logger.warning("Tap queue is full, dropped tap from %s", task.topic)
+
+  def _run(self):
+    with self.app.app_context():
+      while True:
+        task = self._queue.get()
+        if task is None:
+          self._queue.task_done()
+          return
+        task.started_at = monotonic()
+        try:
+          self.handler(task.uid, task.topic, task.received_at)
+          failed = False
+        except Exception as err:
+          db.session.rollback()
+          failed = True
+          logger.exception("Tap handling failed. %s", err)
+        finally:
+          # Release the connection back to the pool between taps
+          db.session.remove()
+          task.finished_at = monotonic()
+          self._queue.task_done()
+        self._record(task, failed)
+
+  def _record(self, task:TapTask, failed:bool):
+    queue_wait = task.started_at - task.received_at
+    handle_time = task.finished_at - task.started_at
+    with self._lock:
+      if failed:
+        self.failed += 1
+      else:
+        self.processed += 1
+      self._total_queue_wait += queue_wait
+      self._total_handle_time += handle_time
+      self.max_queue_wait = max(self.max_queue_wait, queue_wait)
+      self.max_handle_time = max(self.max_handle_time, handle_time)
+
+  def close(self):
+    """
+    This function is to stop every worker after the queued taps are handled.
+    """
+    for _ in self._threads:
+      self._queue.put(None)
+    for thread in self._threads:
+      thread.join()
+    self._threads = []
+
+  def stats(self) -> dict:
+    done = self.processed + self.failed
+    return {
+      'queue_depth': self._queue.qsize() if self._queue else 0,
+      'max_queue_depth': self.max_queue_depth,
+      'received': self.received,
+      'processed': self.processed,
+      'failed': self.failed,
+      'dropped': self.dropped,
+      'avg_queue_wait': (self._total_queue_wait / done) if done else 0.0,
+      'max_queue_wait': self.max_queue_wait,
+      'avg_handle_time': (self._total_handle_time / done) if done else 0.0,
+      'max_handle_time': self.max_handle_time
+    }
+
+tap_pool = TapWorkerPool()
@@ -0,0 +1,27 @@
+from time import monotonic
+
+class TapTrace(object):
+  """
+  Per-stage latencies (in milliseconds) of one tap, from MQTT receipt to the reply.
+  """
+  __slots__ = ('received_at', 'started_at', 'last_mark', 'stages')
+
+  def __init__(self, received_at:float = None):
+    now = monotonic()
+    self.received_at = received_at if received_at is not None else now
+    self.started_at = now
+    self.last_mark = now
+    # Time spent in the inbound queue before a worker picked the tap up
+    self.stages = {'queue': (now - self.received_at) * 1000}
+
+  def mark(self, stage:str):
+    """
+    This function is to close a stage, its latency is the time since the previous mark.
+    """
+    now = monotonic()
+    self.stages[stage] = (now - self.last_mark) * 1000
+    self.last_mark = now
+
+  @property
+  def total(self) -> float:
+    return (self.last_mark - self.received_at) * 1000
@@ -0,0 +1,88 @@
+from bisect import bisect_right
+from collections import namedtuple
+from threading import Lock
+
+from ..extensions import db
+from .models import Course
+
+# Lightweight, session independent snapshot of a scheduled course
+ScheduledCourse = namedtuple('ScheduledCourse', ['course_id', 'room_id', 'time_start', 'time_end'])
+
+class _DaySlots(object):
+  """
+  Courses of one (owner, day) key, sorted by time_start.
+  """
+  __slots__ = ('starts', 'ends', 'courses')
+
+  def __init__(self, courses:list):
+    courses = sorted(courses, key=lambda course: course.time_start)
+    self.starts = [course.time_start for course in courses]
+    self.ends = [course.time_end for course in courses]
+    self.courses = courses
+
+  def find(self, current_time):
+    # Right-most course that already started
+    i = bisect_right(self.starts, current_time) - 1
+    # Walk back only when schedules overlap, normally the first one matches
+    while i >= 0:
+      if self.ends[i] > current_time:
+        return self.courses[i]
+      i -= 1
+    return None
+
+class Timetable(object):
+  """
+  This class is a compiled weekly timetable built from the course table.
+  The MQTT tap path uses it to find the running course without SQL.
+  Slots are keyed by (class_id, day) for students and (lecturer_nip, day) for lecturers.
+  """
+  def __init__(self):
+    self._by_class = {}
+    self._by_lecturer = {}
+    self._lock = Lock()
+    self.is_loaded = False
+
+  def load(self) -> int:
+    """
+    This function is to (re)compile the timetable from the course table.
+    Must be called inside an application context.
+    """
+    rows = db.session.query(
+      Course.course_id, Course.room_id, Course.day,
+      Course.time_start, Course.time_end,
+      Course.class_id, Course.lecturer_nip
+    ).all()
+    by_class = {}
+    by_lecturer = {}
+    for course_id, room_id, day, time_start, time_end, class_id, lecturer_nip in rows:
+      scheduled = ScheduledCourse(course_id, room_id, time_start, time_end)
+      by_class.setdefault((class_id, day), []).append(scheduled)
+      by_lecturer.setdefault((lecturer_nip, day), []).append(scheduled)
+    by_class = {key: _DaySlots(courses) for key, courses in by_class.items()}
+    by_lecturer = {key: _DaySlots(courses) for key, courses in by_lecturer.items()}
+    # Swap both maps at once, readers never see a half compiled timetable
+    with self._lock:
+      self._by_class = by_class
+      self._by_lecturer = by_lecturer
+      self.is_loaded = True
+    return len(rows)
+
+  def find_class_course(self, class_id:str, day:str, current_time):
+    """
+    This function is to find the course a class is attending at the given day and time.
+    """
+    if not self.is_loaded:
+      self.load()
+    slots = self._by_class.get((class_id, day))
+    return slots.find(current_time) if slots else None
+
+  def find_lecturer_course(self, lecturer_nip:str, day:str, current_time):
+    """
+    This function is to find the course a lecturer is teaching at the given day and time.
+    """
+    if not self.is_loaded:
+      self.load()
+    slots = self._by_lecturer.get((lecturer_nip, day))
+    return slots.find(current_time) if slots else None
+
+timetable = Timetable()
@@ -0,0 +1,265 @@
+from datetime import datetime
+from sqlalchemy import select, literal, union_all
+
+from ..extensions import db
+from .models import User, Course, Class, Room, Major
+from .hashing import rfid_hasher
+
+# Values per IN list of one existence query, bulk paths are split in several queries
+PROBE_CHUNK_SIZE = 1000
+
+class ValidationResult(object):
+  """
+  Error messages of one form validation, created per call so concurrent requests never share them.
+  It is truthy when the form is valid.
+  """
+  def __init__(self):
+    self.errors = []
+
+  def add(self, message:str):
+    self.errors.append(message)
+
+  @property
+  def is_valid(self) -> bool:
+    return not self.errors
+
+  def __bool__(self) -> bool:
+    return self.is_valid
+
+class ExistingRecords(object):
+  """
+  This class holds which of the probed values already exist in the database.
+  Every kind maps an existing value to its owner (the user_id for user columns, the value itself otherwise).
+  RFID cards are held by their digest (rfid_hasher.digest), as stored in user_rfid_hash.
+  """
+  KINDS = ('user_id', 'email', 'rfid', 'class_id', 'room_id', 'lecturer_nip', 'course_id')
+
+  def __init__(self):
+    self._found = {kind: {} for kind in self.KINDS}
+
+  def add(self, kind:str, value, owner):
+    self._found[kind][value] = owner
+
+  def exists(self, kind:str, value) -> bool:
+    return value in self._found[kind]
+
+  def owner(self, kind:str, value):
+    return self._found[kind].get(value)
+
+  def taken(self, kind:str, value, owner) -> bool:
+    """
+    This function is to check if a value exists and belongs to another owner.
+    """
+    return value in self._found[kind] and self._found[kind][value] != owner
+
+def _probes(user_ids, emails, rfids, class_ids, room_ids, lecturer_nips, course_ids) -> list:
+  # (kind, value column, owner column, extra condition, values)
+  return [
+    ('user_id', User.user_id, User.user_id, None, user_ids),
+    ('email', User.user_email_address, User.user_id, None, emails),
+    ('rfid', User.user_rfid_hash, User.user_id, None, rfids),
+    ('class_id', Class.class_id, Class.class_id, None, class_ids),
+    ('room_id', Room.room_id, Room.room_id, None, room_ids),
+    ('lecturer_nip', User.user_id, User.user_id, User.user_role == 'LECTURER', lecturer_nips),
+    ('course_id', Course.course_id, Course.course_id, None, course_ids),
+  ]
+
+def probe_existing(
+  user_ids=(), emails=(), rfids=(), class_ids=(), room_ids=(), lecturer_nips=(), course_ids=()
+) -> ExistingRecords:
+  """
+  This function is to find which of the given values already exist, with one UNION ALL query
+  (one round trip) for a form submit. Bulk paths pass every value of a file at once,
+  they are split in chunks of PROBE_CHUNK_SIZE values per kind.
+  Must be called inside an application context.
+  """
+  existing = ExistingRecords()
+  # Cards are stored as their keyed digest
+  rfids = [rfid_hasher.digest(uid) for uid in rfids if uid]
+  pending = []
+  for kind, column, owner, condition, values in _probes(user_ids, emails, rfids, class_ids, room_ids, lecturer_nips, course_ids):
+    values = sorted({value for value in values if value})
+    for start in range(0, len(values), PROBE_CHUNK_SIZE):
+      pending.append((kind, column, owner, condition, values[start:start + PROBE_CHUNK_SIZE]))
+  # Every query answers up to one chunk of each kind
+  while pending:
+    selects, rest = [], []
+    seen_kinds = set()
+    for probe in pending:
+      kind, column, owner, condition, values = probe
+      if kind in seen_kinds:
+        rest.append(probe)
+        continue
+      seen_kinds.add(kind)
+      query = select(literal(kind).label('kind'), column.label('value'), owner.label('owner')).where(column.in_(values))
+      if condition is not None:
+        query = query.where(condition)
+      selects.append(query)
+    statement = selects[0] if len(selects) == 1 else union_all(*selects)
+    for kind, value, owner in db.session.execute(statement):
+      existing.add(kind, value, owner)
+    pending = rest
+  return existing
+
+def is_strong_password(password:str) -> bool:
+  # Minimum 1 uppercase, 1 lowercase, 1 number, and 1 symbol
+  return (
+    any(char.isupper() for char in password) and
+    any(char.islower() for char in password) and
+    any(char.isdigit() for char in password) and
+    any(not char.isalnum() for char in password)
+  )
+
+def validate_user_form(
+  user_id:str, user_role:str, user_fullname:str, user_pw:str, user_confirm_pw:str, user_email_address:str, user_uid:str, user_home_address:str = None, student_class:str = None,
+  lecturer_major:str = None, edit_mode:bool = False, existing:ExistingRecords = None
+  ) -> ValidationResult:
+  """
+  This function is to validate a student or lecturer form.
+  Optional param: existing (ExistingRecords), probed beforehand by a bulk path. If it is not passed,
+  the existence questions of this form are answered with one probe_existing query.
+  """
+  result = ValidationResult()
+  if existing is None:
+    existing = probe_existing(
+      user_ids=[user_id], emails=[user_email_address], rfids=[user_uid],
+      class_ids=[student_class] if user_role == 'STUDENT' else ()
+    )
+  # Check validation mode (edit/register)
+  if not edit_mode:
+    if not (user_id and user_fullname and user_pw and user_confirm_pw and user_email_address and user_uid):
+      result.add('Please fill all the form!')
+    # Check if the user password is valid
+    if len(user_pw) < 8:
+      result.add('Password must be at least 8 characters!')
+    # Check if the password contains minimum 1 uppercase, 1 lowercase, 1 number, and 1 symbol
+    if not is_strong_password(user_pw):
+      result.add('Password must contain minimum 1 uppercase, 1 lowercase, 1 number, and 1 symbol!')
+    # Check if the user already registered
+    if existing.exists('user_id', user_id):
+      if user_role == 'STUDENT':
+        result.add('Student already registered!')
+      elif user_role == 'LECTURER':
+        result.add('Lecturer already registered!')
+  # If edit mode is set to True
+  else:
+    # Check if new user password is set
+    if user_pw:
+      # Then, check for the length of the password
+      if len(user_pw) < 8:
+        result.add('Password must be at least 8 characters!')
+      # Then, check if the password contains minimum 1 uppercase, 1 lowercase, 1 number, and 1 symbol
+      if not is_strong_password(user_pw):
+        result.add('Password must contain minimum 1 uppercase, 1 lowercase, 1 number, and 1 symbol!')
+  # Check if the email address or the RFID card belongs to another user
+  if existing.taken('email', user_email_address, user_id):
+    result.add('Email address is already registered!')
+  if user_uid and existing.taken('rfid', rfid_hasher.digest(user_uid), user_id):
+    result.add('RFID card is already registered!')
+  # Check if user confirm password is same as password
+  if user_pw != user_confirm_pw:
+    result.add('Confirm password must be same as password!')
+  # Check if user id contain space
+  if (type(user_id) != int) and (" " in user_id):
+    result.add('User ID must not contain space!')
+  # Validate user email address
+  if not '@' in user_email_address:
+    result.add('Email address is not valid!')
+  # Validate user home address
+  if user_home_address:
+    if len(user_home_address) > 256:
+      result.add('Home address must be less than 256 characters!')
+  # Validate user role
+  if user_role == 'STUDENT':
+    # Check if the user id length is 10
+    if len(user_id) != 10:
+      result.add('Student NIM must be 10 characters long!')
+    # Check if the student class is valid
+    if not existing.exists('class_id', student_class):
+      result.add('Student class is not valid!')
+  elif user_role == 'LECTURER':
+    # Check if the lecturer nip length is 18
+    if len(user_id) != 18:
+      result.add('Lecturer NIP must be 18 characters long!')
+    # Check if the lecturer major is valid
+    lecturer_major_list = [major.value for major in Major]
+    if lecturer_major not in lecturer_major_list:
+      result.add('Lecturer major is not valid!')
+  # The form is valid if there is no error message
+  return result
+
+def is_valid_day(day: str) -> bool:
+  days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+  return day.capitalize() in days_of_week
+
+def is_valid_time(time: str) -> bool:
+  try:
+    datetime.strptime(time, '%H:%M:%S')
+    return True
+  except ValueError:
+    return False
+
+def parse_time(value:str):
+  """
+  This function is to turn a HH:MM:SS form or file value into a time (None if it is not one).
+  """
+  try:
+    return datetime.strptime(value, '%H:%M:%S').time()
+  except (TypeError, ValueError):
+    return None
+
+def validate_course_form(
+  course_id:str, course_name:str, course_sks:int, at_semester:int,
+  day:str, time_start:str, time_end:str, course_description:str,
+  lecturer_nip:str, class_id:str, room_id:str, edit_mode:bool=False, existing:ExistingRecords = None
+) -> ValidationResult:
+  """
+  This function is to validate a course form.
+  Optional param: existing (ExistingRecords), probed beforehand by a bulk path. If it is not passed,
+  the existence questions of this form are answered with one probe_existing query.
+  """
+  result = ValidationResult()
+  if existing is None:
+    existing = probe_existing(
+      course_ids=[course_id], lecturer_nips=[lecturer_nip], class_ids=[class_id], room_ids=[room_id]
+    )
+  if not edit_mode:
+    if not (course_id and course_name and course_sks and at_semester
+            and day and time_start and time_end
+            and lecturer_nip and class_id and room_id
+    ):
+      result.add('Please fill all the form!')
+    # Check if course already registered
+    if existing.exists('course_id', course_id):
+      result.add('Course already registered!')
+  # Check if course_id contain space
+  if (" " in course_id):
+    result.add('Course ID must not contain space!')
+  if len(course_id) > 15:
+    result.add('Course ID must be less than 15 characters!')
+  if len(course_name) > 100:
+    result.add('Course name must be less than 100 characters!')
+  if not (isinstance(course_sks,int)) or (course_sks<1 or course_sks>=6):
+    result.add('Course SKS must be between 1 and 6!')
+  if not (isinstance(at_semester,int)) or (at_semester<1 or at_semester>=8):
+    result.add('Course semester must be between 1 and 8!')
+  if not is_valid_day(day):
+    result.add('Day must be a day of week!')
+  if time_start == time_end:
+    result.add('Time start and time end must be different!')
+  if not (is_valid_time(time_start) or is_valid_time(time_end)):
+    result.add('Time start or time end must be in format HH:MM AM/PM!')
+  if course_description:
+    if len(course_description) > 256:
+      result.add('Course description must be less than 256 characters!')
+  # Check for lecturer NIP
+  if not existing.exists('lecturer_nip', lecturer_nip):
+    result.add('Lecturer NIP is not valid!')
+  # Check for class ID
+  if not existing.exists('class_id', class_id):
+    result.add('Class ID is not valid!')
+  # Check for room ID
+  if not existing.exists('room_id', room_id):
+    result.add('Room ID is not valid!')
+  # The form is valid if there is no error message
+  return result
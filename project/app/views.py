@@ -4,6 +4,7 @@ from .controllers.user_ctrl import *
 from .controllers.admin_ctrl import *
 from .controllers.lecturer_ctrl import *
 from .controllers.student_ctrl import *
+from .controllers.metrics_ctrl import *
 
 # Creating endpoint blueprints for each user (from general to specific)
 user_ep = Blueprint('user_ep', __name__)
@@ -16,6 +17,8 @@ user_ep.add_url_rule('/', endpoint="index", view_func=index, methods=['GET'])
 user_ep.add_url_rule('/login', endpoint="login", view_func=login, methods=['GET', 'POST'])
 user_ep.add_url_rule('/logout', endpoint="logout", view_func=logout, methods=['GET'])
 user_ep.add_url_rule('/dashboard', endpoint="dashboard", view_func=dashboard, methods=['GET'])
+# Prometheus metrics of this process
+user_ep.add_url_rule('/metrics', endpoint="metrics", view_func=metrics, methods=['GET'])
 
 """ List of admin endpoints (admin routes) """
 # Action for registation (insert/add)
@@ -23,6 +26,8 @@ admin_ep.add_url_rule('/add', endpoint="add", view_func=add, methods=['GET'])
 admin_ep.add_url_rule('/add/student', endpoint="add_student", view_func=add_student, methods=['GET', 'POST'])
 admin_ep.add_url_rule('/add/lecturer', endpoint="add_lecturer", view_func=add_lecturer, methods=['GET', 'POST'])
 admin_ep.add_url_rule('/add/course', endpoint="add_course", view_func=add_course, methods=['GET', 'POST'])
+# Bulk import of students, lecturers or courses (CSV/XLSX)
+admin_ep.add_url_rule('/import', endpoint="import_data", view_func=import_data, methods=['GET', 'POST'])
 
 # Action for view course
 admin_ep.add_url_rule('/courses/get', endpoint="get_courses", view_func=get_courses, methods=['GET'])
@@ -65,7 +70,7 @@ lecturer_ep.add_url_rule('/logs/export', endpoint="export_lecturer_attendance",
 
 # student attendance logs
 lecturer_ep.add_url_rule('/student_logs', endpoint="view_student_data", view_func=view_student_data, methods=['GET'])
-lecturer_ep.add_url_rule('/student_logs/<string:course_id>/students_data', endpoint="get_student_data", view_func=get_student_data, methods=['GET'])
+lecturer_ep.add_url_rule('/student_logs/<string:selected_course>/students_data', endpoint="get_student_data", view_func=get_student_data, methods=['GET'])
 lecturer_ep.add_url_rule('/students_logs/<string:selected_course>/get', endpoint="get_data_student", view_func=get_student_data, methods=['GET'])
 
 lecturer_ep.add_url_rule('/logs/<string:course_id>/student/get', endpoint='get_student_logs', view_func=get_student_logs, methods=['GET'])
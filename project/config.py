@@ -17,13 +17,44 @@ class DbConfig(object):
     "pool_size": 10,
     "max_overflow": 20,
   }
+  # Write-behind buffer of attendance logs (rows, seconds)
+  ATTENDANCE_LOG_BATCH_SIZE = 200
+  ATTENDANCE_LOG_FLUSH_INTERVAL = 0.25
+  # Per-request SQL profiler (Server-Timing header, N+1 warning, slow request samples)
+  SQL_PROFILER_ENABLED = environ.get("SQL_PROFILER_ENABLED", "1") == "1"
+  # Warn when one request runs the same statement shape more times than this
+  SQL_PROFILER_REPEAT_THRESHOLD = int(environ.get("SQL_PROFILER_REPEAT_THRESHOLD", 10))
+  # Requests slower than this (seconds) are sampled, SQL_PROFILER_SAMPLE_RATE of them are logged
+  SQL_PROFILER_SLOW_REQUEST = float(environ.get("SQL_PROFILER_SLOW_REQUEST", 0.5))
+  SQL_PROFILER_SAMPLE_RATE = float(environ.get("SQL_PROFILER_SAMPLE_RATE", 1.0))
+  SQL_PROFILER_WORST_SIZE = 20
+  # Bulk import: rows per validation and INSERT batch
+  IMPORT_BATCH_SIZE = 500
+  # Processes hashing and verifying passwords per web worker (0: hash in the request thread),
+  # unset: the CPUs shared between the WEB_CONCURRENCY web workers (gunicorn's default -w; unset: one per CPU)
+  PASSWORD_HASH_WORKERS = int(environ["PASSWORD_HASH_WORKERS"]) if environ.get("PASSWORD_HASH_WORKERS") else None
+  WEB_CONCURRENCY = int(environ.get("WEB_CONCURRENCY", 0)) or None
+  # Hashes in flight at once per web worker, imports included (default: twice the processes),
+  # a request waiting longer than PASSWORD_HASH_QUEUE_TIMEOUT seconds for a slot is told to try again
+  PASSWORD_HASH_CONCURRENCY = int(environ.get("PASSWORD_HASH_CONCURRENCY", 0)) or None
+  PASSWORD_HASH_QUEUE_TIMEOUT = float(environ.get("PASSWORD_HASH_QUEUE_TIMEOUT", 10))
+  # Attendance logs per page of the log endpoints (limit query parameter, capped at LOG_PAGE_SIZE_MAX)
+  LOG_PAGE_SIZE = 50
+  LOG_PAGE_SIZE_MAX = int(environ.get("LOG_PAGE_SIZE_MAX", 500))
+  # Rows read from the database and written to the response at a time by the streaming mode (stream=1)
+  STREAM_BATCH_SIZE = int(environ.get("STREAM_BATCH_SIZE", 1000))
+  # Bearer token of the /metrics scrapes, the web /metrics is disabled (404) without it
+  METRICS_TOKEN = environ.get("METRICS_TOKEN")
 
 
 # TestingConfig configuration
 class TestingConfig(DbConfig):
   DEBUG = True
   TESTING = True
+  LOG_LEVEL = environ.get("LOG_LEVEL", "DEBUG")
   SECRET_KEY = str(environ.get("SECRET_KEY"))
+  # Key of the RFID card digests, changing it invalidates every stored card
+  RFID_HMAC_KEY = environ.get("RFID_HMAC_KEY")
   ARGON2_HASH_LENGTH = 32
   ARGON2_SALT_LENGTH = 8
   MQTT_BROKER_URL = str(environ.get("MQTT_BROKER_URL"))
@@ -31,13 +62,32 @@ class TestingConfig(DbConfig):
   MQTT_TLS_ENABLED = False
   MQTT_LAST_WILL_QOS = 0
   MQTT_KEEPALIVE = 180
+  # Shared subscription group of the ingest processes ($share/<group>/...), unset for a single consumer
+  MQTT_SHARED_GROUP = environ.get("MQTT_SHARED_GROUP")
+  # Seconds a reload notice of the web workers may take to reach the broker (published in the background)
+  MQTT_PUBLISH_TIMEOUT = float(environ.get("MQTT_PUBLISH_TIMEOUT", 2.0))
+  # Worker pool of inbound taps (overflow: drop_newest, drop_oldest or block)
+  TAP_WORKERS = int(environ.get("TAP_WORKERS", 4))
+  TAP_QUEUE_SIZE = int(environ.get("TAP_QUEUE_SIZE", 1000))
+  TAP_QUEUE_OVERFLOW = environ.get("TAP_QUEUE_OVERFLOW", "drop_newest")
+  # Seconds in which repeated reads of the same card on the same reader are suppressed (0 to disable)
+  TAP_DEBOUNCE_WINDOW = 2.0
+  # Seconds between full reloads of the ingest lookups (RFID index and timetable)
+  INGEST_RELOAD_INTERVAL = 300
+  # Port of the /metrics endpoint of the ingest process (0 to disable)
+  INGEST_METRICS_PORT = int(environ.get("INGEST_METRICS_PORT", 9100))
+  # Address it listens on, loopback only unless set (e.g. 0.0.0.0 for a remote Prometheus)
+  INGEST_METRICS_HOST = environ.get("INGEST_METRICS_HOST", "127.0.0.1")
 
 
 # ProductionConfig configuration
 class ProductionConfig(DbConfig):
   DEBUG = False
   TESTING = False
+  LOG_LEVEL = environ.get("LOG_LEVEL", "INFO")
   SECRET_KEY = str(environ.get("SECRET_KEY"))
+  # Key of the RFID card digests, changing it invalidates every stored card
+  RFID_HMAC_KEY = environ.get("RFID_HMAC_KEY")
   ARGON2_HASH_LENGTH = 64
   ARGON2_SALT_LENGTH = 16
   MQTT_BROKER_URL = str(environ.get("MQTT_BROKER_URL"))
@@ -45,3 +95,19 @@ class ProductionConfig(DbConfig):
   MQTT_TLS_ENABLED = False
   MQTT_LAST_WILL_QOS = 0
   MQTT_KEEPALIVE = 180
+  # Shared subscription group of the ingest processes ($share/<group>/...), unset for a single consumer
+  MQTT_SHARED_GROUP = environ.get("MQTT_SHARED_GROUP")
+  # Seconds a reload notice of the web workers may take to reach the broker (published in the background)
+  MQTT_PUBLISH_TIMEOUT = float(environ.get("MQTT_PUBLISH_TIMEOUT", 2.0))
+  # Worker pool of inbound taps (overflow: drop_newest, drop_oldest or block)
+  TAP_WORKERS = int(environ.get("TAP_WORKERS", 4))
+  TAP_QUEUE_SIZE = int(environ.get("TAP_QUEUE_SIZE", 1000))
+  TAP_QUEUE_OVERFLOW = environ.get("TAP_QUEUE_OVERFLOW", "drop_newest")
+  # Seconds in which repeated reads of the same card on the same reader are suppressed (0 to disable)
+  TAP_DEBOUNCE_WINDOW = 2.0
+  # Seconds between full reloads of the ingest lookups (RFID index and timetable)
+  INGEST_RELOAD_INTERVAL = 300
+  # Port of the /metrics endpoint of the ingest process (0 to disable)
+  INGEST_METRICS_PORT = int(environ.get("INGEST_METRICS_PORT", 9100))
+  # Address it listens on, loopback only unless set (e.g. 0.0.0.0 for a remote Prometheus)
+  INGEST_METRICS_HOST = environ.get("INGEST_METRICS_HOST", "127.0.0.1")
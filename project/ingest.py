@@ -0,0 +1,333 @@
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime, timedelta
+from threading import Thread
+from werkzeug.serving import make_server
+from werkzeug.wrappers import Request, Response
+from time import sleep
+import logging
+import pytz
+
+from .extensions import mqtt
+from .app.models import *
+from .app.rfid_index import rfid_index
+from .app.timetable import timetable
+from .app.log_writer import attendance_log_writer
+from .app.tap_pool import tap_pool
+from .app.attended_set import attended_set
+from .app.debounce import tap_debouncer
+from .app.cache_sync import RELOAD_TOPIC, apply_reload
+from .app.tap_trace import TapTrace
+from .app.metrics import registry, observe_tap, is_authorized
+from .app.hashing import rfid_hasher
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TZ = 'Asia/Jakarta'
+SUB_TOPIC = 'SmarTendance/ESP32/AttendanceFinal'
+# Every reader may also publish on its own topic, e.g. SmarTendance/ESP32/GSG-101/AttendanceFinal,
+# the response goes to the same topic with the /Response suffix
+READER_SUB_TOPIC = 'SmarTendance/ESP32/+/AttendanceFinal'
+
+def get_current_daytime():
+  local_timezone = pytz.timezone(LOCAL_TZ)
+  return datetime.now(local_timezone)
+
+def get_current_time():
+  local_timezone = pytz.timezone(LOCAL_TZ)
+  return datetime.now(local_timezone).time()
+
+def get_current_day():
+  local_timezone = pytz.timezone(LOCAL_TZ)
+  return datetime.now(local_timezone).strftime("%A")
+
+def load_lookups():
+  """
+  This function is to (re)build the in-memory lookups used by the tap path
+  (RFID index, timetable and today's attended set).
+  Must be called inside an application context.
+  """
+  try:
+    rfid_index.load()
+    timetable.load()
+    # Also picks up the logs recorded by the other ingest processes
+    attended_set.load(get_current_daytime().date())
+  except SQLAlchemyError as err:
+    # They are loaded lazily on the first tap instead
+    logger.warning("Tap lookups are not loaded. %s", err)
+
+def publish_reply(uid:str, topic:str, message:str):
+  """
+  This function is to answer a tap on <tap topic>/Response and cache the reply for its repeated reads.
+  """
+  mqtt.publish(f"{topic}/Response", payload=message, qos=0)
+  tap_debouncer.remember_reply(uid.encode("utf-8"), topic, message)
+
+def log_course_times(found_course, current_day, current_time, current_daytime):
+  # Debug trace of the course times, only built if debug logging is enabled
+  if not logger.isEnabledFor(logging.DEBUG):
+    return
+  logger.debug(
+    "Course times", extra={
+      'course_id': found_course.course_id,
+      'current_day': current_day,
+      'current_time': current_time,
+      'time_start': found_course.time_start,
+      'time_end': found_course.time_end,
+      'time_start_with_date': datetime.combine(current_daytime, found_course.time_start),
+      'time_end_with_date': datetime.combine(current_daytime, found_course.time_end)
+    }
+  )
+
+def do_attendance(uid: str, topic: str = SUB_TOPIC, received_at: float = None):
+  """
+  This function is to take the attendance of a tap, reply to the reader and
+  emit one structured log record with the result and the per-stage latencies.
+  A tap with a new log is answered once the log is flushed (see take_attendance).
+  Optional param: received_at (monotonic time the tap was received)
+  """
+  trace = TapTrace(received_at)
+  # Cards are stored and looked up by their keyed digest
+  card_digest = rfid_hasher.digest(uid)
+
+  def reply(message, found_user, found_course, status):
+    if message is None:
+      # The log could not be written (see the log writer), the tap is not answered
+      logger.warning("Tap not recorded", extra={'topic': topic, 'user_id': found_user.user_id, 'course_id': found_course.course_id})
+      return
+    publish_reply(uid, topic, message)
+    trace.mark('publish')
+    observe_tap(trace, message)
+    logger.info(
+      "Tap handled", extra={
+        # Card UIDs are never written to the logs as is
+        'uid_hash': card_digest[:16] if card_digest else None,
+        'topic': topic,
+        'user_id': found_user.user_id if found_user else None,
+        'course_id': found_course.course_id if found_course else None,
+        'status': status,
+        'result': message,
+        'latency_ms': round(trace.total, 3),
+        'stages_ms': {stage: round(ms, 3) for stage, ms in trace.stages.items()}
+      }
+    )
+
+  take_attendance(card_digest, trace, reply)
+
+# Function to take attendance (store attendance to db)
+def take_attendance(card_digest: str, trace: TapTrace, reply):
+  """
+  Required params: card_digest (rfid_hasher.digest of the tapped UID) and reply, called once as
+  reply(message, card holder, course, status), unresolved parts are None.
+  The reply is given right away, except for a new log: "100 - Success" or "103 - Already attended"
+  then comes from the INSERT of the write-behind buffer, so the unique session key of the log table
+  decides, whichever ingest process recorded the session first (message None: the log was dropped).
+  """
+  current_time = get_current_time() # hh:mm:ss
+  current_day = get_current_day() # Monday, Tuesday, etc.
+  current_daytime = get_current_daytime() # yyyy-mm-dd hh:mm:ss
+
+  # Resolve user with the given card digest (from the in-memory index)
+  found_user = rfid_index.lookup(card_digest)
+  trace.mark('user')
+
+  # Exit if user not found
+  if not found_user:
+    return reply("101 - User not found", None, None, None)
+
+  # Students attend the course of their class, lecturers the course they teach
+  if found_user.user_role == "STUDENT":
+    found_course = timetable.find_class_course(found_user.student_class, current_day, current_time)
+  elif found_user.user_role == "LECTURER":
+    found_course = timetable.find_lecturer_course(found_user.user_id, current_day, current_time)
+  else:
+    return reply("104 - Invalid user role", found_user, None, None)
+  trace.mark('course')
+
+  # Exit if course not found
+  if not found_course:
+    return reply("102 - Course not found", found_user, None, None)
+
+  # Time variables for checking attendance status and exception
+  time_start_with_delta_present = (datetime.combine(datetime.today(), found_course.time_start) + timedelta(minutes=30)).time()
+  time_start_with_delta_late = (datetime.combine(datetime.today(), found_course.time_start) + timedelta(minutes=60)).time()
+  log_course_times(found_course, current_day, current_time, current_daytime)
+
+  # Check if the user has already attended the course
+  is_attended = attended_set.contains(found_user.user_id, found_course.course_id, current_daytime.date())
+  trace.mark('duplicate')
+
+  if is_attended:
+    return reply("103 - Already attended", found_user, found_course, None)
+
+  status = "ALPHA"
+
+  # PRESENT if under 30 minutes after time_start
+  if current_time > found_course.time_start and current_time < found_course.time_end and current_time < time_start_with_delta_present:
+    status = "PRESENT"
+
+  # LATE if under 60 minutes after time_start
+  elif current_time > found_course.time_start and current_time < found_course.time_end and current_time < time_start_with_delta_late:
+    status = "LATE"
+
+  def recorded(inserted):
+    trace.mark('flush')
+    if inserted is None:
+      reply(None, found_user, found_course, status)
+    elif inserted:
+      reply("100 - Success", found_user, found_course, status)
+    else:
+      # Recorded meanwhile, e.g. by another ingest process
+      reply("103 - Already attended", found_user, found_course, None)
+
+  # Queue the new log, it is inserted by the write-behind buffer which then calls recorded.
+  # A row of the same session still waiting in the buffer or being flushed is a repeat tap.
+  is_queued = attendance_log_writer.submit({
+    'user_id': found_user.user_id,
+    'user_role': found_user.user_role,
+    'course_id': found_course.course_id,
+    'room_id': found_course.room_id,
+    'time_in': current_daytime,
+    'session_date': current_daytime.date(),
+    'status': status
+  }, recorded)
+  trace.mark('enqueue')
+
+  if not is_queued:
+    reply("103 - Already attended", found_user, found_course, None)
+
+def register_ingest_metrics():
+  """
+  This function is to expose the queue, buffer and lookup statistics of this process as metrics.
+  """
+  registry.callback('smartendance_tap_queue_depth', 'Taps waiting for a worker', lambda: tap_pool.stats()['queue_depth'])
+  registry.callback('smartendance_tap_dropped_total', 'Taps dropped because the queue was full', lambda: tap_pool.dropped, type='counter')
+  registry.callback('smartendance_tap_failed_total', 'Taps whose handling raised an error', lambda: tap_pool.failed, type='counter')
+  registry.callback(
+    'smartendance_tap_debounced_total', 'Repeated card reads suppressed by the debouncer',
+    lambda: {'replayed': tap_debouncer.replayed, 'dropped': tap_debouncer.dropped}, type='counter', labelname='action'
+  )
+  registry.callback(
+    'smartendance_rfid_index_lookups_total', 'RFID index lookups',
+    lambda: {'hit': rfid_index.hits, 'miss': rfid_index.misses}, type='counter', labelname='result'
+  )
+  registry.callback('smartendance_log_buffer_depth', 'Attendance logs waiting for a flush', lambda: attendance_log_writer.stats()['queue_depth'])
+  registry.callback('smartendance_log_flush_seconds_max', 'Slowest attendance log flush', lambda: attendance_log_writer.max_flush_latency)
+  registry.callback(
+    'smartendance_log_rows_total', 'Flushed attendance log rows by outcome',
+    lambda: {
+      'inserted': attendance_log_writer.flushed_rows,
+      'duplicate': attendance_log_writer.duplicate_rows,
+      'failed': attendance_log_writer.failed_rows
+    }, type='counter', labelname='outcome'
+  )
+
+def start_metrics_server(port:int, host:str = '127.0.0.1', token:str = None):
+  """
+  This function is to serve /metrics of the ingest process, which has no web server of its own.
+  With a token, a scrape must send it as a Bearer token.
+  """
+  @Request.application
+  def metrics_app(request):
+    if request.path != '/metrics':
+      return Response('Not found', status=404)
+    if token and not is_authorized(request.headers.get('Authorization'), token):
+      return Response('Unauthorized', status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+  server = make_server(host, port, metrics_app, threaded=True)
+  Thread(target=server.serve_forever, name='ingest-metrics', daemon=True).start()
+  return server
+
+def shared_topic(topic:str, group:str = None) -> str:
+  """
+  This function is to turn a topic into a shared subscription of the given group.
+  The broker then hands every message to only one subscriber of the group, per message
+  (round-robin on mosquitto), not per reader: the taps of one reader are spread over the group.
+  """
+  if not group:
+    return topic
+  return f"$share/{group}/{topic}"
+
+def init_ingest(app):
+  """
+  This function is to turn the app into an MQTT ingest process (see ingest.py), the web workers stay HTTP-only.
+  Several ingest processes with the same MQTT_SHARED_GROUP split the taps between them.
+  The split is per message, so the debouncer and the attended set of a process only see part of
+  the taps of a reader: a repeat read handled by another process is not debounced, and a repeat
+  tap is only rejected once its session reaches the database. The unique key of the log table
+  (user_id, course_id, session_date) is what keeps one log per session across the processes.
+  """
+  shared_group = app.config.get('MQTT_SHARED_GROUP')
+
+  # Handle MQTT connection
+  @mqtt.on_connect()
+  def handle_connect(client, userdata, flags, rc):
+    if rc == 0:
+      logger.info("Connected to broker")
+      mqtt.subscribe(shared_topic(SUB_TOPIC, shared_group), qos=0)
+      mqtt.subscribe(shared_topic(READER_SUB_TOPIC, shared_group), qos=0)
+      # Not shared, every ingest process has to reload its own lookups
+      mqtt.subscribe(RELOAD_TOPIC, qos=1)
+    else:
+      logger.error("Failed to connect, return code %d", rc)
+
+  # Handle MQTT message
+  @mqtt.on_message()
+  def handle_mqtt_message(client, userdata, msg):
+    # Reload notices from the web workers
+    if msg.topic == RELOAD_TOPIC:
+      Thread(target=reload_from_notice, args=(msg.payload,), daemon=True).start()
+      return
+    # Repeated reads of a lingering card, answered before any parsing or DB work
+    is_repeat, cached_reply = tap_debouncer.check(msg.payload, msg.topic)
+    if is_repeat:
+      if cached_reply:
+        mqtt.publish(f"{msg.topic}/Response", payload=cached_reply, qos=0)
+      return
+    uid = msg.payload.decode("utf-8")
+    # Hand the tap over to the worker pool, the network thread must not wait on the DB
+    tap_pool.submit(uid, msg.topic)
+
+  # Handle MQTT disconnect
+  @mqtt.on_disconnect()
+  def handle_disconnect():
+    logger.warning("Disconnected from broker")
+
+  # Handle MQTT client logs, only hooked in when debug logging is enabled
+  # (paho calls it for every packet)
+  if logger.isEnabledFor(logging.DEBUG):
+    @mqtt.on_log()
+    def handle_logging(client, userdata, level, buf):
+      logger.debug("MQTT log: %s", buf)
+
+  def reload_from_notice(payload:bytes):
+    with app.app_context():
+      try:
+        apply_reload(payload)
+      except (SQLAlchemyError, ValueError) as err:
+        logger.error("Reload notice failed. %s", err)
+
+  # Full reload from time to time, in case a reload notice was missed
+  def reload_periodically(interval:int):
+    while True:
+      sleep(interval)
+      with app.app_context():
+        load_lookups()
+
+  with app.app_context():
+    load_lookups()
+  tap_debouncer.init_app(app)
+  register_ingest_metrics()
+  if app.config.get('INGEST_METRICS_PORT'):
+    start_metrics_server(
+      app.config['INGEST_METRICS_PORT'], app.config.get('INGEST_METRICS_HOST', '127.0.0.1'), app.config.get('METRICS_TOKEN')
+    )
+  attendance_log_writer.init_app(app)
+  # Worker pool which runs do_attendance for every inbound tap
+  tap_pool.init_app(app, handler=do_attendance)
+  Thread(
+    target=reload_periodically, args=(app.config.get('INGEST_RELOAD_INTERVAL', 300),),
+    name='ingest-reload', daemon=True
+  ).start()
+  # Connect last, every handler is registered by now
+  mqtt.init_app(app)
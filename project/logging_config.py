@@ -0,0 +1,51 @@
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+import atexit
+import json
+import logging
+import sys
+
+# Attributes of every LogRecord, anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+  """
+  This class formats a record as one JSON object per line.
+  Fields passed with extra={...} are added as top level keys.
+  """
+  def format(self, record:logging.LogRecord) -> str:
+    entry = {
+      'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+      'level': record.levelname,
+      'logger': record.name,
+      'message': record.getMessage()
+    }
+    for key, value in vars(record).items():
+      if key not in _RECORD_ATTRS:
+        entry[key] = value
+    if record.exc_info:
+      entry['exc_info'] = self.formatException(record.exc_info)
+    return json.dumps(entry, default=str)
+
+_listener = None
+
+def configure_logging(app):
+  """
+  This function is to route every log record through a queue, so the caller thread
+  (a tap worker or a web worker) never waits on console I/O.
+  A listener thread writes the records as JSON lines to stdout.
+  Config: LOG_LEVEL
+  """
+  global _listener
+  root = logging.getLogger()
+  root.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+  if _listener is not None:
+    return
+  log_queue = SimpleQueue()
+  stream_handler = logging.StreamHandler(sys.stdout)
+  stream_handler.setFormatter(JsonFormatter())
+  root.handlers = [QueueHandler(log_queue)]
+  _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+  _listener.start()
+  # Write out the queued records when the process exits
+  atexit.register(_listener.stop)
@@ -0,0 +1,94 @@
+// Page by page listing of the attendance log endpoints (keyset pagination).
+// A page is requested with ?limit=<rows per page>&cursor=<next_cursor of the previous page>,
+// the cursors of the pages already seen are kept to go back.
+// Uses the #data-filter (rows per page), #prev-page, #next-page and #current-page elements.
+// Every element with the log-filter class adds its value as the query parameter of its data-param
+// attribute (date_from, date_to, status, room_id, class_id, q or sort), the server applies them.
+function createLogPager(options) {
+  // options.key: array of the JSON response, options.render(rows), options.onError(error)
+  const dataFilterSelect = document.getElementById("data-filter");
+  const prevPageButton = document.getElementById("prev-page");
+  const nextPageButton = document.getElementById("next-page");
+  const currentPageSpan = document.getElementById("current-page");
+  const logFilters = document.querySelectorAll(".log-filter");
+
+  let baseURL = null;
+  let cursors = [null]; // cursors[i] fetches the page i + 1
+  let currentPage = 0;
+  let nextCursor = null;
+  let lastRequest = 0;
+
+  function fetchPage(pageIndex) {
+    const url = new URL(baseURL, window.location.origin);
+    url.searchParams.set("limit", dataFilterSelect.value);
+    logFilters.forEach((logFilter) => {
+      if (logFilter.value) {
+        url.searchParams.set(logFilter.dataset.param, logFilter.value);
+      }
+    });
+    if (cursors[pageIndex]) {
+      url.searchParams.set("cursor", cursors[pageIndex]);
+    }
+    // Only the response of the latest request is shown
+    const request = ++lastRequest;
+    return fetch(url)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`HTTP error! Status: ${response.status}`);
+        }
+        return response.json();
+      })
+      .then((data) => {
+        if (request !== lastRequest) {
+          return;
+        }
+        currentPage = pageIndex;
+        nextCursor = data.next_cursor;
+        if (nextCursor) {
+          cursors[pageIndex + 1] = nextCursor;
+        }
+        currentPageSpan.textContent = `Page ${currentPage + 1}`;
+        prevPageButton.disabled = currentPage === 0;
+        nextPageButton.disabled = !nextCursor;
+        options.render(data[options.key]);
+      })
+      .catch((error) => {
+        console.error(error);
+        if (options.onError) {
+          options.onError(error);
+        }
+      });
+  }
+
+  // Starts again from the first page of the given endpoint URL
+  function load(url) {
+    baseURL = url;
+    cursors = [null];
+    return fetchPage(0);
+  }
+
+  prevPageButton.addEventListener("click", function () {
+    if (currentPage > 0) {
+      fetchPage(currentPage - 1);
+    }
+  });
+
+  nextPageButton.addEventListener("click", function () {
+    if (nextCursor) {
+      fetchPage(currentPage + 1);
+    }
+  });
+
+  // Another page size or filter starts again from the first page
+  [dataFilterSelect, ...logFilters].forEach((element) => {
+    element.addEventListener("change", function () {
+      if (baseURL) {
+        load(baseURL);
+      }
+    });
+  });
+
+  prevPageButton.disabled = true;
+  nextPageButton.disabled = true;
+  return { load: load };
+}
@@ -0,0 +1,86 @@
+"""
+Campus-scale fixtures of the tests (see test_query_budget.py).
+"""
+from flask_argon2 import generate_password_hash
+from datetime import datetime, time, timedelta
+from sqlalchemy import insert
+
+from project.extensions import db
+from project.app.models import (
+  Class, Room, User, Course, AttendanceLogs,
+  StudyProgram, Major, RoomBuilding, AttendanceStatus, RoleName
+)
+
+def seed_campus(classes:int, students_per_class:int, courses_per_class:int, sessions:int) -> dict:
+  """
+  This function is to fill the database with campus-scale fixtures.
+  Every user shares one password hash, so seeding does not hash thousands of passwords.
+  It returns the ids used to fill the URL rules.
+  """
+  password_hash = generate_password_hash('Budget#2024')
+  days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+  rooms = [{'room_id': f'AA{i:03d}', 'room_building': RoomBuilding.AA} for i in range(max(classes, 1))]
+  class_rows, user_rows, course_rows = [], [], []
+  user_rows.append({
+    'user_id': '0' * 18, 'user_role': 'ADMIN', 'user_fullname': 'Admin',
+    'user_password_hash': password_hash, 'user_email_address': 'admin@campus.test'
+  })
+  lecturers = [f'{i:018d}' for i in range(1, classes + 1)]
+  for nip in lecturers:
+    user_rows.append({
+      'user_id': nip, 'user_role': 'LECTURER', 'user_fullname': f'Lecturer {nip}', 'lecturer_major': Major.TIK,
+      'user_password_hash': password_hash, 'user_email_address': f'{nip}@campus.test'
+    })
+  for c in range(classes):
+    class_id = f'TMJ{c:03d}'
+    class_rows.append({'class_id': class_id, 'class_study_program': StudyProgram.TMJ, 'class_major': Major.TIK})
+    for s in range(students_per_class):
+      nim = f'{c:04d}{s:06d}'
+      user_rows.append({
+        'user_id': nim, 'user_role': 'STUDENT', 'user_fullname': f'Student {nim}', 'student_class': class_id,
+        'user_password_hash': password_hash, 'user_email_address': f'{nim}@campus.test'
+      })
+    for k in range(courses_per_class):
+      course_rows.append({
+        'course_id': f'C{c:03d}{k:02d}', 'course_name': f'Course {c}-{k}', 'course_sks': 2, 'at_semester': 1,
+        'day': days[k % len(days)], 'time_start': time(7 + k), 'time_end': time(8 + k),
+        # Every lecturer teaches in several classes
+        'lecturer_nip': lecturers[(c + k) % len(lecturers)], 'class_id': class_id, 'room_id': rooms[c]['room_id']
+      })
+  db.session.execute(insert(Class), class_rows)
+  db.session.execute(insert(Room), rooms)
+  db.session.execute(insert(User), user_rows)
+  db.session.execute(insert(Course), course_rows)
+
+  # Attendance logs of every session of every course
+  first_day = datetime(2024, 2, 5)
+  logs = []
+  for course in course_rows:
+    nims = [row['user_id'] for row in user_rows if row.get('student_class') == course['class_id']]
+    for week in range(sessions):
+      time_in = datetime.combine(first_day + timedelta(weeks=week), course['time_start'])
+      logs.append({
+        'time_in': time_in, 'session_date': time_in.date(), 'status': AttendanceStatus.PRESENT,
+        'user_role': RoleName.LECTURER, 'user_id': course['lecturer_nip'],
+        'course_id': course['course_id'], 'room_id': course['room_id']
+      })
+      for nim in nims:
+        logs.append({
+          'time_in': time_in, 'session_date': time_in.date(), 'status': AttendanceStatus.PRESENT,
+          'user_role': RoleName.STUDENT, 'user_id': nim,
+          'course_id': course['course_id'], 'room_id': course['room_id']
+        })
+  if logs:
+    db.session.execute(insert(AttendanceLogs), logs)
+  db.session.commit()
+  return {
+    'ADMIN': '0' * 18,
+    'LECTURER': course_rows[0]['lecturer_nip'],
+    'STUDENT': f'{0:04d}{0:06d}',
+    'class': class_rows[0]['class_id'],
+    'course': course_rows[0]['course_id'],
+    # Last of each kind, written and deleted by the POST checks
+    'last_student': user_rows[-1]['user_id'],
+    'last_lecturer': lecturers[-1],
+    'last_course': course_rows[-1]['course_id'],
+  }
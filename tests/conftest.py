@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# The config reads these at import time
+os.environ.setdefault('SECRET_KEY', 'tests')
+os.environ.setdefault('MQTT_BROKER_URL', 'localhost')
+os.environ.setdefault('MQTT_BROKER_PORT', '1883')
+os.environ.setdefault('RFID_HMAC_KEY', 'tests')
+os.environ.setdefault('LOG_LEVEL', 'CRITICAL')
+
+from project import create_app
+from project.extensions import db
+
+@pytest.fixture
+def app(tmp_path):
+  # A file database, so the background threads (log writer, hashing) see the rows of the test
+  app = create_app(testing=True, config={
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'tests.sqlite'),
+    'SQLALCHEMY_ENGINE_OPTIONS': {},
+    'SQLALCHEMY_RECORD_QUERIES': True,
+    'SQL_PROFILER_ENABLED': False,
+    'WTF_CSRF_ENABLED': False,
+    'PASSWORD_HASH_WORKERS': 0,
+    'MQTT_PUBLISH_TIMEOUT': 0.1
+  })
+  with app.app_context():
+    db.create_all()
+    yield app
+    db.session.remove()
+    db.engine.dispose()
+
+@pytest.fixture
+def campus(app):
+  # Imported here, it needs the app package
+  from campus import seed_campus
+  fixtures = seed_campus(classes=2, students_per_class=3, courses_per_class=2, sessions=3)
+  db.session.remove()
+  return fixtures
+
+@pytest.fixture
+def client_as(app):
+  """
+  A function returning a test client logged in as (role, user_id).
+  """
+  def client_as(role:str, user_id:str):
+    client = app.test_client()
+    with client.session_transaction() as session:
+      session['user_id'] = user_id
+      session['user_role'] = role
+    return client
+  return client_as
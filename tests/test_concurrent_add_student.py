@@ -0,0 +1,77 @@
+"""
+The add_student view posted from many threads at once, as gthread/gevent workers do: every
+request must flash only the validation errors of its own form, and every valid form must register.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from project.app.models import Class, StudyProgram, Major, User
+from project.extensions import db
+
+ADMIN_ID = '0' * 18
+CLASS_ID = 'TMJ4A'
+PASSWORD = 'Student#2024'
+THREADS = 16
+ROUNDS = 2
+
+# Half of the forms are valid, the other half have one known mistake
+MISTAKES = [None, 'confirm', None, 'email']
+
+EXPECTED = {
+  None: [],
+  'confirm': ['Confirm password must be same as password!'],
+  'email': ['Email address is not valid!'],
+}
+
+def student_form(nim:str, mistake:str = None) -> dict:
+  form = {
+    'student_name': f'Student {nim}',
+    'student_nim': nim,
+    'student_class': CLASS_ID,
+    'student_pw': PASSWORD,
+    'student_confirm_pw': PASSWORD,
+    'student_email_address': f'{nim}@campus.test',
+    'student_home_address': '',
+    'student_uid': f'UID{nim}',
+  }
+  if mistake == 'confirm':
+    form['student_confirm_pw'] = PASSWORD + '!'
+  elif mistake == 'email':
+    form['student_email_address'] = f'{nim}.campus.test'
+  return form
+
+def submit(app, nim:str, mistake:str, barrier:Barrier) -> tuple:
+  client = app.test_client()
+  with client.session_transaction() as session:
+    session['user_id'] = ADMIN_ID
+    session['user_role'] = 'ADMIN'
+  barrier.wait()
+  client.post('/admin/add/student', data=student_form(nim, mistake))
+  with client.session_transaction() as session:
+    flashes = session.get('_flashes', [])
+  errors = [message for category, messages in flashes if category == 'danger' for message in messages]
+  registered = any(category == 'success' for category, _ in flashes)
+  return nim, mistake, errors, registered
+
+def test_concurrent_registrations_do_not_leak_errors(app):
+  db.session.add(Class(class_id=CLASS_ID, class_study_program=StudyProgram.TMJ, class_major=Major.TIK))
+  db.session.commit()
+  jobs = [(f'{n:010d}', MISTAKES[n % len(MISTAKES)]) for n in range(THREADS * ROUNDS)]
+  leaked, failed = [], []
+  with ThreadPoolExecutor(max_workers=THREADS) as executor:
+    for start in range(0, len(jobs), THREADS):
+      chunk = jobs[start:start + THREADS]
+      # Release every request of the round at the same time
+      barrier = Barrier(len(chunk))
+      futures = [executor.submit(submit, app, nim, mistake, barrier) for nim, mistake in chunk]
+      for future in futures:
+        nim, mistake, errors, registered = future.result()
+        if errors != EXPECTED[mistake]:
+          leaked.append((nim, errors))
+        elif mistake is None and not registered:
+          failed.append(nim)
+  assert leaked == []
+  assert failed == []
+  db.session.remove()
+  registered = {user.user_id for user in User.query.filter_by(user_role='STUDENT')}
+  assert registered == {nim for nim, mistake in jobs if mistake is None}
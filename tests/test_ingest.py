@@ -0,0 +1,86 @@
+from datetime import datetime, time, timedelta
+
+import pytest
+
+from project import ingest
+from project.app import log_writer
+from project.app.attended_set import AttendedSet
+from project.app.log_writer import AttendanceLogWriter
+from project.app.models import AttendanceLogs
+from project.app.rfid_index import CardHolder
+from project.app.tap_trace import TapTrace
+from project.app.timetable import ScheduledCourse
+from project.extensions import db
+
+HOLDER = CardHolder(user_id='S0001', user_role='STUDENT', student_class='TMJ4A')
+COURSE = ScheduledCourse(course_id='C0001', room_id='R0001', time_start=time(0, 0), time_end=time(23, 59, 59))
+
+@pytest.fixture
+def writer(app, monkeypatch):
+  app.config.update(ATTENDANCE_LOG_FLUSH_INTERVAL=30)
+  writer = AttendanceLogWriter(app)
+  monkeypatch.setattr(ingest, 'attendance_log_writer', writer)
+  # A set of its own, filled by the tests only
+  attended = AttendedSet()
+  monkeypatch.setattr(ingest, 'attended_set', attended)
+  monkeypatch.setattr(log_writer, 'attended_set', attended)
+  monkeypatch.setattr(ingest.rfid_index, 'lookup', lambda card_digest: HOLDER if card_digest == 'card' else None)
+  monkeypatch.setattr(ingest.timetable, 'find_class_course', lambda student_class, day, now: COURSE)
+  yield writer
+  writer.close()
+
+def tap(card_digest:str = 'card') -> list:
+  replies = []
+  ingest.take_attendance(card_digest, TapTrace(), lambda message, *result: replies.append(message))
+  return replies
+
+def test_new_session_is_answered_after_the_insert(writer):
+  replies = tap()
+  # Nothing is answered before the row is flushed
+  assert replies == []
+  writer.flush()
+  assert replies == ['100 - Success']
+  assert tap() == ['103 - Already attended']
+
+def test_session_recorded_by_another_process_is_already_attended(writer):
+  now = ingest.get_current_daytime()
+  # Loaded before the other process records the session
+  ingest.attended_set.load(now.date())
+  db.session.execute(AttendanceLogs.__table__.insert().values(
+    user_id='S0001', user_role='STUDENT', course_id='C0001', room_id='R0001',
+    time_in=now, session_date=now.date(), status='PRESENT'
+  ))
+  db.session.commit()
+  replies = tap()
+  writer.flush()
+  assert replies == ['103 - Already attended']
+  assert db.session.query(AttendanceLogs).count() == 1
+
+def test_unknown_card_is_answered_right_away(writer):
+  assert tap('other') == ['101 - User not found']
+
+def test_attended_set_loads_by_session_date(app):
+  now = ingest.get_current_daytime()
+  # A session of today whose stored time_in reads as the evening before (e.g. kept in UTC)
+  db.session.execute(AttendanceLogs.__table__.insert().values(
+    user_id='S0001', user_role='STUDENT', course_id='C0001', room_id='R0001',
+    time_in=datetime.combine(now.date(), time(23, 30)) - timedelta(days=1), session_date=now.date(), status='PRESENT'
+  ))
+  db.session.commit()
+  attended = AttendedSet()
+  assert attended.contains('S0001', 'C0001', now.date())
+  assert not attended.contains('S0001', 'C0001', now.date() + timedelta(days=1))
+
+def test_same_tap_on_two_processes_is_recorded_once(app, writer, monkeypatch):
+  # A shared subscription may hand the repeat of a tap to another process, with its own writer and set
+  other = AttendanceLogWriter(app)
+  first = tap()
+  monkeypatch.setattr(ingest, 'attendance_log_writer', other)
+  monkeypatch.setattr(ingest, 'attended_set', AttendedSet())
+  second = tap()
+  # Neither process saw the other's row before its flush
+  writer.flush()
+  other.flush()
+  other.close()
+  assert (first, second) == (['100 - Success'], ['103 - Already attended'])
+  assert db.session.query(AttendanceLogs).count() == 1
@@ -0,0 +1,71 @@
+from datetime import datetime
+from time import monotonic, sleep
+
+from project.app.log_writer import AttendanceLogWriter
+from project.app.models import AttendanceLogs
+from project.extensions import db
+
+def log_row(user_id:str = 'S0001', course_id:str = 'C0001') -> dict:
+  now = datetime.now()
+  return {
+    'user_id': user_id, 'user_role': 'STUDENT', 'course_id': course_id, 'room_id': 'R0001',
+    'time_in': now, 'session_date': now.date(), 'status': 'PRESENT'
+  }
+
+def wait_for(condition, timeout:float) -> bool:
+  deadline = monotonic() + timeout
+  while monotonic() < deadline:
+    if condition():
+      return True
+    sleep(0.01)
+  return condition()
+
+def test_single_row_is_flushed_within_the_interval(app):
+  app.config.update(ATTENDANCE_LOG_BATCH_SIZE=200, ATTENDANCE_LOG_FLUSH_INTERVAL=0.1)
+  writer = AttendanceLogWriter(app)
+  try:
+    started = monotonic()
+    assert writer.submit(log_row())
+    assert wait_for(lambda: writer.flushes == 1, 2.0)
+    # Flushed by the time limit, not by the size limit or the shutdown
+    assert monotonic() - started < 1.0
+    assert writer.stats()['queue_depth'] == 0
+    assert db.session.query(AttendanceLogs).count() == 1
+  finally:
+    writer.close()
+
+def test_full_batch_is_flushed_before_the_interval(app):
+  app.config.update(ATTENDANCE_LOG_BATCH_SIZE=3, ATTENDANCE_LOG_FLUSH_INTERVAL=30)
+  writer = AttendanceLogWriter(app)
+  try:
+    for user_id in ('S0001', 'S0002', 'S0003'):
+      assert writer.submit(log_row(user_id))
+    assert wait_for(lambda: writer.flushed_rows == 3, 2.0)
+  finally:
+    writer.close()
+
+def test_repeat_of_a_queued_session_is_rejected(app):
+  app.config.update(ATTENDANCE_LOG_FLUSH_INTERVAL=30)
+  writer = AttendanceLogWriter(app)
+  try:
+    assert writer.submit(log_row())
+    assert not writer.submit(log_row())
+  finally:
+    writer.close()
+
+def test_submitter_is_told_whether_the_row_was_inserted(app):
+  app.config.update(ATTENDANCE_LOG_FLUSH_INTERVAL=30)
+  # The session of S0001 was recorded by another ingest process, unknown to this one
+  db.session.execute(AttendanceLogs.__table__.insert().values(log_row('S0001')))
+  db.session.commit()
+  writer = AttendanceLogWriter(app)
+  outcomes = {}
+  try:
+    for user_id in ('S0001', 'S0002'):
+      assert writer.submit(log_row(user_id), lambda inserted, user_id=user_id: outcomes.update({user_id: inserted}))
+    writer.flush()
+  finally:
+    writer.close()
+  assert outcomes == {'S0001': False, 'S0002': True}
+  assert (writer.flushed_rows, writer.duplicate_rows) == (1, 1)
+  assert db.session.query(AttendanceLogs).count() == 2
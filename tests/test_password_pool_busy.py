@@ -0,0 +1,64 @@
+from io import BytesIO
+
+import pytest
+
+from project.app.hashing import PasswordPoolBusy, password_pool
+from project.app.models import User
+from project.extensions import db
+
+def busy(*args):
+  raise PasswordPoolBusy('Password hashing is busy, try again later')
+
+def flashes(client) -> list:
+  with client.session_transaction() as session:
+    return session.get('_flashes', [])
+
+@pytest.fixture
+def admin(campus, client_as):
+  return client_as('ADMIN', campus['ADMIN'])
+
+def test_add_student_asks_to_try_again(campus, admin, monkeypatch):
+  monkeypatch.setattr(password_pool, 'hash', busy)
+  response = admin.post('/admin/add/student', data={
+    'student_name': 'New Student', 'student_nim': '9999999999', 'student_class': campus['class'],
+    'student_pw': 'Busy#2025', 'student_confirm_pw': 'Busy#2025', 'student_email_address': 'new@campus.test',
+    'student_home_address': '', 'student_uid': 'NEW-CARD'
+  })
+  assert response.status_code == 302 and response.location.endswith('/admin/add/student')
+  assert flashes(admin) == [('warning', 'Server is busy, please try again in a moment.')]
+  assert db.session.get(User, '9999999999') is None
+
+def test_edit_lecturer_asks_to_try_again(campus, admin, monkeypatch):
+  monkeypatch.setattr(password_pool, 'hash', busy)
+  nip = campus['LECTURER']
+  response = admin.post(f'/admin/{nip}/edit/lecturer', data={
+    'lecturer_nip': nip, 'lecturer_major': 'TIK', 'lecturer_name': 'Edited Lecturer',
+    'lecturer_pw': 'Busy#2025', 'lecturer_confirm_pw': 'Busy#2025', 'lecturer_email_address': 'edited@campus.test',
+    'lecturer_home_address': '', 'lecturer_uid': ''
+  })
+  assert response.status_code == 302
+  assert flashes(admin) == [('warning', 'Server is busy, please try again in a moment.')]
+  assert db.session.get(User, nip).user_fullname == f'Lecturer {nip}'
+
+def test_import_reports_the_rows_imported_before_the_pool_was_busy(app, campus, admin, monkeypatch):
+  hash_many = password_pool.hash_many
+  calls = []
+  def busy_after_first_batch(passwords):
+    calls.append(passwords)
+    if len(calls) > 1:
+      busy()
+    return hash_many(passwords)
+  monkeypatch.setattr(password_pool, 'hash_many', busy_after_first_batch)
+  app.config['IMPORT_BATCH_SIZE'] = 1
+  lines = ['student_nim,student_name,student_class,student_pw,student_email_address,student_home_address,student_uid']
+  lines += [f'999999999{n},Imported {n},{campus["class"]},Busy#2025,imported{n}@campus.test,,IMPORTED-{n}' for n in range(3)]
+  response = admin.post('/admin/import', data={
+    'import_kind': 'student', 'import_file': (BytesIO('\n'.join(lines).encode()), 'students.csv')
+  }, headers={'Accept': 'application/json'})
+  assert response.status_code == 503
+  report = response.get_json()
+  assert report['imported'] == 1
+  # Header is row 1, the second student is row 3
+  assert report['stopped']['row'] == 3
+  assert db.session.get(User, '9999999990') is not None
+  assert db.session.get(User, '9999999991') is None
@@ -0,0 +1,250 @@
+"""
+Query budget of every route: each route is called as the matching role on a small and on a
+campus-scale database, its query count must stay within its budget and must not grow with the
+number of rows, so a view that queries inside a loop (N+1) fails here.
+A new route needs a budget as well.
+"""
+from flask_sqlalchemy.record_queries import get_recorded_queries
+import io
+
+import pytest
+
+from project import create_app
+from project.extensions import db
+from campus import seed_campus
+
+# Maximum number of queries of every endpoint (per role for the shared dashboard, [POST] for a form submit).
+# The JSON read endpoints count the ETag watermark query (conditional.py) and their listing query.
+QUERY_BUDGETS = {
+  'user_ep.index': 0,
+  'user_ep.login': 0,
+  'user_ep.login[POST]': 1,
+  'user_ep.logout': 0,
+  'user_ep.metrics': 0,
+  'user_ep.dashboard[ADMIN]': 7,
+  'user_ep.dashboard[LECTURER]': 6,
+  'user_ep.dashboard[STUDENT]': 1,
+  'admin_ep.add': 0,
+  'admin_ep.add_student': 1,
+  'admin_ep.add_student[POST]': 4,
+  'admin_ep.add_lecturer': 0,
+  'admin_ep.add_lecturer[POST]': 4,
+  'admin_ep.add_course': 3,
+  'admin_ep.add_course[POST]': 3,
+  'admin_ep.import_data': 0,
+  'admin_ep.import_data[POST]': 3,
+  'admin_ep.get_courses': 2,
+  'admin_ep.courses': 1,
+  'admin_ep.classes': 2,
+  'admin_ep.view_attendance': 1,
+  'admin_ep.get_attendance': 2,
+  'admin_ep.export_attendance': 1,
+  'admin_ep.get_attendance_detail': 2,
+  'admin_ep.view_attendance_detail': 2,
+  'admin_ep.edit_student': 1,
+  'admin_ep.edit_student[POST]': 5,
+  'admin_ep.edit_lecturer': 1,
+  'admin_ep.edit_lecturer[POST]': 5,
+  'admin_ep.edit_course': 1,
+  'admin_ep.edit_course[POST]': 5,
+  'admin_ep.delete_student': 1,
+  'admin_ep.delete_student[POST]': 6,
+  'admin_ep.delete_lecturer': 1,
+  'admin_ep.delete_lecturer[POST]': 8,
+  'admin_ep.delete_course': 1,
+  'admin_ep.delete_course[POST]': 5,
+  'lecturer_ep.view_lecturer_logs': 1,
+  'lecturer_ep.get_lecturer_logs': 2,
+  'lecturer_ep.export_lecturer_attendance': 1,
+  'lecturer_ep.view_student_data': 1,
+  'lecturer_ep.get_student_data': 1,
+  'lecturer_ep.get_data_student': 1,
+  'lecturer_ep.get_student_logs': 3,
+  'lecturer_ep.view_student_logs': 2,
+  'student_ep.course': 0,
+  'student_ep.dashboard': 4,
+  'student_ep.view_attendance': 2,
+  'student_ep.get_attendance': 2,
+  'student_ep.get_attendance_detail': 2,
+  'student_ep.view_attendance_detail': 2,
+}
+
+# Query string of the endpoints that need one, {...} are fixture ids
+QUERY_STRINGS = {
+  'admin_ep.get_courses': {'class_id': '{class}'},
+  'admin_ep.get_attendance_detail': {'nim': '{STUDENT}'},
+  'admin_ep.view_attendance_detail': {'nim': '{STUDENT}'},
+  'lecturer_ep.get_lecturer_logs': {'course_id': '{course}'},
+  'lecturer_ep.get_student_logs': {'nim': '{STUDENT}'},
+  'lecturer_ep.view_student_logs': {'nim': '{STUDENT}'},
+  'student_ep.get_attendance_detail': {'nim': '{STUDENT}'},
+  'student_ep.view_attendance_detail': {'nim': '{STUDENT}'},
+}
+
+BLUEPRINT_ROLES = {'admin_ep': 'ADMIN', 'lecturer_ep': 'LECTURER', 'student_ep': 'STUDENT'}
+
+USER_FORM = {'pw': 'Budget#2025', 'confirm_pw': 'Budget#2025', 'home_address': ''}
+
+# Form submits: (check name, role, url, form, expected flash category), run in this order,
+# the last student, lecturer and course of the fixtures are edited and deleted
+POST_CHECKS = [
+  ('user_ep.login[POST]', None, '/login', {'user_id': '{STUDENT}', 'user_pw': 'Budget#2024'}, 'success'),
+  ('admin_ep.add_student[POST]', 'ADMIN', '/admin/add/student', dict(
+    {f'student_{key}': value for key, value in USER_FORM.items()},
+    student_name='New Student', student_nim='9999999999', student_class='{class}',
+    student_email_address='new.student@campus.test', student_uid='NEW-STUDENT-CARD'
+  ), 'success'),
+  ('admin_ep.add_lecturer[POST]', 'ADMIN', '/admin/add/lecturer', dict(
+    {f'lecturer_{key}': value for key, value in USER_FORM.items()},
+    lecturer_name='New Lecturer', lecturer_nip='999999999999999999', lecturer_major='TIK',
+    lecturer_email_address='new.lecturer@campus.test', lecturer_uid='NEW-LECTURER-CARD'
+  ), 'success'),
+  ('admin_ep.add_course[POST]', 'ADMIN', '/admin/add/course', {
+    'course_name': 'New Course', 'course_id': 'CNEW', 'course_sks': '2', 'course_semester': '1',
+    'course_day': 'Saturday', 'time_start': '07:00:00', 'time_end': '08:00:00', 'course_description': '',
+    'lecturer_nip': '{LECTURER}', 'class_id': '{class}', 'room_id': 'AA000'
+  }, 'success'),
+  ('admin_ep.import_data[POST]', 'ADMIN', '/admin/import', {
+    'import_kind': 'student',
+    'import_file': (
+      'student_nim,student_name,student_class,student_pw,student_email_address,student_home_address,student_uid\n'
+      '9999999998,Imported Student,{class},Budget#2025,imported@campus.test,,IMPORTED-CARD\n'
+    )
+  }, 'success'),
+  ('admin_ep.edit_student[POST]', 'ADMIN', '/admin/{last_student}/edit/student', dict(
+    {f'student_{key}': value for key, value in USER_FORM.items()},
+    student_nim='{last_student}', student_class='{class}', student_name='Edited Student',
+    student_email_address='edited.student@campus.test', student_uid='EDITED-STUDENT-CARD'
+  ), 'success'),
+  ('admin_ep.edit_lecturer[POST]', 'ADMIN', '/admin/{last_lecturer}/edit/lecturer', dict(
+    {f'lecturer_{key}': value for key, value in USER_FORM.items()},
+    lecturer_nip='{last_lecturer}', lecturer_major='TIK', lecturer_name='Edited Lecturer',
+    lecturer_email_address='edited.lecturer@campus.test', lecturer_uid='EDITED-LECTURER-CARD'
+  ), 'success'),
+  ('admin_ep.edit_course[POST]', 'ADMIN', '/admin/{last_course}/edit/course', {
+    'course_name': 'Edited Course', 'course_sks': '3', 'course_semester': '2', 'course_day': 'Friday',
+    'course_time_start': '09:00:00', 'course_time_end': '10:00:00', 'course_description': '',
+    'course_lecturer': 'Lecturer {LECTURER}', 'course_class': '{class}', 'course_room': 'AA000'
+  }, 'success'),
+  ('admin_ep.delete_student[POST]', 'ADMIN', '/admin/{last_student}/delete/student', {}, 'success'),
+  ('admin_ep.delete_course[POST]', 'ADMIN', '/admin/{last_course}/delete/course', {}, 'success'),
+  ('admin_ep.delete_lecturer[POST]', 'ADMIN', '/admin/{last_lecturer}/delete/lecturer', {}, 'success'),
+]
+
+SCALES = {
+  'small': dict(classes=2, students_per_class=3, courses_per_class=2, sessions=1),
+  'campus': dict(classes=20, students_per_class=40, courses_per_class=6, sessions=4),
+}
+
+def fill(value:str, fixtures:dict) -> str:
+  return value.format(**fixtures)
+
+def get_checks(app, fixtures:dict) -> list:
+  """
+  This function is to list (check name, role, url) of every GET URL rule of the app, filled with fixture ids.
+  """
+  values = {
+    'nim': fixtures['STUDENT'], 'nip': fixtures['LECTURER'], 'course_id': fixtures['course'],
+    'selected_course': fixtures['course'], 'selected_role': 'STUDENT'
+  }
+  checks = []
+  with app.test_request_context():
+    for rule in app.url_map.iter_rules():
+      if rule.endpoint == 'static' or 'GET' not in rule.methods:
+        continue
+      blueprint = rule.endpoint.split('.', 1)[0]
+      url = rule.build({name: values[name] for name in rule.arguments}, append_unknown=False)[1]
+      query = QUERY_STRINGS.get(rule.endpoint)
+      if query:
+        url += '?' + '&'.join(f'{key}={fill(value, fixtures)}' for key, value in query.items())
+      if blueprint in BLUEPRINT_ROLES:
+        checks.append((rule.endpoint, BLUEPRINT_ROLES[blueprint], url))
+      elif rule.endpoint == 'user_ep.dashboard':
+        for role in ('ADMIN', 'LECTURER', 'STUDENT'):
+          checks.append((f'{rule.endpoint}[{role}]', role, url))
+      else:
+        checks.append((rule.endpoint, None, url))
+  return checks
+
+@pytest.fixture(scope='module')
+def campuses(tmp_path_factory):
+  """
+  The apps of every scale with their fixture ids, seeded once for the module.
+  """
+  campuses = {}
+  for scale, size in SCALES.items():
+    app = create_app(testing=True, config={
+      'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path_factory.mktemp(scale) / 'budget.sqlite'),
+      'SQLALCHEMY_ENGINE_OPTIONS': {},
+      'SQLALCHEMY_RECORD_QUERIES': True,
+      'SQL_PROFILER_ENABLED': False,
+      'PROPAGATE_EXCEPTIONS': False,
+      'WTF_CSRF_ENABLED': False,
+      'PASSWORD_HASH_WORKERS': 0,
+      'MQTT_PUBLISH_TIMEOUT': 0.1,
+    })
+    with app.app_context():
+      db.create_all()
+      fixtures = seed_campus(**size)
+      db.session.remove()
+    campuses[scale] = (app, fixtures)
+  yield campuses
+  for app, fixtures in campuses.values():
+    with app.app_context():
+      db.engine.dispose()
+
+def client_for(app, role:str, fixtures:dict):
+  client = app.test_client()
+  if role:
+    with client.session_transaction() as session:
+      session['user_id'] = fixtures[role]
+      session['user_role'] = role
+  return client
+
+def counted(client, method:str, url:str, **kwargs) -> tuple:
+  # The test client keeps the request context open, so the recorded queries stay readable
+  with client:
+    response = client.open(url, method=method, **kwargs)
+    return response, len(get_recorded_queries())
+
+def flashes(client) -> list:
+  with client.session_transaction() as session:
+    return session.get('_flashes', [])
+
+def get_check_names() -> list:
+  # The URL rules do not depend on the fixtures, the names only need an app
+  app = create_app(testing=True, config={'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SQLALCHEMY_ENGINE_OPTIONS': {}})
+  return [name for name, role, url in get_checks(app, {key: 'x' for key in ('STUDENT', 'LECTURER', 'course', 'class')})]
+
+def test_every_route_has_a_budget():
+  names = set(get_check_names()) | {name for name, *check in POST_CHECKS}
+  assert sorted(names - set(QUERY_BUDGETS)) == []
+  assert sorted(set(QUERY_BUDGETS) - names) == []
+
+@pytest.mark.parametrize('name', get_check_names())
+def test_get_route_budget(campuses, name):
+  counts = {}
+  for scale, (app, fixtures) in campuses.items():
+    role, url = next((role, url) for check, role, url in get_checks(app, fixtures) if check == name)
+    response, counts[scale] = counted(client_for(app, role, fixtures), 'GET', url)
+    assert response.status_code < 500, f'{url} answered {response.status_code}'
+  assert counts['campus'] <= QUERY_BUDGETS[name], counts
+  # The query count must not grow with the number of rows
+  assert counts['campus'] == counts['small'], counts
+
+@pytest.mark.parametrize('name, role, url, form, category', POST_CHECKS, ids=[check[0] for check in POST_CHECKS])
+def test_post_route_budget(campuses, name, role, url, form, category):
+  counts = {}
+  for scale, (app, fixtures) in campuses.items():
+    data = {key: fill(value, fixtures) for key, value in form.items()}
+    if 'import_file' in data:
+      data['import_file'] = (io.BytesIO(data['import_file'].encode('utf-8')), 'students.csv')
+    client = client_for(app, role, fixtures)
+    response, counts[scale] = counted(client, 'POST', fill(url, fixtures), data=data)
+    assert response.status_code < 500, f'{url} answered {response.status_code}'
+    if name == 'admin_ep.import_data[POST]':
+      assert b'imported' in response.data.lower()
+    else:
+      assert [flashed for flashed in flashes(client) if flashed[0] == category], flashes(client)
+  assert counts['campus'] <= QUERY_BUDGETS[name], counts
+  assert counts['campus'] == counts['small'], counts
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from project.app.rfid_index import CardHolder, RfidIndex
+
+def user(rfid:str, user_id:str = 'S0001') -> SimpleNamespace:
+  return SimpleNamespace(user_id=user_id, user_role='STUDENT', student_class='TMJ4A', user_rfid_hash=rfid)
+
+def loaded_index() -> RfidIndex:
+  index = RfidIndex()
+  index.is_loaded = True
+  return index
+
+def test_put_updates_the_maps_in_place():
+  index = loaded_index()
+  holders = index._holders
+  index.put(user('card-a'))
+  index.put(user('card-b', user_id='S0002'))
+  # No copy of the maps per change
+  assert index._holders is holders
+  assert index.lookup('card-a') == CardHolder('S0001', 'STUDENT', 'TMJ4A')
+  assert len(index._holders) == 2
+
+def test_changed_card_replaces_the_old_one():
+  index = loaded_index()
+  index.put(user('card-a'))
+  index.put(user('card-a'))
+  assert index.lookup('card-a').user_id == 'S0001'
+  index.put(user('card-b'))
+  assert index.lookup('card-a') is None
+  assert index.lookup('card-b').user_id == 'S0001'
+  # Card removed
+  index.put(user(None))
+  assert index.lookup('card-b') is None
+
+def test_discard_removes_the_card():
+  index = loaded_index()
+  index.put(user('card-a'))
+  index.discard('S0001')
+  index.discard('S0001')
+  assert index.lookup('card-a') is None
+  assert index.stats()['size'] == 0
@@ -0,0 +1,37 @@
+def test_detail_lists_the_logs_of_the_student_in_the_course(campus, client_as):
+  client = client_as('STUDENT', campus['STUDENT'])
+  response = client.get(f"/student/attendance/{campus['course']}/get_detail")
+  assert response.status_code == 200
+  logs = response.get_json()['attendance_detail']
+  assert len(logs) == 3
+  assert {log['nim'] for log in logs} == {campus['STUDENT']}
+
+def test_detail_applies_the_filters(campus, client_as):
+  client = client_as('STUDENT', campus['STUDENT'])
+  url = f"/student/attendance/{campus['course']}/get_detail"
+  # Weekly sessions from 2024-02-05
+  assert len(client.get(url + '?date_from=2024-02-12').get_json()['attendance_detail']) == 2
+  assert client.get(url + '?status=LATE').get_json()['attendance_detail'] == []
+  assert client.get(url + '?status=LATER').status_code == 400
+  page = client.get(url + '?limit=2').get_json()
+  assert len(page['attendance_detail']) == 2 and page['next_cursor']
+
+def test_detail_revalidates_with_the_etag(campus, client_as):
+  client = client_as('STUDENT', campus['STUDENT'])
+  url = f"/student/attendance/{campus['course']}/get_detail"
+  etag = client.get(url).headers['ETag']
+  assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+  # The ETag of another filter is another one
+  assert client.get(url + '?status=LATE', headers={'If-None-Match': etag}).status_code == 200
+
+def test_detail_of_another_student_is_forbidden(campus, client_as):
+  client = client_as('STUDENT', campus['STUDENT'])
+  assert client.get(f"/student/attendance/{campus['course']}/get_detail?nim=0000000001").status_code == 403
+  assert client.get(f"/student/attendance/{campus['course']}/detail?nim=0000000001").status_code == 403
+
+def test_detail_page(campus, client_as):
+  client = client_as('STUDENT', campus['STUDENT'])
+  assert client.get(f"/student/attendance/{campus['course']}/detail").status_code == 200
+  # A course of another class
+  response = client.get('/student/attendance/C00100/detail')
+  assert response.status_code == 302 and response.location.endswith('/student/attendance')